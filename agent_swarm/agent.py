@@ -1,9 +1,11 @@
+import asyncio
 import requests
 import time
-import hashlib
-import random
 import os
 from agent_swarm.behaviors import BehaviorStrategy, get_behavior_by_name
+from agent_swarm.journeys import PAGE_PATHS, page_params
+from agent_swarm.seeding import agent_rng
+from src.core.allocation import allocation_from_env
 
 def _get_target_url():
     """Get TARGET_APP_URL from Streamlit secrets or environment variable."""
@@ -25,7 +27,8 @@ class HeuristicAgent:
     - DIP: Depends on BehaviorStrategy abstraction.
     """
 
-    def __init__(self, agent_id: str, behavior: BehaviorStrategy, run_id: str = None, weight: float = 1.0):
+    def __init__(self, agent_id: str, behavior: BehaviorStrategy, run_id: str = None, weight: float = 1.0,
+                 seed: int = None):
         self.agent_id = agent_id
         if isinstance(behavior, str):
             # Backward compatibility / Factory usage
@@ -35,31 +38,96 @@ class HeuristicAgent:
 
         self.run_id = run_id
         self.weight = weight  # For hybrid simulation
+        self.rng = agent_rng(seed, agent_id)  # Own stream: reproducible with a seed, no global RNG contention
         self.base_url = _get_target_url()  # Use cloud URL from secrets/env
         self.session = requests.Session()
     
     def _get_variant(self):
-        """Calculate which variant (A/B) this agent sees (matches server logic)"""
-        h_val = int(hashlib.md5(str(self.agent_id).encode()).hexdigest(), 16) % 100
-        return 'B' if h_val >= 50 else 'A'
+        """Calculate which variant this agent sees (matches server logic, EXPERIMENT_ALLOCATION table)"""
+        return allocation_from_env().variant(self.agent_id)
     
+    def _visit_params(self):
+        params = {"uid": self.agent_id, "weight": self.weight}
+        if self.run_id:
+            params["run_id"] = self.run_id
+        return params
+
+    def _click_data(self, element):
+        data = {"uid": self.agent_id, "element": element}
+        if self.run_id:
+            data["run_id"] = self.run_id
+        return data
+
+    def _order_data(self, variant):
+        data = {"uid": self.agent_id, "amount": self.behavior.purchase_amount(variant, self.rng)}
+        if self.run_id:
+            data["run_id"] = self.run_id
+        return data
+
+    def _journey_pages(self):
+        """Pages to walk after the banner; empty unless journeys are enabled (AGENT_JOURNEYS=1)."""
+        if os.getenv("AGENT_JOURNEYS") != "1" or self.behavior.journey is None:
+            return []
+        return self.behavior.journey.walk(self.rng)
+
+    def _think_time(self, page, is_turbo):
+        return 0.02 if is_turbo else self.behavior.journey.think(page, self.rng)
+
+    def _session_result(self, variant, clicked, bounced, purchased, timings, pages=()):
+        return {
+            "success": True,
+            "agent_id": self.agent_id,
+            "trait": self.behavior.name,
+            "variant": variant,
+            "clicked": clicked,
+            "bounced": bounced,
+            "purchased": purchased,
+            "pages": list(pages),
+            "timings": timings
+        }
+
+    def _failure_result(self, error, timings):
+        return {"success": False, "error": error, "trait": self.behavior.name, "timings": timings}
+
+    def _timed(self, timings, endpoint, call, *args, **kwargs):
+        """Run one HTTP call and append (endpoint, seconds, ok) to timings."""
+        start = time.perf_counter()
+        try:
+            res = call(*args, **kwargs)
+        except Exception:
+            timings.append((endpoint, time.perf_counter() - start, False))
+            raise
+        timings.append((endpoint, time.perf_counter() - start, res.status_code < 400))
+        return res
+
+    async def _atimed(self, timings, endpoint, call, *args, **kwargs):
+        """Async counterpart of _timed."""
+        start = time.perf_counter()
+        try:
+            res = await call(*args, **kwargs)
+        except Exception:
+            timings.append((endpoint, time.perf_counter() - start, False))
+            raise
+        timings.append((endpoint, time.perf_counter() - start, res.status_code < 400))
+        return res
+
     def run_session(self):
         """
         Simulates a complete user session.
+        Every request is timed into the result's "timings" list.
         """
+        timings = []
         try:
             is_turbo = os.getenv("AGENT_TURBO") == "1"
             
             # 1. Visit Home (longer timeout for Render cold start)
-            params = {"uid": self.agent_id, "weight": self.weight}
-            if self.run_id:
-                params["run_id"] = self.run_id
-            res = self.session.get(f"{self.base_url}/", params=params, timeout=30)
+            res = self._timed(timings, "GET /", self.session.get, f"{self.base_url}/",
+                              params=self._visit_params(), timeout=30)
             if res.status_code != 200:
-                return {"success": False, "error": f"Server error: {res.status_code}"}
+                return self._failure_result(f"Server error: {res.status_code}", timings)
             
             if not is_turbo:
-                time.sleep(random.uniform(0.3, 1.5))
+                time.sleep(self.rng.uniform(0.3, 1.5))
             else:
                 time.sleep(0.02) # Minimum delay
             
@@ -69,57 +137,88 @@ class HeuristicAgent:
             # 3. Click Decision (Delegated to Strategy)
             clicked = False
             bounced = False
-            if self.behavior.should_click(variant):
+            if self.behavior.should_click(variant, rng=self.rng):
                 clicked = True
-                click_data = {"uid": self.agent_id, "element": f"banner_{variant}"}
-                if self.run_id:
-                    click_data["run_id"] = self.run_id
-                self.session.post(
-                    f"{self.base_url}/click",
-                    data=click_data,
-                    timeout=15
-                )
+                self._timed(timings, "POST /click", self.session.post, f"{self.base_url}/click",
+                            data=self._click_data(f"banner_{variant}"), timeout=15)
                 if not is_turbo:
-                    time.sleep(random.uniform(0.5, 2.0))
+                    time.sleep(self.rng.uniform(0.5, 2.0))
                 else:
                     time.sleep(0.02) # Minimum delay to prevent starvation
             else:
                 # User didn't click - record as bounce (left without interaction)
                 bounced = True
-                bounce_data = {"uid": self.agent_id, "element": "bounce"}
-                if self.run_id:
-                    bounce_data["run_id"] = self.run_id
-                self.session.post(
-                    f"{self.base_url}/click",
-                    data=bounce_data,
-                    timeout=15
-                )
-
-            # 4. Purchase Decision (Delegated to Strategy)
+                self._timed(timings, "POST /click", self.session.post, f"{self.base_url}/click",
+                            data=self._click_data("bounce"), timeout=15)
+
+            # 4. Page Journey (search / detail / cart / tracking), Markov walk per persona
+            pages = self._journey_pages()
+            for page in pages:
+                path = PAGE_PATHS[page]
+                self._timed(timings, f"GET {path}", self.session.get, f"{self.base_url}{path}",
+                            params=page_params(page, self.agent_id, self.run_id, self.rng), timeout=15)
+                time.sleep(self._think_time(page, is_turbo))
+
+            # 5. Purchase Decision (Delegated to Strategy)
             purchased = False
-            if clicked and self.behavior.should_purchase():
+            if clicked and self.behavior.should_purchase(rng=self.rng, variant=variant):
                 purchased = True
-                order_data = {"uid": self.agent_id, "amount": random.randint(15000, 50000)}
-                if self.run_id:
-                    order_data["run_id"] = self.run_id
-                self.session.post(
-                    f"{self.base_url}/order",
-                    data=order_data,
-                    timeout=15
-                )
-
-            return {
-                "success": True,
-                "agent_id": self.agent_id,
-                "trait": self.behavior.name,
-                "variant": variant,
-                "clicked": clicked,
-                "bounced": bounced,
-                "purchased": purchased
-            }
+                self._timed(timings, "POST /order", self.session.post, f"{self.base_url}/order",
+                            data=self._order_data(variant), timeout=15)
+
+            return self._session_result(variant, clicked, bounced, purchased, timings, pages)
         
         except Exception as e:
-            return {"success": False, "error": str(e)}
+            return self._failure_result(str(e), timings)
+
+    async def arun_session(self, client):
+        """
+        Async version of run_session on a shared httpx.AsyncClient.
+        Think time uses asyncio.sleep, so one event loop can hold thousands of sessions.
+        """
+        timings = []
+        try:
+            is_turbo = os.getenv("AGENT_TURBO") == "1"
+
+            # 1. Visit Home (longer timeout for Render cold start)
+            res = await self._atimed(timings, "GET /", client.get, f"{self.base_url}/",
+                                     params=self._visit_params(), timeout=30)
+            if res.status_code != 200:
+                return self._failure_result(f"Server error: {res.status_code}", timings)
+
+            await asyncio.sleep(0.02 if is_turbo else self.rng.uniform(0.3, 1.5))
+
+            # 2. Get Variant
+            variant = self._get_variant()
+
+            # 3. Click Decision (Delegated to Strategy)
+            clicked = self.behavior.should_click(variant, rng=self.rng)
+            bounced = not clicked
+            element = f"banner_{variant}" if clicked else "bounce"
+            await self._atimed(timings, "POST /click", client.post, f"{self.base_url}/click",
+                               data=self._click_data(element), timeout=15)
+            if clicked:
+                await asyncio.sleep(0.02 if is_turbo else self.rng.uniform(0.5, 2.0))
+
+            # 4. Page Journey (search / detail / cart / tracking), Markov walk per persona
+            pages = self._journey_pages()
+            for page in pages:
+                path = PAGE_PATHS[page]
+                await self._atimed(timings, f"GET {path}", client.get, f"{self.base_url}{path}",
+                                   params=page_params(page, self.agent_id, self.run_id, self.rng), timeout=15)
+                await asyncio.sleep(self._think_time(page, is_turbo))
+
+            # 5. Purchase Decision (Delegated to Strategy)
+            purchased = False
+            if clicked and self.behavior.should_purchase(rng=self.rng, variant=variant):
+                purchased = True
+                await self._atimed(timings, "POST /order", client.post, f"{self.base_url}/order",
+                                   data=self._order_data(variant), timeout=15)
+
+            return self._session_result(variant, clicked, bounced, purchased, timings, pages)
+
+        except Exception as e:
+            return self._failure_result(str(e), timings)
 
 
 if __name__ == "__main__":
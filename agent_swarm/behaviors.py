@@ -1,96 +1,263 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache, wraps
+import inspect
 import random
 
+import numpy as np
+
+from agent_swarm.personas import PersonaCatalog, load_catalog
+
+DEFAULT_AMOUNT_RANGE = (15000, 50000)  # Inclusive order amount (KRW)
+PROBABILITY_DRAWS = 20000  # Decisions sampled per variant for strategies without probabilities
+
 class BehaviorStrategy(ABC):
     """
     Abstract Base Class for Agent Behaviors (Strategy Pattern).
     Enables Open/Closed Principle: Add new behaviors without modifying Agent class.
     """
-    
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Strategies written against should_click(variant) / should_purchase() keep working:
+        # callers pass rng / variant as keywords, which such overrides simply do not receive
+        for method in ("should_click", "should_purchase"):
+            override = cls.__dict__.get(method)
+            if override is not None:
+                setattr(cls, method, _accept_new_keywords(override))
+
+    def __new__(cls, *args, **kwargs):
+        for decide, probability in (("should_click", "click_probability"),
+                                    ("should_purchase", "purchase_probability")):
+            if (getattr(cls, decide) is getattr(BehaviorStrategy, decide)
+                    and getattr(cls, probability) is getattr(BehaviorStrategy, probability)):
+                raise TypeError(f"{cls.__name__} must implement {decide} or {probability}")
+        return super().__new__(cls)
+
     @property
     @abstractmethod
     def name(self) -> str:
         pass
 
-    @abstractmethod
-    def should_click(self, variant: str) -> bool:
+    def click_probability(self, variant: str) -> float:
+        """
+        Probability of clicking the banner for the given variant (A/B).
+        Exposed so the direct engine and expected_outcome need no sampling.
+        Default (strategies that only implement should_click): the share of
+        PROBABILITY_DRAWS sampled decisions, estimated once per variant.
+        """
+        return self._estimate("click", variant, lambda rng: self.should_click(variant, rng=rng))
+
+    def purchase_probability(self, variant: str = None) -> float:
+        """
+        Probability of purchasing after a click (variant=None: the control variant).
+        Default: estimated from should_purchase like click_probability.
+        """
+        return self._estimate("purchase", variant, lambda rng: self.should_purchase(rng=rng, variant=variant))
+
+    def _estimate(self, decision: str, variant, decide) -> float:
+        estimates = self.__dict__.setdefault("_probability_estimates", {})
+        key = (decision, variant)
+        if key not in estimates:
+            rng = random.Random(0)  # Used by rng-aware strategies, so the estimate is stable
+            estimates[key] = sum(bool(decide(rng)) for _ in range(PROBABILITY_DRAWS)) / PROBABILITY_DRAWS
+        return estimates[key]
+
+    def amount_range(self, variant: str = None) -> tuple:
+        """Inclusive (low, high) order amount when this agent purchases."""
+        return DEFAULT_AMOUNT_RANGE
+
+    @property
+    def journey(self):
+        """JourneyModel for page walks after the banner (None: the session ends at the banner)."""
+        return None
+
+    def should_click(self, variant: str, rng: random.Random = None) -> bool:
         """
         Decide whether to click the banner based on variant (A/B).
+        Pass the agent's own rng for reproducible runs; defaults to the global `random`.
         """
-        pass
+        return (rng or random).random() < self.click_probability(variant)
 
-    @abstractmethod
-    def should_purchase(self) -> bool:
+    def should_purchase(self, rng: random.Random = None, variant: str = None) -> bool:
         """
         Decide whether to purchase after clicking.
         """
-        pass
+        return (rng or random).random() < self.purchase_probability(variant)
 
-class ImpulsiveBehavior(BehaviorStrategy):
-    """Reacts immediately to urgent cues (red banners, limited time)."""
-    name = "impulsive"
+    def purchase_amount(self, variant: str = None, rng: random.Random = None) -> int:
+        """Order amount for one purchase."""
+        low, high = self.amount_range(variant)
+        return int(_integers(rng, np.array([low]), np.array([high]))[0])
 
-    def should_click(self, variant: str) -> bool:
-        base_prob = 0.30
-        if variant == 'B':  # Assuming B is Red/Urgent
-            base_prob += 0.25 # Huge boost
-        return random.random() < base_prob
+    # Batch API: N agents per call (direct engine). The defaults loop over the
+    # per-agent methods above, so any strategy works; CatalogBehavior overrides
+    # them with array draws from the same rng stream.
 
-    def should_purchase(self) -> bool:
-        return random.random() < 0.25
+    def click_probabilities(self, variants) -> np.ndarray:
+        """Click probability per agent for an array of variants."""
+        return _per_variant(self.click_probability, variants)
 
-class CalculatorBehavior(BehaviorStrategy):
-    """Carefully evaluates discounts and prices."""
-    name = "calculator"
+    def purchase_probabilities(self, variants) -> np.ndarray:
+        """Purchase probability per agent for an array of variants."""
+        return _per_variant(self.purchase_probability, variants)
 
-    def should_click(self, variant: str) -> bool:
-        base_prob = 0.20
-        if variant == 'B': # Discount visible
-            base_prob += 0.10
-        return random.random() < base_prob
+    def should_click_batch(self, variants, rng=None) -> np.ndarray:
+        """
+        Click decisions for N agents at once (boolean array, one per variant).
+        rng: numpy Generator, random.Random or None (global `random`).
+        """
+        variants = np.asarray(variants)
+        return np.fromiter((self.should_click(str(v), rng=rng) for v in variants.ravel()),
+                           dtype=bool, count=variants.size).reshape(variants.shape)
 
-    def should_purchase(self) -> bool:
-        return random.random() < 0.20
+    def should_purchase_batch(self, size: int, rng=None, variants=None) -> np.ndarray:
+        """Purchase decisions for `size` agents who clicked (boolean array), per variant when given."""
+        if variants is None:
+            return np.fromiter((self.should_purchase(rng=rng) for _ in range(size)), dtype=bool, count=size)
+        variants = np.asarray(variants)
+        return np.fromiter((self.should_purchase(rng=rng, variant=str(v)) for v in variants.ravel()),
+                           dtype=bool, count=variants.size).reshape(variants.shape)
 
-class BrowserBehavior(BehaviorStrategy):
-    """Window shopping: High clicks, very low purchase."""
-    name = "browser"
+    def purchase_amounts(self, variants, rng=None) -> np.ndarray:
+        """Order amount per purchasing agent (int array)."""
+        variants = np.asarray(variants)
+        low = _per_variant(lambda v: self.amount_range(v)[0], variants)
+        high = _per_variant(lambda v: self.amount_range(v)[1], variants)
+        return _integers(rng, low, high)
 
-    def should_click(self, variant: str) -> bool:
-        return random.random() < 0.50 # High click rate
+    def expected_outcome(self, variants) -> dict:
+        """Expected clicks, purchases and revenue for a population, without drawing any samples."""
+        variants = np.asarray(variants)
+        clicks = self.click_probabilities(variants)
+        purchases = clicks * self.purchase_probabilities(variants)
+        mean_amount = _per_variant(lambda v: sum(self.amount_range(v)) / 2, variants)
+        return {
+            "clicks": float(clicks.sum()),
+            "purchases": float(purchases.sum()),
+            "revenue": float((purchases * mean_amount).sum()),
+        }
 
-    def should_purchase(self) -> bool:
-        return random.random() < 0.02 # Very low conversion
 
-class MissionBehavior(BehaviorStrategy):
-    """Goal-oriented: Low click (unless relevant), high purchase if clicked."""
-    name = "mission"
+def _accept_new_keywords(method):
+    """Wrap a decision override so keywords its signature lacks (rng, variant) are dropped."""
+    params = inspect.signature(method).parameters
+    if any(p.kind == p.VAR_KEYWORD for p in params.values()) or {"rng", "variant"} <= params.keys():
+        return method
+
+    @wraps(method)
+    def decide(self, *args, **kwargs):
+        return method(self, *args, **{k: v for k, v in kwargs.items() if k in params})
+    return decide
+
+
+def _per_variant(fn, variants) -> np.ndarray:
+    """Evaluate a per-variant scalar once per distinct label and broadcast it to every agent."""
+    variants = np.asarray(variants)
+    labels, index = np.unique(variants, return_inverse=True)
+    table = np.array([fn(str(v)) for v in labels], dtype=float)
+    return table[index].reshape(variants.shape)
 
-    def should_click(self, variant: str) -> bool:
-        return random.random() < 0.15
 
-    def should_purchase(self) -> bool:
-        return random.random() < 0.40 # High conversion
+def _uniforms(rng, size: int) -> np.ndarray:
+    """`size` uniform draws in [0, 1) from a numpy Generator or a random.Random-like source."""
+    if isinstance(rng, np.random.Generator):
+        return rng.random(size)
+    source = rng or random
+    return np.fromiter((source.random() for _ in range(size)), dtype=float, count=size)
+
+
+def _integers(rng, low, high) -> np.ndarray:
+    """Uniform integers in [low, high] (inclusive, elementwise)."""
+    low, high = np.asarray(low, dtype=np.int64), np.asarray(high, dtype=np.int64)
+    if isinstance(rng, np.random.Generator):
+        return rng.integers(low, high, endpoint=True)
+    source = rng or random
+    return np.fromiter((source.randint(lo, hi) for lo, hi in zip(low.tolist(), high.tolist())),
+                       dtype=np.int64, count=low.size)
+
+
+class CatalogBehavior(BehaviorStrategy):
+    """
+    Persona defined by one row of the compiled catalog (agent_swarm/personas.json).
+    Holds only a row index, so instances are cheap and shared via get_behavior_by_name.
+    """
+    persona = None
+    _registry = {}  # persona name -> CatalogBehavior subclass
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.persona:
+            CatalogBehavior._registry[cls.persona] = cls
+
+    def __init__(self, persona: str = None, catalog: PersonaCatalog = None):
+        self.catalog = catalog or load_catalog()
+        self.row = self.catalog.row(persona or self.persona or "")
+
+    @property
+    def name(self) -> str:
+        return self.catalog.names[self.row]
+
+    @property
+    def journey(self):
+        return self.catalog.journeys[self.row]
+
+    def click_probability(self, variant: str) -> float:
+        return float(self.catalog.click[self.row, self.catalog.column(variant)])
+
+    def purchase_probability(self, variant: str = None) -> float:
+        return float(self.catalog.purchase[self.row, self.catalog.column(variant)])
+
+    def amount_range(self, variant: str = None) -> tuple:
+        col = self.catalog.column(variant)
+        return int(self.catalog.amount_low[self.row, col]), int(self.catalog.amount_high[self.row, col])
+
+    def click_probabilities(self, variants) -> np.ndarray:
+        return self.catalog.click[self.row][self.catalog.variant_columns(variants)]
+
+    def purchase_probabilities(self, variants) -> np.ndarray:
+        return self.catalog.purchase[self.row][self.catalog.variant_columns(variants)]
+
+    def should_click_batch(self, variants, rng=None) -> np.ndarray:
+        probs = self.click_probabilities(variants)
+        return _uniforms(rng, probs.size).reshape(probs.shape) < probs
+
+    def should_purchase_batch(self, size: int, rng=None, variants=None) -> np.ndarray:
+        if variants is None:
+            return _uniforms(rng, size) < self.purchase_probability()
+        probs = self.purchase_probabilities(variants)
+        return _uniforms(rng, probs.size).reshape(probs.shape) < probs
+
+    def purchase_amounts(self, variants, rng=None) -> np.ndarray:
+        cols = self.catalog.variant_columns(variants)
+        return _integers(rng, self.catalog.amount_low[self.row][cols], self.catalog.amount_high[self.row][cols])
+
+class ImpulsiveBehavior(CatalogBehavior):
+    """Reacts immediately to urgent cues (red banners, limited time)."""
+    persona = "impulsive"
+
+class CalculatorBehavior(CatalogBehavior):
+    """Carefully evaluates discounts and prices."""
+    persona = "calculator"
+
+class BrowserBehavior(CatalogBehavior):
+    """Window shopping: High clicks, very low purchase."""
+    persona = "browser"
+
+class MissionBehavior(CatalogBehavior):
+    """Goal-oriented: Low click (unless relevant), high purchase if clicked."""
+    persona = "mission"
 
-class CautiousBehavior(BehaviorStrategy):
+class CautiousBehavior(CatalogBehavior):
     """Hesitates, reads reviews, low engagement."""
-    name = "cautious"
+    persona = "cautious"
 
-    def should_click(self, variant: str) -> bool:
-        return random.random() < 0.08
 
-    def should_purchase(self) -> bool:
-        return random.random() < 0.10
+@lru_cache(maxsize=None)
+def _shared_behaviors(catalog: PersonaCatalog) -> tuple:
+    """One strategy per catalog row, built once per compiled catalog."""
+    return tuple(CatalogBehavior._registry.get(name, CatalogBehavior)(name, catalog) for name in catalog.names)
 
 def get_behavior_by_name(name: str) -> BehaviorStrategy:
-    """Factory method to get strategy by name."""
-    strategies = {
-        "impulsive": ImpulsiveBehavior(),
-        "calculator": CalculatorBehavior(),
-        "rational": CalculatorBehavior(),  # Alias for UI consistency
-        "browser": BrowserBehavior(),
-        "window": BrowserBehavior(),  # Alias for UI consistency
-        "mission": MissionBehavior(),
-        "cautious": CautiousBehavior()
-    }
-    return strategies.get(name.lower(), BrowserBehavior())  # Default
+    """Factory method to get strategy by name or alias (unknown names fall back to the catalog default)."""
+    catalog = load_catalog()
+    return _shared_behaviors(catalog)[catalog.row(name)]
@@ -0,0 +1,227 @@
+"""
+Direct Swarm Engine
+Simulates agents in-process with NumPy and bulk-writes the outcome,
+skipping the HTTP round trips of HeuristicAgent.run_session.
+
+Each agent produces the same rows the Target App would record for a
+real session: one assignment, a page_view, a banner click or bounce and
+an optional purchase.
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from agent_swarm.behaviors import get_behavior_by_name
+from agent_swarm.progress import report_progress
+from agent_swarm.seeding import agent_id_base
+from src.core.allocation import allocation_from_env
+
+DEFAULT_CHUNK_SIZE = 200_000  # Agents simulated (and held in memory) per write batch
+
+ASSIGNMENT_COLUMNS = ["user_id", "experiment_id", "variant", "assigned_at", "run_id", "weight"]
+EVENT_COLUMNS = ["event_id", "user_id", "event_name", "timestamp", "value", "run_id"]
+
+
+def assign_variants(agent_ids, allocation=None) -> np.ndarray:
+    """Variant label per agent id (matches the server's allocation table; default: EXPERIMENT_ALLOCATION)."""
+    return (allocation or allocation_from_env()).variants_for(agent_ids)
+
+
+def _seconds(rng, n, low, high):
+    """Random delays as timedelta64[ms], mirroring the HTTP agent's sleeps."""
+    return (rng.uniform(low, high, n) * 1000).astype("timedelta64[ms]")
+
+
+def simulate_chunk(trait_idx, agent_ids, behaviors, rng, run_id, weight, started_at):
+    """
+    Draw outcomes for one chunk of agents.
+
+    Args:
+        trait_idx: int array, index into the probability tables per agent
+        agent_ids: list of agent ids (same length as trait_idx)
+        behaviors: BehaviorStrategy per trait index (decides via its batch API)
+        rng: numpy Generator
+        run_id: Run identifier written on every row
+        weight: Statistical weight written on assignments
+        started_at: numpy datetime64 of the session start
+
+    Returns:
+        (frames dict for bulk_insert_frames, outcome dict of boolean arrays)
+    """
+    n = len(agent_ids)
+    variants = assign_variants(agent_ids)
+    clicked = np.zeros(n, dtype=bool)
+    purchased = np.zeros(n, dtype=bool)
+    amounts = np.zeros(n)
+    for t, behavior in enumerate(behaviors):
+        members = np.flatnonzero(trait_idx == t)
+        if not members.size:
+            continue
+        clicked[members] = behavior.should_click_batch(variants[members], rng)
+        clickers = members[clicked[members]]
+        purchased[clickers] = behavior.should_purchase_batch(clickers.size, rng, variants=variants[clickers])
+        buyers = clickers[purchased[clickers]]
+        amounts[buyers] = behavior.purchase_amounts(variants[buyers], rng)
+
+    users = np.asarray(agent_ids, dtype=object)
+    view_at = np.full(n, started_at)
+    action_at = view_at + _seconds(rng, n, 0.3, 1.5)
+    order_at = action_at + _seconds(rng, n, 0.5, 2.0)
+
+    assignments = pd.DataFrame({
+        "user_id": users,
+        "experiment_id": "exp_default",
+        "variant": variants,
+        "assigned_at": view_at,
+        "run_id": run_id,
+        "weight": float(weight),
+    })
+
+    action_names = np.where(clicked, np.char.add("banner_", variants), "bounce")
+    events = pd.concat([
+        pd.DataFrame({"user_id": users, "event_name": "page_view", "timestamp": view_at, "value": 0.0}),
+        pd.DataFrame({"user_id": users, "event_name": action_names, "timestamp": action_at, "value": 0.0}),
+        pd.DataFrame({
+            "user_id": users[purchased], "event_name": "purchase",
+            "timestamp": order_at[purchased], "value": amounts[purchased].astype(float)
+        }),
+    ], ignore_index=True)
+    # Deterministic ids: an agent emits each event name at most once per run
+    events["event_id"] = f"{run_id}_" + events["user_id"] + "_" + events["event_name"]
+    events["run_id"] = run_id
+
+    frames = {"assignments": assignments, "events": events[EVENT_COLUMNS]}
+    outcome = {"variants": variants, "clicked": clicked, "purchased": purchased}
+    return frames, outcome
+
+
+def run_direct_swarm(config, progress_callback=None, run_id=None, weight=1.0, seed=None,
+                     writer=None, chunk_size=DEFAULT_CHUNK_SIZE, should_stop=None):
+    """
+    Runs a swarm of agents without HTTP, drawing outcomes in bulk.
+
+    Args:
+        config: Dict with trait counts, e.g. {"impulsive": 20, "calculator": 25, ...}
+        progress_callback: Optional function to report progress (current, total, message)
+        run_id: Optional unique identifier for this experiment run
+        weight: Statistical weight for hybrid simulation (default 1.0; rarely
+                needed since the full population can be simulated directly)
+        seed: Optional run seed; fixes agent ids and outcomes (for the same config and chunk_size)
+        writer: Callable taking an iterable of {table: DataFrame} batches and
+                returning a status dict (default: src.data.db.bulk_insert_frames)
+        chunk_size: Agents simulated per batch
+        should_stop: Optional callable checked between chunks; once it returns True
+                     no further chunks are simulated and the writer commits the
+                     chunks already written (cooperative stop, see runner --stop-file)
+
+    Returns:
+        Dict with results summary (same shape as run_agent_swarm)
+    """
+    if not run_id:
+        run_id = f"run_{int(time.time() * 1000)}"
+    if writer is None:
+        from src.data.db import bulk_insert_frames
+        writer = bulk_insert_frames
+
+    traits = [t for t, count in config.items() if count > 0]
+    behaviors = [get_behavior_by_name(t) for t in traits]
+    counts = np.array([config[t] for t in traits], dtype=np.int64)
+
+    total = int(counts.sum())
+    trait_of = np.repeat(np.arange(len(traits)), counts)
+    local_idx = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    agent_id_counter = agent_id_base(seed)  # Unique ID base, as in run_agent_swarm
+
+    rng = np.random.default_rng(seed)
+    started_at = np.datetime64(datetime.now(), "ms")
+
+    results = {
+        "total": total,
+        "success": 0,
+        "failed": 0,
+        "clicked": 0,
+        "bounced": 0,
+        "purchased": 0,
+        "by_trait": {}
+    }
+
+    stopped_at = None  # Agents simulated when a cooperative stop ended the run
+
+    def batches():
+        nonlocal stopped_at
+        for start in range(0, total, chunk_size):
+            if start and should_stop is not None and should_stop():
+                stopped_at = start
+                break  # Generator ends: the writer commits what it has and runs its cleanup
+            stop = min(start + chunk_size, total)
+            idx = trait_of[start:stop]
+            agent_ids = [f"agent_{traits[t]}_{agent_id_counter + i}" for t, i in zip(idx, local_idx[start:stop])]
+            frames, outcome = simulate_chunk(idx, agent_ids, behaviors, rng, run_id, weight, started_at)
+            _tally(results, idx, behaviors, outcome)
+            yield frames
+            report_progress(progress_callback, stop, total, f"{stop:,}명 시뮬레이션 완료",
+                            _chunk_delta(agent_ids, outcome))
+
+    begin = time.time()
+    status = writer(batches())
+    if stopped_at is not None:
+        results["total"] = stopped_at
+        results["stopped_early"] = True
+    if status.get("status") == "success":
+        results["success"] = results["total"]
+    else:
+        # The bulk write is one transaction: nothing from this run was stored
+        results["failed"] = results["total"]
+        results["error"] = status.get("message", "unknown error")
+
+    results["run_id"] = run_id
+    results["weight"] = weight
+    results["effective_total"] = int(results["total"] * weight)
+    results["engine"] = "direct"
+    results["elapsed_sec"] = round(time.time() - begin, 3)
+    return results
+
+
+def _chunk_delta(agent_ids, outcome):
+    """Running aggregates of one chunk for progress reporters (see agent_swarm.progress)."""
+    variants, clicked, purchased = outcome["variants"], outcome["clicked"], outcome["purchased"]
+    last = len(agent_ids) - 1
+    recent = [("page_view", agent_ids[last]),
+              (f"banner_{variants[last]}" if clicked[last] else "bounce", agent_ids[last])]
+    labels, index = np.unique(variants, return_inverse=True)
+
+    def per_variant(flags=None):
+        counts = np.bincount(index, flags, len(labels)).astype(int)
+        return dict(zip(labels.tolist(), counts.tolist()))
+
+    return {
+        "visitors": per_variant(),
+        "clicks": per_variant(clicked),
+        "purchases": per_variant(purchased),
+        "clicked": int(clicked.sum()),
+        "purchased": int(purchased.sum()),
+        "events": recent,
+    }
+
+
+def _tally(results, trait_idx, behaviors, outcome):
+    """Accumulate per-chunk outcome counts into the runner-style results dict."""
+    clicked, purchased = outcome["clicked"], outcome["purchased"]
+    results["clicked"] += int(clicked.sum())
+    results["bounced"] += int((~clicked).sum())
+    results["purchased"] += int(purchased.sum())
+
+    n_traits = len(behaviors)
+    totals = np.bincount(trait_idx, minlength=n_traits)
+    clicks = np.bincount(trait_idx, weights=clicked, minlength=n_traits)
+    purchases = np.bincount(trait_idx, weights=purchased, minlength=n_traits)
+    for t, behavior in enumerate(behaviors):
+        if totals[t] == 0:
+            continue
+        stats = results["by_trait"].setdefault(behavior.name, {"total": 0, "clicked": 0, "bounced": 0, "purchased": 0})
+        stats["total"] += int(totals[t])
+        stats["clicked"] += int(clicks[t])
+        stats["bounced"] += int(totals[t] - clicks[t])
+        stats["purchased"] += int(purchases[t])
@@ -0,0 +1,161 @@
+"""
+Session Journeys
+Markov-chain walks over the Target App's pages (/search, /detail, /cart,
+/tracking) so a swarm exercises the page-rendering paths real users hit,
+not just the banner on `/`.
+
+A journey starts on "home" (after the banner decision) and moves page to page
+with per-persona transition probabilities until it reaches "exit" or
+max_steps. Each step waits a think time drawn from a per-page distribution.
+Journeys are defined in the persona catalog (agent_swarm/personas.json).
+"""
+import math
+import random
+
+import numpy as np
+
+STATES = ("home", "search", "detail", "cart", "tracking", "exit")
+PAGE_PATHS = {"home": "/", "search": "/search", "detail": "/detail", "cart": "/cart", "tracking": "/tracking"}
+SEARCH_TERMS = ("치킨", "피자", "떡볶이", "커피", "샐러드", "족발", "초밥", "버거")
+DEFAULT_MAX_STEPS = 12
+
+
+class ThinkTime:
+    """
+    Seconds an agent spends on a page before moving on.
+        {"dist": "uniform", "low": 0.5, "high": 2.0}
+        {"dist": "lognormal", "median": 1.5, "sigma": 0.6}
+        {"dist": "exponential", "mean": 1.0}
+        {"dist": "fixed", "seconds": 1.0}
+    """
+
+    def __init__(self, dist: str = "uniform", **params):
+        self.dist = dist
+        self.params = {k: float(v) for k, v in params.items()}
+        try:
+            self.mean()
+        except KeyError as e:
+            raise ValueError(f"Think time '{dist}' is missing parameter {e}")
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "ThinkTime":
+        spec = dict(spec)
+        return cls(spec.pop("dist", "uniform"), **spec)
+
+    def sample(self, rng: random.Random = None) -> float:
+        rng = rng or random
+        p = self.params
+        if self.dist == "uniform":
+            return rng.uniform(p["low"], p["high"])
+        if self.dist == "lognormal":
+            return rng.lognormvariate(math.log(p["median"]), p["sigma"])
+        if self.dist == "exponential":
+            return rng.expovariate(1.0 / p["mean"])
+        return p["seconds"]
+
+    def mean(self) -> float:
+        p = self.params
+        if self.dist == "uniform":
+            return (p["low"] + p["high"]) / 2
+        if self.dist == "lognormal":
+            return p["median"] * math.exp(p["sigma"] ** 2 / 2)
+        if self.dist == "exponential":
+            return p["mean"]
+        if self.dist == "fixed":
+            return p["seconds"]
+        raise ValueError(f"Unknown think time distribution '{self.dist}'")
+
+
+class JourneyModel:
+    """
+    Transition matrix over STATES ("exit" is absorbing) plus a think time per page.
+    The matrix is read-only, so one model is shared by every agent of a persona.
+    """
+
+    def __init__(self, transitions: dict, think_time: dict = None, max_steps: int = DEFAULT_MAX_STEPS):
+        index = {s: i for i, s in enumerate(STATES)}
+        matrix = np.zeros((len(STATES), len(STATES)))
+        matrix[index["exit"], index["exit"]] = 1.0
+        for state, row in transitions.items():
+            if state not in PAGE_PATHS:
+                raise ValueError(f"Unknown journey page '{state}' (expected one of {', '.join(PAGE_PATHS)})")
+            for target, p in row.items():
+                if target not in index:
+                    raise ValueError(f"Unknown journey transition '{state}' -> '{target}'")
+                matrix[index[state], index[target]] = float(p)
+        for state in PAGE_PATHS:
+            total = matrix[index[state]].sum()
+            if state not in transitions:
+                matrix[index[state], index["exit"]] = 1.0  # Pages without a row end the journey
+            elif (matrix[index[state]] < 0).any() or abs(total - 1.0) > 1e-6:
+                raise ValueError(f"Journey transitions from '{state}' must be non-negative and sum to 1 (got {total:.4f})")
+        matrix.flags.writeable = False
+        self.matrix = matrix
+        self._cumulative = np.cumsum(matrix, axis=1)
+
+        think_time = dict(think_time or {})
+        default = ThinkTime.from_spec(think_time.pop("default", {"dist": "uniform", "low": 0.5, "high": 2.0}))
+        unknown = set(think_time) - set(PAGE_PATHS)
+        if unknown:
+            raise ValueError(f"Unknown journey page(s) in think_time: {', '.join(sorted(unknown))}")
+        self.think_times = {state: ThinkTime.from_spec(think_time[state]) if state in think_time else default
+                            for state in PAGE_PATHS}
+        self.max_steps = int(max_steps)
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "JourneyModel":
+        return cls(spec.get("transitions", {}), spec.get("think_time"), spec.get("max_steps", DEFAULT_MAX_STEPS))
+
+    def next_state(self, state: str, rng: random.Random = None) -> str:
+        row = self._cumulative[STATES.index(state)]
+        pick = int(np.searchsorted(row, (rng or random).random(), side="right"))
+        return STATES[min(pick, len(STATES) - 1)]
+
+    def walk(self, rng: random.Random = None, start: str = "home") -> list:
+        """Pages visited after `start`, in order (at most max_steps, "exit" not included)."""
+        pages = []
+        state = start
+        while len(pages) < self.max_steps:
+            state = self.next_state(state, rng)
+            if state == "exit":
+                break
+            pages.append(state)
+        return pages
+
+    def think(self, state: str, rng: random.Random = None) -> float:
+        return self.think_times[state].sample(rng)
+
+    def expected_page_views(self, start: str = "home") -> dict:
+        """
+        Expected visits per page for one journey from `start` (absorbing-chain
+        fundamental matrix, ignoring the max_steps cap). Sizes page traffic
+        without simulating anyone.
+        """
+        pages = list(PAGE_PATHS)
+        transient = self.matrix[:len(pages), :len(pages)]
+        visits = np.linalg.solve(np.eye(len(pages)) - transient.T, np.eye(len(pages))[pages.index(start)])
+        visits[pages.index(start)] -= 1.0  # The starting page view is not part of the walk
+        return {page: float(v) for page, v in zip(pages, visits)}
+
+
+def merge_journey_spec(base: dict, override: dict) -> dict:
+    """Persona journey = catalog default with the persona's transition rows / think times replaced."""
+    base, override = base or {}, override or {}
+    return {
+        "transitions": {**base.get("transitions", {}), **override.get("transitions", {})},
+        "think_time": {**base.get("think_time", {}), **override.get("think_time", {})},
+        "max_steps": override.get("max_steps", base.get("max_steps", DEFAULT_MAX_STEPS)),
+    }
+
+
+def page_params(state: str, agent_id: str, run_id: str = None, rng: random.Random = None) -> dict:
+    """Query string for one journey page view (agent id and run id let the server attribute it)."""
+    rng = rng or random
+    params = {"uid": agent_id}
+    if run_id:
+        params["run_id"] = run_id
+    if state == "search":
+        params["q"] = rng.choice(SEARCH_TERMS)
+    elif state == "detail":
+        params["id"] = f"item_{rng.randint(1, 50):03d}"
+    return params
@@ -0,0 +1,167 @@
+"""
+Load Profiles
+Arrival-rate curves for open-loop swarm runs (sessions started per second
+over time), plus the arrival schedule generated from them.
+"""
+from abc import ABC, abstractmethod
+import math
+
+import numpy as np
+
+
+class LoadProfile(ABC):
+    """
+    Abstract arrival-rate curve (Strategy Pattern).
+    rate(t) is the session arrival rate in sessions/sec at t seconds into the run.
+    """
+
+    duration: float
+
+    @abstractmethod
+    def rate(self, t: np.ndarray) -> np.ndarray:
+        pass
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__.replace("Profile", "").lower()
+
+    def expected_sessions(self) -> float:
+        """Integral of the rate over the run."""
+        return float(_cumulative_intensity(self)[1][-1])
+
+
+class ConstantProfile(LoadProfile):
+    """Fixed arrival rate."""
+
+    def __init__(self, rps: float, duration: float):
+        self.rps = float(rps)
+        self.duration = float(duration)
+
+    def rate(self, t):
+        return np.full_like(np.asarray(t, dtype=float), self.rps)
+
+
+class RampProfile(LoadProfile):
+    """Linear ramp from start_rps to end_rps (finds the saturation point)."""
+
+    def __init__(self, start_rps: float, end_rps: float, duration: float):
+        self.start_rps = float(start_rps)
+        self.end_rps = float(end_rps)
+        self.duration = float(duration)
+
+    def rate(self, t):
+        frac = np.clip(np.asarray(t, dtype=float) / self.duration, 0.0, 1.0)
+        return self.start_rps + (self.end_rps - self.start_rps) * frac
+
+
+class StepProfile(LoadProfile):
+    """Staircase of rates, each held for step_duration seconds."""
+
+    def __init__(self, rates, step_duration: float):
+        self.rates = [float(r) for r in rates]
+        self.step_duration = float(step_duration)
+        self.duration = self.step_duration * len(self.rates)
+
+    def rate(self, t):
+        idx = np.clip((np.asarray(t, dtype=float) // self.step_duration).astype(int), 0, len(self.rates) - 1)
+        return np.asarray(self.rates)[idx]
+
+
+class SpikeProfile(LoadProfile):
+    """Base rate with one burst (flash sale, push notification)."""
+
+    def __init__(self, base_rps: float, spike_rps: float, duration: float, spike_at: float = None,
+                 spike_duration: float = None):
+        self.base_rps = float(base_rps)
+        self.spike_rps = float(spike_rps)
+        self.duration = float(duration)
+        self.spike_at = float(spike_at) if spike_at is not None else self.duration / 2
+        self.spike_duration = float(spike_duration) if spike_duration is not None else self.duration / 10
+
+    def rate(self, t):
+        t = np.asarray(t, dtype=float)
+        in_spike = (t >= self.spike_at) & (t < self.spike_at + self.spike_duration)
+        return np.where(in_spike, self.spike_rps, self.base_rps)
+
+
+class DiurnalProfile(LoadProfile):
+    """
+    24h traffic curve compressed into `duration` seconds.
+    Cosine between trough_rps and peak_rps, peaking at peak_hour (default 20h, dinner-time orders).
+    """
+
+    def __init__(self, peak_rps: float, trough_rps: float, duration: float, peak_hour: float = 20.0):
+        self.peak_rps = float(peak_rps)
+        self.trough_rps = float(trough_rps)
+        self.duration = float(duration)
+        self.peak_hour = float(peak_hour)
+
+    def rate(self, t):
+        hour = np.asarray(t, dtype=float) / self.duration * 24.0
+        shape = (1 + np.cos(2 * math.pi * (hour - self.peak_hour) / 24.0)) / 2
+        return self.trough_rps + (self.peak_rps - self.trough_rps) * shape
+
+
+def _cumulative_intensity(profile: LoadProfile, resolution: int = 10000):
+    """Grid of times and the integral of rate() up to each (trapezoid rule)."""
+    grid = np.linspace(0.0, profile.duration, resolution + 1)
+    rates = np.maximum(profile.rate(grid), 0.0)
+    cumulative = np.concatenate([[0.0], np.cumsum((rates[1:] + rates[:-1]) / 2 * np.diff(grid))])
+    return grid, cumulative
+
+
+def arrival_times(profile: LoadProfile, rng: np.random.Generator = None, poisson: bool = True) -> np.ndarray:
+    """
+    Session start offsets (seconds from run start) following the profile.
+
+    poisson=True draws a non-homogeneous Poisson process (realistic jitter);
+    poisson=False spaces arrivals evenly in cumulative intensity (deterministic).
+    Both invert the cumulative intensity, so no per-arrival Python loop is needed.
+    """
+    grid, cumulative = _cumulative_intensity(profile)
+    total = cumulative[-1]
+    if total <= 0:
+        return np.empty(0)
+    if poisson:
+        rng = rng or np.random.default_rng()
+        targets = np.sort(rng.uniform(0.0, total, rng.poisson(total)))
+    else:
+        targets = np.arange(int(total + 1e-9)) + 0.5  # Tolerate trapezoid round-off
+    return np.interp(targets, cumulative, grid)
+
+
+PROFILES = {
+    "constant": (ConstantProfile, {"rps": "rps", "duration": "duration"}),
+    "ramp": (RampProfile, {"start": "start_rps", "end": "end_rps", "duration": "duration"}),
+    "step": (StepProfile, {"rates": "rates", "step": "step_duration"}),
+    "spike": (SpikeProfile, {"base": "base_rps", "peak": "spike_rps", "duration": "duration",
+                             "at": "spike_at", "length": "spike_duration"}),
+    "diurnal": (DiurnalProfile, {"peak": "peak_rps", "trough": "trough_rps", "duration": "duration",
+                                 "peak_hour": "peak_hour"}),
+}
+
+
+def parse_profile(spec: str) -> LoadProfile:
+    """
+    Build a profile from a CLI spec, e.g.
+        "constant:rps=50,duration=60"
+        "ramp:start=1,end=200,duration=300"
+        "step:rates=10/50/100,step=30"
+        "spike:base=20,peak=300,duration=120,at=60,length=10"
+        "diurnal:peak=80,trough=5,duration=600"
+    """
+    name, _, params = spec.partition(":")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown load profile '{name}' (expected one of {', '.join(PROFILES)})")
+    cls, aliases = PROFILES[name]
+
+    kwargs = {}
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        if key not in aliases:
+            raise ValueError(f"Unknown parameter '{key}' for {name} profile (expected {', '.join(aliases)})")
+        kwargs[aliases[key]] = [float(v) for v in value.split("/")] if key == "rates" else float(value)
+    try:
+        return cls(**kwargs)
+    except TypeError as e:
+        raise ValueError(f"Incomplete {name} profile '{spec}': {e}")
@@ -0,0 +1,179 @@
+"""
+Swarm Metrics
+Request latency histograms per endpoint and per trait, and the SLO report
+that turns a swarm run into a load test of the target app.
+"""
+import math
+import time
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram over microseconds.
+
+    Log-linear buckets: 2**SUB_BITS / 2 linear steps per power of two, so every
+    recorded value keeps ~1.5% relative precision with a few hundred buckets
+    at most. Recording is O(1) and histograms from shards merge by adding counts.
+    """
+
+    SUB_BITS = 7
+
+    def __init__(self):
+        self.counts = {}  # bucket index -> count
+        self.count = 0
+        self.errors = 0
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, us: int) -> int:
+        if us < (1 << cls.SUB_BITS):
+            return us
+        shift = us.bit_length() - cls.SUB_BITS
+        return (shift << cls.SUB_BITS) + (us >> shift)
+
+    @classmethod
+    def _value(cls, index: int) -> float:
+        """Midpoint (µs) of the values mapped to a bucket."""
+        shift = index >> cls.SUB_BITS
+        if shift == 0:
+            return float(index)
+        mantissa = index & ((1 << cls.SUB_BITS) - 1)
+        return ((mantissa << shift) + ((mantissa + 1) << shift) - 1) / 2
+
+    def record(self, seconds: float, ok: bool = True):
+        us = max(0, int(seconds * 1_000_000))
+        index = self._index(us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.max_us = max(self.max_us, us)
+        if not ok:
+            self.errors += 1
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.errors += other.errors
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, p: float) -> float:
+        """Latency in ms at percentile p (0-100)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.count, 4) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_us / 1000, 2),
+        }
+
+
+class SLO:
+    """Per-endpoint service level objective checked at the end of a run."""
+
+    def __init__(self, p95_ms: float = 500.0, p99_ms: float = 1000.0, error_rate: float = 0.01):
+        self.p95_ms = p95_ms
+        self.p99_ms = p99_ms
+        self.error_rate = error_rate
+
+    def violations(self, summary: dict) -> list:
+        found = []
+        if summary["p95_ms"] > self.p95_ms:
+            found.append(f"p95 {summary['p95_ms']}ms > {self.p95_ms}ms")
+        if summary["p99_ms"] > self.p99_ms:
+            found.append(f"p99 {summary['p99_ms']}ms > {self.p99_ms}ms")
+        if summary["error_rate"] > self.error_rate:
+            found.append(f"error rate {summary['error_rate']:.2%} > {self.error_rate:.2%}")
+        return found
+
+    def to_dict(self) -> dict:
+        return {"p95_ms": self.p95_ms, "p99_ms": self.p99_ms, "error_rate": self.error_rate}
+
+
+class SwarmMetrics:
+    """Collects request timings of one swarm (or shard) by endpoint and by trait."""
+
+    def __init__(self):
+        self.endpoints = {}
+        self.traits = {}
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def record(self, trait: str, endpoint: str, seconds: float, ok: bool):
+        self.endpoints.setdefault(endpoint, LatencyHistogram()).record(seconds, ok)
+        self.traits.setdefault(trait, LatencyHistogram()).record(seconds, ok)
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.time()
+
+    def merge(self, other: "SwarmMetrics"):
+        for attr in ("endpoints", "traits"):
+            mine = getattr(self, attr)
+            for key, hist in getattr(other, attr).items():
+                mine.setdefault(key, LatencyHistogram()).merge(hist)
+        self.started_at = min(self.started_at, other.started_at)
+        if other.finished_at is not None:
+            self.finished_at = max(self.finished_at or other.finished_at, other.finished_at)
+
+    def report(self, slo: SLO = None) -> dict:
+        """Latency/throughput summary plus SLO verdict per endpoint."""
+        self.finish()
+        overall = LatencyHistogram()
+        for hist in self.endpoints.values():
+            overall.merge(hist)
+        duration = max(self.finished_at - self.started_at, 1e-9)
+
+        latency = {
+            "duration_sec": round(duration, 3),
+            "requests": overall.count,
+            "throughput_rps": round(overall.count / duration, 2),
+            "overall": overall.summary(),
+            "endpoints": {endpoint: hist.summary() for endpoint, hist in sorted(self.endpoints.items())},
+            "traits": {trait: hist.summary() for trait, hist in sorted(self.traits.items())},
+        }
+        return apply_slo(latency, slo or SLO())
+
+
+def apply_slo(latency: dict, slo: SLO) -> dict:
+    """(Re)evaluate a report against an SLO, e.g. with thresholds given on the CLI."""
+    violations = {}
+    for endpoint, summary in latency["endpoints"].items():
+        problems = slo.violations(summary)
+        summary["slo_ok"] = not problems
+        if problems:
+            violations[endpoint] = problems
+    latency["slo"] = {"targets": slo.to_dict(), "passed": not violations, "violations": violations}
+    return latency
+
+
+def format_report(latency: dict) -> str:
+    """Plain-text table of a SwarmMetrics.report() for the CLI."""
+    lines = [
+        f"Requests: {latency['requests']} in {latency['duration_sec']}s ({latency['throughput_rps']} req/s)",
+        f"{'endpoint':<14}{'count':>8}{'err%':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  SLO",
+    ]
+    for endpoint, s in latency["endpoints"].items():
+        lines.append(
+            f"{endpoint:<14}{s['count']:>8}{s['error_rate'] * 100:>7.2f}%{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+            f"{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}  {'OK' if s['slo_ok'] else 'FAIL'}"
+        )
+    for trait, s in latency["traits"].items():
+        lines.append(f"  {trait:<12}{s['count']:>8}{s['error_rate'] * 100:>7.2f}%{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+                     f"{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+    verdict = "PASSED" if latency["slo"]["passed"] else "FAILED"
+    lines.append(f"SLO {verdict} (p95<={latency['slo']['targets']['p95_ms']}ms, "
+                 f"p99<={latency['slo']['targets']['p99_ms']}ms, errors<={latency['slo']['targets']['error_rate']:.2%})")
+    return "\n".join(lines)
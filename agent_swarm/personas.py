@@ -0,0 +1,135 @@
+"""
+Persona Catalog
+Agent personas (click, purchase and order amount per variant, page journey) are data in
+personas.json - or any JSON/YAML file named by PERSONA_CATALOG - compiled
+once into read-only NumPy tables that every agent shares.
+
+Catalog format:
+    {
+      "variants": ["A", "B"],          # column order; the first one is the control
+      "default": "browser",            # persona used for unknown names
+      "journey": {"transitions": ..., "think_time": ...},  # default page journey (agent_swarm.journeys)
+      "personas": [
+        {"name": "impulsive", "aliases": ["..."], "description": "...",
+         "click": {"A": 0.30, "B": 0.55},          # or one number for every variant
+         "purchase": 0.25,                          # or {"A": ..., "B": ...}
+         "amount": {"low": 15000, "high": 50000},  # or {"A": {"low", "high"}, ...}
+         "journey": {"transitions": {"detail": {...}}}}  # rows replacing the default journey's
+      ]
+    }
+"""
+import json
+import os
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+from agent_swarm.journeys import JourneyModel, merge_journey_spec
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "personas.json")
+
+
+class PersonaCatalog:
+    """
+    Compiled persona table: rows are personas, columns are variants.
+        click[p, v], purchase[p, v]        probabilities
+        amount_low[p, v], amount_high[p, v]  inclusive order amount range
+        journeys[p]                          JourneyModel (page walk after the banner)
+    Arrays and the name index are read-only, so one instance is safely shared.
+    """
+
+    def __init__(self, spec: dict):
+        personas = spec.get("personas") or []
+        if not personas:
+            raise ValueError("Persona catalog defines no personas")
+        self.variants = tuple(spec.get("variants", ("A", "B")))
+        self.names = tuple(p["name"].lower() for p in personas)
+        self.descriptions = tuple(p.get("description", "") for p in personas)
+
+        index = {}
+        for row, persona in enumerate(personas):
+            for key in (persona["name"], *persona.get("aliases", ())):
+                if key.lower() in index:
+                    raise ValueError(f"Duplicate persona name or alias '{key}'")
+                index[key.lower()] = row
+        self._index = MappingProxyType(index)
+        self._variant_cols = MappingProxyType({v: col for col, v in enumerate(self.variants)})
+
+        default = spec.get("default", self.names[0]).lower()
+        if default not in self._index:
+            raise ValueError(f"Default persona '{default}' is not in the catalog")
+        self.default_row = self._index[default]
+
+        self.click = self._table(personas, "click")
+        self.purchase = self._table(personas, "purchase")
+        self.amount_low = self._table(personas, "amount", "low")
+        self.amount_high = self._table(personas, "amount", "high")
+
+        for field in ("click", "purchase"):
+            table = getattr(self, field)
+            if ((table < 0) | (table > 1)).any():
+                raise ValueError(f"Persona {field} probabilities must be within [0, 1]")
+        if (self.amount_low > self.amount_high).any():
+            raise ValueError("Persona amount ranges need low <= high")
+
+        self.journeys = tuple(JourneyModel.from_spec(merge_journey_spec(spec.get("journey"), p.get("journey")))
+                              for p in personas)
+
+    def _table(self, personas, field, part=None) -> np.ndarray:
+        table = np.empty((len(personas), len(self.variants)))
+        for row, persona in enumerate(personas):
+            for col, variant in enumerate(self.variants):
+                try:
+                    value = persona[field]
+                    if isinstance(value, dict) and variant in value:
+                        value = value[variant]
+                    table[row, col] = float(value[part] if part else value)
+                except (KeyError, TypeError, ValueError):
+                    raise ValueError(f"Persona '{persona['name']}' has no valid {field}"
+                                     f"{'.' + part if part else ''} for variant {variant}")
+        table.flags.writeable = False
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return str(name).lower() in self._index
+
+    def row(self, name: str) -> int:
+        """Row of a persona name or alias (case-insensitive); unknown names map to the default."""
+        return self._index.get(str(name).lower(), self.default_row)
+
+    def column(self, variant) -> int:
+        """Column of one variant label (control column for unknown labels or None)."""
+        return self._variant_cols.get(variant, 0)
+
+    def variant_columns(self, variants) -> np.ndarray:
+        """Column per variant label; labels outside the catalog fall back to the control column."""
+        variants = np.asarray(variants)
+        labels, inverse = np.unique(variants, return_inverse=True)
+        cols = np.array([self._variant_cols.get(str(v), 0) for v in labels], dtype=np.intp)
+        return cols[inverse].reshape(variants.shape)
+
+
+def _read_spec(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"PyYAML is required to load {path}; install it or use a JSON catalog")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def _compile(path: str) -> PersonaCatalog:
+    return PersonaCatalog(_read_spec(path))
+
+
+def load_catalog(path: str = None) -> PersonaCatalog:
+    """Compiled catalog for a path (default: PERSONA_CATALOG or the bundled personas.json), cached per path."""
+    path = path or os.getenv("PERSONA_CATALOG") or DEFAULT_CATALOG_PATH
+    return _compile(os.path.abspath(path))
@@ -0,0 +1,119 @@
+"""
+Swarm Progress Reporting
+Live aggregates of a running swarm, streamed as NDJSON so the dashboard can
+follow a run from the runner's stdout instead of polling the experiment DB.
+
+A progress callback is any callable(current, total, message). Callbacks that
+also define record(delta) receive running aggregates: one delta per session
+(or per chunk for the direct engine), built by session_delta().
+"""
+import json
+import sys
+import time
+from collections import deque
+
+
+def session_delta(result: dict) -> dict:
+    """Aggregate contribution of one session result."""
+    if not result.get("success"):
+        return {"failed": 1}
+    variant = result.get("variant")
+    action = f"banner_{variant}" if result.get("clicked") else "bounce"
+    events = [("page_view", result["agent_id"]), (action, result["agent_id"])]
+    if result.get("purchased"):
+        events.append(("purchase", result["agent_id"]))
+    clicked, purchased = int(bool(result.get("clicked"))), int(bool(result.get("purchased")))
+    return {
+        "visitors": {variant: 1},
+        "clicks": {variant: clicked},
+        "purchases": {variant: purchased},
+        "clicked": clicked,
+        "purchased": purchased,
+        "events": events,
+    }
+
+
+def report_progress(progress_callback, completed, total, message, delta=None):
+    """Call a progress callback, feeding record(delta) first when it supports it."""
+    if progress_callback is None:
+        return
+    if delta is not None and hasattr(progress_callback, "record"):
+        progress_callback.record(delta)
+    progress_callback(completed, total, message)
+
+
+class NdjsonProgress:
+    """
+    Progress callback that prints one JSON object per line.
+
+    Lines are throttled to one per `interval` seconds (plus the last one), so
+    a million-agent run does not flood the pipe. Message types:
+        {"type": "start", ...}     run parameters
+        {"type": "progress", ...}  completed/total, visitors/clicks/purchases per
+                                   variant (running counts for sequential tests),
+                                   clicked/purchased/failed/dropped, 5 most recent events
+        {"type": "result", ...}    final results dict
+    """
+
+    def __init__(self, stream=None, interval: float = 0.5, recent: int = 5):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.visitors = {}
+        self.clicks = {}
+        self.purchases = {}
+        self.clicked = 0
+        self.purchased = 0
+        self.failed = 0
+        self.dropped = 0  # Load-profile arrivals shed while the load box was saturated
+        self.recent = deque(maxlen=recent)
+        self._started = time.time()
+        self._last_emit = 0.0
+
+    def record(self, delta: dict):
+        for field in ("visitors", "clicks", "purchases"):
+            totals = getattr(self, field)
+            for variant, n in delta.get(field, {}).items():
+                totals[variant] = totals.get(variant, 0) + n
+        self.clicked += delta.get("clicked", 0)
+        self.purchased += delta.get("purchased", 0)
+        self.failed += delta.get("failed", 0)
+        self.dropped += delta.get("dropped", 0)
+        now = time.strftime("%H:%M:%S")
+        for event_name, user_id in delta.get("events", ())[-self.recent.maxlen:]:
+            self.recent.appendleft({"timestamp": now, "user_id": user_id, "event_name": event_name})
+
+    def __call__(self, current, total, message):
+        now = time.time()
+        if current < total and now - self._last_emit < self.interval:
+            return
+        self._last_emit = now
+        self.emit({
+            "type": "progress",
+            "completed": current,
+            "total": total,
+            "message": message,
+            "visitors": self.visitors,
+            "clicks": self.clicks,
+            "purchases": self.purchases,
+            "clicked": self.clicked,
+            "purchased": self.purchased,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "recent": list(self.recent),
+            "elapsed_sec": round(now - self._started, 2),
+        })
+
+    def emit(self, payload: dict):
+        self.stream.write(json.dumps(payload, ensure_ascii=False, default=str) + "\n")
+        self.stream.flush()
+
+
+def parse_progress_line(line: str):
+    """Decode one runner output line; returns None for non-JSON (e.g. log) lines."""
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
@@ -2,12 +2,25 @@
 Agent Swarm Runner
 Orchestrates multiple agents to simulate realistic user traffic.
 """
+import asyncio
+import multiprocessing
+import os
+import queue
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import httpx
+import numpy as np
 from agent_swarm.agent import HeuristicAgent
 from agent_swarm.behaviors import get_behavior_by_name
+from agent_swarm.load_profiles import arrival_times, parse_profile
+from agent_swarm.metrics import SLO, SwarmMetrics, apply_slo, format_report
+from agent_swarm.progress import NdjsonProgress, report_progress, session_delta
+from agent_swarm.seeding import agent_id_base
 
-def run_agent_swarm(config, progress_callback=None, run_id=None, weight=1.0):
+DEFAULT_ASYNC_CONCURRENCY = 500  # Concurrent sessions held by the async runner
+DEFAULT_MAX_IN_FLIGHT = 5000  # Open-loop safety cap on concurrent sessions
+
+def run_agent_swarm(config, progress_callback=None, run_id=None, weight=1.0, seed=None):
     """
     Runs a swarm of agents with specified distribution.
 
@@ -16,6 +29,7 @@ def run_agent_swarm(config, progress_callback=None, run_id=None, weight=1.0):
         progress_callback: Optional function to report progress (current, total, message)
         run_id: Optional unique identifier for this experiment run
         weight: Statistical weight for hybrid simulation (default 1.0)
+        seed: Optional run seed; fixes agent ids and every agent's decisions for replay
 
     Returns:
         Dict with results summary
@@ -24,28 +38,14 @@ def run_agent_swarm(config, progress_callback=None, run_id=None, weight=1.0):
     if not run_id:
         run_id = f"run_{int(time.time() * 1000)}"
 
-    # Generate agent list
-    agents = []
-    agent_id_counter = int(time.time() * 1000)  # Unique ID base
+    agents = _build_agents(config, run_id, weight, seed=seed)
+    results = _new_results(len(agents))
+    _run_agents_threaded(agents, results, progress_callback)
+    return _finish_results(results, run_id, weight)
 
-    for trait, count in config.items():
-        for i in range(count):
-            agent_id = f"agent_{trait}_{agent_id_counter + i}"
-            # Use Factory to get Behavior Object
-            behavior = get_behavior_by_name(trait)
-            agents.append(HeuristicAgent(agent_id, behavior, run_id, weight))
-    
+
+def _run_agents_threaded(agents, results, progress_callback=None):
     total = len(agents)
-    results = {
-        "total": total,
-        "success": 0,
-        "failed": 0,
-        "clicked": 0,
-        "bounced": 0,
-        "purchased": 0,
-        "by_trait": {}
-    }
-    
     # Run agents concurrently (reduced for Render free tier)
     with ThreadPoolExecutor(max_workers=10) as executor:
         futures = {executor.submit(agent.run_session): agent for agent in agents}
@@ -54,40 +54,383 @@ def run_agent_swarm(config, progress_callback=None, run_id=None, weight=1.0):
         for future in as_completed(futures):
             agent = futures[future]
             result = future.result()
-            
+            _record_result(results, result)
             completed += 1
             
-            # Update results
-            if result.get("success"):
-                results["success"] += 1
-                if result.get("clicked"):
-                    results["clicked"] += 1
-                if result.get("bounced"):
-                    results["bounced"] += 1
-                if result.get("purchased"):
-                    results["purchased"] += 1
-
-                # Track by trait
-                trait = result["trait"]
-                if trait not in results["by_trait"]:
-                    results["by_trait"][trait] = {"total": 0, "clicked": 0, "bounced": 0, "purchased": 0}
-                results["by_trait"][trait]["total"] += 1
-                if result.get("clicked"):
-                    results["by_trait"][trait]["clicked"] += 1
-                if result.get("bounced"):
-                    results["by_trait"][trait]["bounced"] += 1
-                if result.get("purchased"):
-                    results["by_trait"][trait]["purchased"] += 1
+            # Progress callback
+            report_progress(progress_callback, completed, total, f"{agent.behavior.name} 에이전트 완료",
+                            session_delta(result))
+
+
+def run_agent_swarm_async(config, progress_callback=None, run_id=None, weight=1.0,
+                          concurrency=DEFAULT_ASYNC_CONCURRENCY, rps=None, seed=None):
+    """
+    Runs a swarm of agents on asyncio + httpx (blocking wrapper).
+
+    Same arguments and results dict as run_agent_swarm, plus:
+        concurrency: Max sessions in flight (also the connection pool size)
+        rps: Optional cap on requests per second across all sessions
+    """
+    return asyncio.run(arun_agent_swarm(config, progress_callback, run_id, weight, concurrency, rps, seed=seed))
+
+
+async def arun_agent_swarm(config, progress_callback=None, run_id=None, weight=1.0,
+                           concurrency=DEFAULT_ASYNC_CONCURRENCY, rps=None, transport=None, seed=None):
+    """
+    Async body of run_agent_swarm_async; awaitable from an existing event loop.
+    `transport` lets callers route requests in-process (e.g. httpx.MockTransport).
+    """
+    if not run_id:
+        run_id = f"run_{int(time.time() * 1000)}"
+
+    agents = _build_agents(config, run_id, weight, seed=seed)
+    results = _new_results(len(agents))
+    await _arun_agents(agents, results, progress_callback, concurrency, rps, transport)
+    return _finish_results(results, run_id, weight)
+
+
+async def _arun_agents(agents, results, progress_callback=None, concurrency=DEFAULT_ASYNC_CONCURRENCY,
+                       rps=None, transport=None):
+    total = len(agents)
+    pending = iter(agents)
+    completed = 0
+
+    limiter = AsyncRateLimiter(rps) if rps else None
+    hooks = {"request": [limiter.on_request]} if limiter else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def worker(client):
+        # A fixed set of workers pulling from one iterator bounds in-flight sessions
+        # without creating a task per agent up front.
+        nonlocal completed
+        for agent in pending:
+            result = await agent.arun_session(client)
+            _record_result(results, result)
+            completed += 1
+            report_progress(progress_callback, completed, total, f"{agent.behavior.name} 에이전트 완료",
+                            session_delta(result))
+
+    async with httpx.AsyncClient(limits=limits, event_hooks=hooks, transport=transport) as client:
+        await asyncio.gather(*(worker(client) for _ in range(min(concurrency, total))))
+
+
+def run_agent_swarm_sharded(config, progress_callback=None, run_id=None, weight=1.0, processes=None,
+                            engine="async", concurrency=DEFAULT_ASYNC_CONCURRENCY, rps=None, seed=None):
+    """
+    Runs a swarm split across a process pool, one shard per process.
+
+    Each worker runs its slice with its own session pool ("async" or threaded
+    "http" engine) and returns a partial results dict; partials are merged
+    into the usual summary. `concurrency` and `rps` are split across shards.
+
+    Args:
+        config: Dict with trait counts, e.g. {"impulsive": 20, "calculator": 25, ...}
+        progress_callback: Optional function to report progress (current, total, message)
+        run_id: Optional unique identifier for this experiment run
+        weight: Statistical weight for hybrid simulation (default 1.0)
+        processes: Number of worker processes (default: CPU count)
+
+    Returns:
+        Dict with results summary
+    """
+    if engine not in ("async", "http"):
+        raise ValueError(f"Sharding supports the 'async' and 'http' engines, not {engine!r}")
+    if not run_id:
+        run_id = f"run_{int(time.time() * 1000)}"
+
+    processes = processes or os.cpu_count() or 1
+    shards = shard_config(config, processes)
+    id_base = agent_id_base(seed)  # Shared so agent ids match an unsharded run
+    total = sum(config.values())
+    shard_concurrency = max(1, concurrency // len(shards))
+    shard_rps = rps / len(shards) if rps else None
+
+    partials = []
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [
+                pool.submit(_run_shard, engine, shard, run_id, weight, id_base,
+                            shard_concurrency, shard_rps, progress_queue, seed)
+                for shard in shards
+            ]
+            completed = 0
+            while not all(f.done() for f in futures):
+                try:
+                    msg, delta = progress_queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                completed += 1
+                report_progress(progress_callback, completed, total, msg, delta)
+            # Workers put before returning, so once all are done the rest is already queued
+            while True:
+                try:
+                    msg, delta = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                completed += 1
+                report_progress(progress_callback, completed, total, msg, delta)
+            partials = [f.result() for f in futures]
+
+    return _finish_results(merge_results(partials), run_id, weight)
+
+
+def shard_config(config, shards):
+    """
+    Split trait counts into at most `shards` slices of near-equal size.
+
+    Returns:
+        List of (config, offsets) where offsets[trait] is the index of the
+        shard's first agent of that trait within the full run.
+    """
+    total = sum(config.values())
+    shards = max(1, min(shards, total))
+    slices = [({}, {}) for _ in range(shards)]
+    for trait, count in config.items():
+        start = 0
+        for k, (shard_cfg, offsets) in enumerate(slices):
+            size = count // shards + (1 if k < count % shards else 0)
+            if size:
+                shard_cfg[trait] = size
+                offsets[trait] = start
+            start += size
+    return [s for s in slices if s[0]]
+
+
+def merge_results(partials):
+    """Sum partial results dicts (including by_trait) into one summary."""
+    merged = _new_results(0)
+    merged["metrics"].started_at = float("inf")  # Take the earliest shard start
+    for part in partials:
+        for key in ("total", "success", "failed", "clicked", "bounced", "purchased"):
+            merged[key] += part.get(key, 0)
+        for trait, stats in part.get("by_trait", {}).items():
+            target = merged["by_trait"].setdefault(trait, {"total": 0, "clicked": 0, "bounced": 0, "purchased": 0})
+            for key, value in stats.items():
+                target[key] = target.get(key, 0) + value
+        if "metrics" in part:
+            merged["metrics"].merge(part["metrics"])
+    return merged
+
+
+def _run_shard(engine, shard, run_id, weight, id_base, concurrency, rps, progress_queue, seed=None):
+    """Process-pool entry point: run one shard and return its partial results."""
+    shard_cfg, offsets = shard
+    agents = _build_agents(shard_cfg, run_id, weight, id_base=id_base, offsets=offsets, seed=seed)
+    results = _new_results(len(agents))
+    report = _QueueProgress(progress_queue)
+    if engine == "async":
+        asyncio.run(_arun_agents(agents, results, report, concurrency, rps))
+    else:
+        _run_agents_threaded(agents, results, report)
+    results["metrics"].finish()
+    return results
+
+
+def run_load_profile(config, profile, progress_callback=None, run_id=None, weight=1.0, seed=None,
+                     max_in_flight=DEFAULT_MAX_IN_FLIGHT, arrivals=None):
+    """
+    Runs an open-loop swarm whose session arrivals follow a load profile (blocking wrapper).
+
+    Args:
+        config: Trait mix as relative counts, e.g. {"impulsive": 20, "calculator": 25, ...};
+                the number of sessions comes from the profile
+        profile: agent_swarm.load_profiles.LoadProfile
+        progress_callback: Optional function to report progress (current, total, message)
+        run_id: Optional unique identifier for this experiment run
+        weight: Statistical weight for hybrid simulation (default 1.0)
+        seed: Optional run seed (arrival jitter, trait order, agent ids and decisions)
+        max_in_flight: Sessions allowed in flight; arrivals beyond it are dropped
+        arrivals: Optional precomputed arrival_times(profile) (e.g. to announce the session count first)
+
+    Returns:
+        Dict with results summary (plus dropped, offered_rps, schedule_lag_max_ms)
+    """
+    return asyncio.run(arun_load_profile(config, profile, progress_callback, run_id, weight, seed, max_in_flight,
+                                         arrivals=arrivals))
+
+
+async def arun_load_profile(config, profile, progress_callback=None, run_id=None, weight=1.0, seed=None,
+                            max_in_flight=DEFAULT_MAX_IN_FLIGHT, transport=None, arrivals=None):
+    """
+    Async body of run_load_profile.
+
+    Sessions start on the arrival schedule whether or not earlier ones have
+    finished (open loop), so a slow target app builds up in-flight sessions
+    instead of silently lowering the offered load.
+    """
+    if not run_id:
+        run_id = f"run_{int(time.time() * 1000)}"
+
+    rng = np.random.default_rng(seed)
+    arrivals = arrival_times(profile, rng) if arrivals is None else np.asarray(arrivals, dtype=float)
+    agents = _build_agents(_mix_counts(config, len(arrivals)), run_id, weight, seed=seed)
+    order = rng.permutation(len(agents))  # Interleave traits over time
+    total = len(agents)
+    results = _new_results(total)
+    results["dropped"] = 0
+    lag_max = 0.0
+    completed = 0
+    in_flight = set()
+
+    def on_done(task):
+        nonlocal completed
+        in_flight.discard(task)
+        result = task.result()
+        _record_result(results, result)
+        completed += 1
+        report_progress(progress_callback, completed, total, f"{profile.name} 부하 진행 중", session_delta(result))
+
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(limits=limits, transport=transport) as client:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for offset, idx in zip(arrivals, order):
+            delay = start + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
             else:
+                lag_max = max(lag_max, -delay)
+            if len(in_flight) >= max_in_flight:
+                # Load box saturated: record the miss rather than delaying the schedule
+                results["dropped"] += 1
                 results["failed"] += 1
-            
-            # Progress callback
-            if progress_callback:
-                progress_callback(completed, total, f"{agent.behavior.name} 에이전트 완료")
+                completed += 1
+                report_progress(progress_callback, completed, total,
+                                f"{profile.name} 부하 포화: 세션 {results['dropped']}건 드롭", {"failed": 1, "dropped": 1})
+                continue
+            task = asyncio.create_task(agents[idx].arun_session(client))
+            in_flight.add(task)
+            task.add_done_callback(on_done)
+        if in_flight:
+            await asyncio.wait(set(in_flight))
+
+    results["profile"] = profile.name
+    results["offered_rps"] = round(total / profile.duration, 3) if profile.duration else 0.0
+    results["schedule_lag_max_ms"] = round(lag_max * 1000, 1)
+    return _finish_results(results, run_id, weight)
+
+
+def _mix_counts(config, n):
+    """Split n sessions across traits in proportion to config (largest remainder)."""
+    weight_total = sum(config.values())
+    if n == 0 or weight_total == 0:
+        return {trait: 0 for trait in config}
+    exact = {trait: n * w / weight_total for trait, w in config.items()}
+    counts = {trait: int(v) for trait, v in exact.items()}
+    short = n - sum(counts.values())
+    for trait in sorted(exact, key=lambda t: exact[t] - counts[t], reverse=True)[:short]:
+        counts[trait] += 1
+    return counts
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket shared by all sessions of an async swarm.
+    Installed as an httpx request hook, so agents stay unaware of pacing.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate / 10)  # ~100ms of traffic
+        self._tokens = self.burst
+        self._last = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._last is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
 
+    async def on_request(self, request):
+        await self.acquire()
+
+
+class _QueueProgress:
+    """Shard-side progress callback forwarding (message, delta) to the parent process."""
+
+    def __init__(self, progress_queue):
+        self._queue = progress_queue
+        self._delta = None
+
+    def record(self, delta):
+        self._delta = delta
+
+    def __call__(self, current, total, message):
+        self._queue.put((message, self._delta))
+        self._delta = None
+
+
+def _build_agents(config, run_id, weight, id_base=None, offsets=None, seed=None):
+    agents = []
+    agent_id_counter = id_base or agent_id_base(seed)  # Unique ID base
+    offsets = offsets or {}
+
+    for trait, count in config.items():
+        # Use Factory to get Behavior Object
+        behavior = get_behavior_by_name(trait)
+        start = offsets.get(trait, 0)
+        for i in range(start, start + count):
+            agent_id = f"agent_{trait}_{agent_id_counter + i}"
+            agents.append(HeuristicAgent(agent_id, behavior, run_id, weight, seed=seed))
+    return agents
+
+
+def _new_results(total):
+    return {
+        "total": total,
+        "success": 0,
+        "failed": 0,
+        "clicked": 0,
+        "bounced": 0,
+        "purchased": 0,
+        "by_trait": {},
+        "metrics": SwarmMetrics()  # Replaced by the "latency" report in _finish_results
+    }
+
+
+def _record_result(results, result):
+    """Fold one session result into the summary."""
+    trait = result.get("trait", "unknown")
+    for endpoint, seconds, ok in result.get("timings", ()):
+        results["metrics"].record(trait, endpoint, seconds, ok)
+
+    if result.get("success"):
+        results["success"] += 1
+        if result.get("clicked"):
+            results["clicked"] += 1
+        if result.get("bounced"):
+            results["bounced"] += 1
+        if result.get("purchased"):
+            results["purchased"] += 1
+
+        # Track by trait
+        if trait not in results["by_trait"]:
+            results["by_trait"][trait] = {"total": 0, "clicked": 0, "bounced": 0, "purchased": 0}
+        results["by_trait"][trait]["total"] += 1
+        if result.get("clicked"):
+            results["by_trait"][trait]["clicked"] += 1
+        if result.get("bounced"):
+            results["by_trait"][trait]["bounced"] += 1
+        if result.get("purchased"):
+            results["by_trait"][trait]["purchased"] += 1
+    else:
+        results["failed"] += 1
+
+
+def _finish_results(results, run_id, weight):
+    results["latency"] = results.pop("metrics").report()
     results["run_id"] = run_id
     results["weight"] = weight
-    results["effective_total"] = int(total * weight)
+    results["effective_total"] = int(results["total"] * weight)
     return results
 
 
@@ -110,14 +453,53 @@ if __name__ == "__main__":
     parser.add_argument("--count", type=int, default=100, help="Total number of agents")
     parser.add_argument("--weights", type=str, default="40,10,20,20,10", help="Weights (Window, Mission, Rational, Impulsive, Cautious)")
     parser.add_argument("--turbo", action="store_true", help="Run without delays")
+    parser.add_argument("--journeys", action="store_true",
+                        help="Walk /search, /detail, /cart, /tracking after the banner (persona Markov journeys)")
     parser.add_argument("--run-id", type=str, default=None, help="Unique run identifier for experiment isolation")
     parser.add_argument("--weight", type=float, default=1.0, help="Statistical weight for hybrid simulation")
+    parser.add_argument("--engine", choices=["http", "async", "direct"], default=None,
+                        help="http (default): threaded agents; async: asyncio/httpx agents (always used by --profile); direct: vectorized in-process simulation with bulk DB writes")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_ASYNC_CONCURRENCY, help="Concurrent sessions (async engine)")
+    parser.add_argument("--rps", type=float, default=None, help="Max requests per second (async engine)")
+    parser.add_argument("--seed", type=int, default=None, help="Run seed for reproducible agent ids and decisions (all engines)")
+    parser.add_argument("--profile", type=str, default=None,
+                        help="Open-loop load profile, e.g. 'ramp:start=1,end=200,duration=300' (session count comes from the profile)")
+    parser.add_argument("--slo-p95-ms", type=float, default=500.0, help="Per-endpoint p95 latency objective")
+    parser.add_argument("--slo-p99-ms", type=float, default=1000.0, help="Per-endpoint p99 latency objective")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01, help="Per-endpoint error rate objective")
+    parser.add_argument("--processes", type=int, default=1, help="Shard http/async engines across N processes (0 = all cores)")
+    parser.add_argument("--allocation", type=str, default=None,
+                        help="Traffic allocation of the active experiment, e.g. 'A:50,B:25,C:25' (default: 50/50 A/B)")
+    parser.add_argument("--stop-file", type=str, default=None,
+                        help="Direct engine: stop after the current chunk once this file exists, keeping (committing) the chunks written so far")
+    parser.add_argument("--progress-format", choices=["text", "ndjson"], default="text",
+                        help="ndjson: one JSON object per line on stdout (consumed by the Streamlit dashboard)")
 
     args = parser.parse_args()
+    profile = None
+    if args.profile:
+        # Load profiles run open-loop asyncio agents in this process at the profile's own rate
+        try:
+            profile = parse_profile(args.profile)
+        except ValueError as e:
+            parser.error(f"--profile: {e}")
+        if args.engine not in (None, "async"):
+            parser.error(f"--profile runs the async engine; --engine {args.engine} is not supported with it")
+        if args.processes != 1:
+            parser.error("--profile does not support --processes")
+        if args.rps is not None:
+            parser.error("--profile sets the arrival rate; drop --rps")
+    args.engine = args.engine or ("async" if args.profile else "http")
+    if args.stop_file and args.engine != "direct":
+        parser.error("--stop-file is only supported with --engine direct")
     
     if args.turbo:
-        import os
         os.environ["AGENT_TURBO"] = "1"
+    if args.journeys:
+        os.environ["AGENT_JOURNEYS"] = "1"
+    if args.allocation:
+        from src.core.allocation import ALLOCATION_ENV, compile_allocation
+        os.environ[ALLOCATION_ENV] = compile_allocation(args.allocation).spec()  # Validated; inherited by shards
     
     # Map weights to trait names (matching app.py UI order)
     traits = ["window", "mission", "rational", "impulsive", "cautious"]
@@ -137,19 +519,62 @@ if __name__ == "__main__":
     if current_total < args.count:
         config["window"] += (args.count - current_total)
 
-    def progress(current, total, msg):
-        print(f"[{current}/{total}] {msg}")
-        sys.stdout.flush()
+    # A load profile decides the number of sessions (its arrivals), not --count
+    sessions, arrivals = args.count, None
+    if profile is not None:
+        arrivals = arrival_times(profile, np.random.default_rng(args.seed))
+        sessions = len(arrivals)
+        config = _mix_counts(config, sessions)
+
+    ndjson = args.progress_format == "ndjson"
+    if ndjson:
+        progress = NdjsonProgress()
+        progress.emit({"type": "start", "total": sessions, "weight": args.weight, "traits": config,
+                       "run_id": args.run_id, "engine": args.engine})
+    else:
+        def progress(current, total, msg):
+            print(f"[{current}/{total}] {msg}")
+            sys.stdout.flush()
+
+        effective = int(sessions * args.weight)
+        print(f"Starting Swarm: Total={sessions}, Effective={effective} (x{args.weight}), Traits={config}, Run ID={args.run_id or 'auto-generated'}, Engine={args.engine}")
 
-    effective = int(args.count * args.weight)
-    print(f"Starting Swarm: Total={args.count}, Effective={effective} (x{args.weight}), Traits={config}, Run ID={args.run_id or 'auto-generated'}")
-    results = run_agent_swarm(config, progress, args.run_id, args.weight)
+    if args.engine == "direct":
+        from agent_swarm.direct import run_direct_swarm
+        should_stop = (lambda: os.path.exists(args.stop_file)) if args.stop_file else None
+        results = run_direct_swarm(config, progress, args.run_id, args.weight, seed=args.seed, should_stop=should_stop)
+    elif args.profile:
+        results = run_load_profile(config, profile, progress, args.run_id, args.weight, seed=args.seed, arrivals=arrivals)
+    elif args.processes != 1:
+        results = run_agent_swarm_sharded(config, progress, args.run_id, args.weight, processes=args.processes or None,
+                                          engine=args.engine, concurrency=args.concurrency, rps=args.rps, seed=args.seed)
+    elif args.engine == "async":
+        results = run_agent_swarm_async(config, progress, args.run_id, args.weight,
+                                        concurrency=args.concurrency, rps=args.rps, seed=args.seed)
+    else:
+        results = run_agent_swarm(config, progress, args.run_id, args.weight, seed=args.seed)
+
+    if results.get("latency", {}).get("requests"):
+        apply_slo(results["latency"], SLO(args.slo_p95_ms, args.slo_p99_ms, args.slo_error_rate))
+
+    if ndjson:
+        progress.emit({"type": "result", **results})
+        sys.exit(1 if results.get("error") else 0)
+
+    if results.get("error"):
+        print(f"Swarm failed: {results['error']}")
+        sys.exit(1)
     
     print("\n=== Results ===")
     print(f"Total: {results['total']}")
     print(f"Success: {results['success']}")
-    print(f"Clicked: {results['clicked']} ({results['clicked']/results['total']*100:.1f}%)")
-    print(f"Purchased: {results['purchased']} ({results['purchased']/results['total']*100:.1f}%)")
+    if results['total']:
+        print(f"Clicked: {results['clicked']} ({results['clicked']/results['total']*100:.1f}%)")
+        print(f"Purchased: {results['purchased']} ({results['purchased']/results['total']*100:.1f}%)")
     for trait, stats in results.get('by_trait', {}).items():
         ctr = stats['clicked'] / stats['total'] * 100 if stats['total'] > 0 else 0
         print(f"  {trait}: CTR={ctr:.1f}%")
+
+    if results.get("latency", {}).get("requests"):
+        print("\n=== Latency / SLO ===")
+        print(format_report(results["latency"]))
@@ -0,0 +1,29 @@
+"""
+Run Seeding
+Derives independent, reproducible random streams from one run seed, so a
+swarm can be replayed exactly and concurrent agents never share the global
+`random` state (or its lock).
+"""
+import hashlib
+import random
+import time
+
+
+def derive_seed(seed: int, *keys) -> int:
+    """Stable 64-bit seed for (seed, *keys); unlike hash(), identical across processes and runs."""
+    material = ":".join(str(part) for part in (seed, *keys)).encode()
+    return int.from_bytes(hashlib.sha256(material).digest()[:8], "big")
+
+
+def agent_rng(seed, agent_id: str) -> random.Random:
+    """Per-agent RNG: derived from the run seed when given, otherwise freshly seeded from OS entropy."""
+    if seed is None:
+        return random.Random()
+    return random.Random(derive_seed(seed, "agent", agent_id))
+
+
+def agent_id_base(seed=None) -> int:
+    """Numeric base for agent ids: wall-clock ms normally, seed-derived (same 13 digits) for replays."""
+    if seed is None:
+        return int(time.time() * 1000)
+    return 10**12 + derive_seed(seed, "agent_id_base") % (9 * 10**12)
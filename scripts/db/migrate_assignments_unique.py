@@ -0,0 +1,86 @@
+"""
+Database Migration Script - Unique (user_id, run_id) on assignments
+Removes duplicate run-scoped assignments (keeps the earliest) and adds the
+unique index the Target App uses for INSERT ... ON CONFLICT DO NOTHING.
+Supports both DuckDB (local) and PostgreSQL (Supabase cloud).
+"""
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.data.db import EXPERIMENT_DB_PATH, is_cloud_mode, get_pg_connection
+
+INDEX_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_user_run ON assignments (user_id, run_id)"
+
+def migrate_duckdb():
+    import duckdb
+    print(f"[>] Starting assignments migration on {EXPERIMENT_DB_PATH}...")
+
+    if not os.path.exists(EXPERIMENT_DB_PATH):
+        print(f"[!] Database not found at {EXPERIMENT_DB_PATH}")
+        print("[*] Please run: python src/data/db.py first")
+        return
+
+    con = duckdb.connect(EXPERIMENT_DB_PATH)
+    try:
+        print("[1] Removing duplicate (user_id, run_id) assignments...")
+        removed = con.execute("""
+            DELETE FROM assignments
+            WHERE run_id IS NOT NULL
+              AND rowid NOT IN (
+                  SELECT arg_min(rowid, assigned_at)
+                  FROM assignments
+                  WHERE run_id IS NOT NULL
+                  GROUP BY user_id, run_id
+              )
+        """).fetchone()[0]
+        print(f"    Removed {removed} duplicate rows")
+
+        print("[2] Creating unique index...")
+        con.execute(INDEX_SQL)
+
+        print("[✓] Migration completed successfully!")
+        print("")
+        print("Next steps:")
+        print("  1. Restart target app: python target_app/main.py")
+    except Exception as e:
+        print(f"[X] Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        con.close()
+
+def migrate_pg():
+    print("[>] Starting assignments migration on PostgreSQL...")
+    try:
+        with get_pg_connection() as conn:
+            with conn.cursor() as cur:
+                print("[1] Removing duplicate (user_id, run_id) assignments...")
+                cur.execute("""
+                    DELETE FROM assignments a
+                    USING assignments b
+                    WHERE a.run_id IS NOT NULL
+                      AND a.user_id = b.user_id
+                      AND a.run_id = b.run_id
+                      AND a.id > b.id
+                """)
+                print(f"    Removed {cur.rowcount} duplicate rows")
+
+                print("[2] Creating unique index...")
+                cur.execute(INDEX_SQL)
+        print("[✓] Migration completed successfully!")
+    except Exception as e:
+        print(f"[X] Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+def migrate():
+    if is_cloud_mode():
+        migrate_pg()
+    else:
+        migrate_duckdb()
+
+if __name__ == "__main__":
+    migrate()
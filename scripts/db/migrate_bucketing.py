@@ -0,0 +1,134 @@
+"""
+Database Migration Script - Versioned assignment hashing
+Pins the hash version of the active experiment's allocation, so its users keep
+their buckets whatever the defaults of src.core.bucketing become:
+NULL / plain weight allocations are rewritten as explicit legacy md5 configs.
+
+With --fast, moves the active experiment to the salted fast hash instead. That
+reassigns users, so the script first reports how many already-assigned users
+would change variant and only writes with --apply.
+Supports both DuckDB (local) and PostgreSQL (Supabase cloud).
+
+    python scripts/db/migrate_bucketing.py                      # pin legacy md5
+    python scripts/db/migrate_bucketing.py --fast --salt exp_42  # dry run: reassignment report
+    python scripts/db/migrate_bucketing.py --fast --salt exp_42 --apply
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.core.allocation import AllocationTable
+from src.data.db import EXPERIMENT_DB_PATH, is_cloud_mode, get_pg_connection
+
+SAMPLE_USERS = 100_000  # Assigned users checked for the reassignment report
+
+def plan(allocation, fast=False, salt=None):
+    """(current table, migrated table) for a stored allocation value."""
+    current = AllocationTable(allocation or None)
+    return current, current.migrate(salt or "exp_migrated") if fast else current
+
+def reassignment_report(current, target, user_ids: pd.Series) -> float:
+    """Share of users whose variant changes between two tables (vectorized per distinct id)."""
+    if user_ids.empty:
+        return 0.0
+    return float((current.variants_series(user_ids) != target.variants_series(user_ids)).mean())
+
+def _migrate(fetch_allocation, fetch_users, write_allocation, fast, salt, apply):
+    row = fetch_allocation()
+    if row is None:
+        print("[*] No active experiment; nothing to migrate")
+        return
+    current, target = plan(row, fast, salt)
+    print(f"    Current: {current.config()}")
+    print(f"    Target:  {target.config()}")
+
+    if fast:
+        users = fetch_users()
+        changed = reassignment_report(current, target, users)
+        print(f"[2] {changed * 100:.1f}% of {len(users):,} sampled assigned users would change variant")
+        if not apply:
+            print("[*] Dry run; re-run with --apply to write the new allocation")
+            return
+
+    write_allocation(target.to_json())
+    print("[✓] Migration completed successfully!")
+    print("")
+    print("Next steps:")
+    print("  1. Restart target app (or wait for the experiment state TTL): python target_app/main.py")
+
+def migrate_duckdb(fast=False, salt=None, apply=False):
+    import duckdb
+    print(f"[>] Starting bucketing migration on {EXPERIMENT_DB_PATH}...")
+
+    if not os.path.exists(EXPERIMENT_DB_PATH):
+        print(f"[!] Database not found at {EXPERIMENT_DB_PATH}")
+        print("[*] Please run: python src/data/db.py first")
+        return
+
+    con = duckdb.connect(EXPERIMENT_DB_PATH)
+    try:
+        print("[1] Reading active experiment allocation...")
+        con.execute("ALTER TABLE active_experiment ADD COLUMN IF NOT EXISTS allocation VARCHAR")
+
+        def fetch_allocation():
+            row = con.execute("SELECT allocation FROM active_experiment WHERE is_active = true LIMIT 1").fetchone()
+            return None if row is None else (row[0] or "")
+
+        def fetch_users():
+            return con.execute(f"SELECT DISTINCT user_id FROM assignments LIMIT {SAMPLE_USERS}").df()["user_id"]
+
+        def write_allocation(value):
+            con.execute("UPDATE active_experiment SET allocation = ? WHERE is_active = true", [value])
+
+        _migrate(fetch_allocation, fetch_users, write_allocation, fast, salt, apply)
+    except Exception as e:
+        print(f"[X] Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        con.close()
+
+def migrate_pg(fast=False, salt=None, apply=False):
+    print("[>] Starting bucketing migration on PostgreSQL...")
+    try:
+        with get_pg_connection() as conn:
+            with conn.cursor() as cur:
+                print("[1] Reading active experiment allocation...")
+                cur.execute("ALTER TABLE active_experiment ADD COLUMN IF NOT EXISTS allocation TEXT")
+
+                def fetch_allocation():
+                    cur.execute("SELECT allocation FROM active_experiment WHERE is_active = true LIMIT 1")
+                    row = cur.fetchone()
+                    return None if row is None else (row[0] or "")
+
+                def fetch_users():
+                    cur.execute(f"SELECT DISTINCT user_id FROM assignments LIMIT {SAMPLE_USERS}")
+                    return pd.Series([r[0] for r in cur.fetchall()], dtype=object)
+
+                def write_allocation(value):
+                    cur.execute("UPDATE active_experiment SET allocation = %s WHERE is_active = true", (value,))
+
+                _migrate(fetch_allocation, fetch_users, write_allocation, fast, salt, apply)
+    except Exception as e:
+        print(f"[X] Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+def migrate(fast=False, salt=None, apply=False):
+    if is_cloud_mode():
+        migrate_pg(fast, salt, apply)
+    else:
+        migrate_duckdb(fast, salt, apply)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pin or migrate the assignment hash of the active experiment")
+    parser.add_argument("--fast", action="store_true", help="Move to the salted fast hash (reassigns users)")
+    parser.add_argument("--salt", type=str, default=None, help="Salt for --fast (default: exp_migrated)")
+    parser.add_argument("--apply", action="store_true", help="Write the --fast migration (default: report only)")
+    args = parser.parse_args()
+    migrate(args.fast, args.salt, args.apply)
@@ -0,0 +1,69 @@
+"""
+Bucketing Benchmark
+Times the original assignment hash (md5 hex digest -> big int -> % 100, once per
+id) against src.core.bucketing: scalar calls per request, bulk arrays for the
+direct engine and pandas Series with repeated ids (event logs).
+
+    python scripts/utils/benchmark_bucketing.py --count 200000
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.core.bucketing import FAST_HASH, LEGACY_HASH, get_bucketer
+
+def original_bucket(uid, buckets=100):
+    """The pre-bucketing-module path (target_app / HeuristicAgent / stats.get_bucket)."""
+    return int(hashlib.md5(str(uid).encode()).hexdigest(), 16) % buckets
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run(count=200_000, repeat=3, events_per_user=5):
+    ids = [f"agent_impulsive_{i}" for i in range(count)]
+    events = pd.Series(np.repeat(np.array(ids, dtype=object), events_per_user))
+    legacy, fast = get_bucketer("", LEGACY_HASH), get_bucketer("exp_bench", FAST_HASH)
+
+    cases = [
+        ("original md5 scalar loop", lambda: [original_bucket(uid) for uid in ids], count),
+        ("legacy md5 scalar", lambda: [legacy.bucket(uid) for uid in ids], count),
+        ("fast b2 scalar", lambda: [fast.bucket(uid) for uid in ids], count),
+        ("legacy md5 bulk", lambda: legacy.buckets(ids), count),
+        ("fast b2 bulk", lambda: fast.buckets(ids), count),
+        ("original md5 per event", lambda: events.map(original_bucket), len(events)),
+        ("fast b2 Series (distinct ids)", lambda: fast.bucket_series(events), len(events)),
+    ]
+
+    baseline = None
+    results = {}
+    print(f"{'case':32s} {'ns/id':>8s} {'speedup':>8s}")
+    for name, fn, n in cases:
+        seconds, out = best_of(fn, repeat)
+        per_id = seconds / n * 1e9
+        baseline = baseline or per_id
+        results[name] = out
+        print(f"{name:32s} {per_id:8.0f} {baseline / per_id:7.1f}x")
+
+    same = np.array_equal(np.asarray(results["original md5 scalar loop"]), results["legacy md5 bulk"])
+    print(f"\nLegacy buckets identical to the original path: {same}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark assignment bucketing")
+    parser.add_argument("--count", type=int, default=200_000, help="Distinct user ids")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    args = parser.parse_args()
+    run(args.count, args.repeat)
@@ -9,6 +9,7 @@ import streamlit.components.v1 as components
 
 import sys
 import os
+import tempfile
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -34,6 +35,8 @@ if os.name == 'nt':  # Windows
 from src.core import stats as al
 from src.ui import components as ui
 from src.core import mart_builder as mb  # New Module
+from src.core.allocation import AllocationTable
+from src.core.bucketing import FAST_HASH
 
 # =========================================================
 # Environment Configuration with Streamlit Secrets Priority
@@ -649,7 +652,7 @@ elif st.session_state['page'] == 'study':
                                      help="최신 채택을 취소하고 기본 상태로 복구합니다"):
                             # Delete the latest adoption record
                             try:
-                                from src.data.db import safe_write_batch
+                                from src.data.db import safe_write_batch, invalidate_target_app_cache
                                 rollback_ops = [
                                     (f"DELETE FROM adoptions WHERE experiment_id = '{exp_id}'", None)
                                 ]
@@ -657,6 +660,7 @@ elif st.session_state['page'] == 'study':
 
                                 if result['status'] == 'success':
                                     st.cache_data.clear()
+                                    invalidate_target_app_cache()
                                     st.toast("✅ 롤백 완료! Baseline이 기본값으로 복구되었습니다.")
                                     st.rerun()
                                 else:
@@ -951,16 +955,19 @@ elif st.session_state['page'] == 'study':
                         # Activate experiment for A/B testing
                         # (keeps previous adoptions as baseline, enables new A/B split)
                         try:
-                            from src.data.db import safe_write_batch
+                            from src.data.db import safe_write_batch, invalidate_target_app_cache
                             result = safe_write_batch([
-                                ("CREATE TABLE IF NOT EXISTS active_experiment (id INTEGER PRIMARY KEY, is_active BOOLEAN, started_at TIMESTAMP)", None),
+                                ("CREATE TABLE IF NOT EXISTS active_experiment (id INTEGER PRIMARY KEY, is_active BOOLEAN, started_at TIMESTAMP, allocation VARCHAR)", None),
+                                ("ALTER TABLE active_experiment ADD COLUMN IF NOT EXISTS allocation VARCHAR", None),
                                 ("DELETE FROM active_experiment", None),
-                                ("INSERT INTO active_experiment VALUES (1, true, CURRENT_TIMESTAMP)", None)
+                                ("INSERT INTO active_experiment (id, is_active, started_at) VALUES (1, true, CURRENT_TIMESTAMP)", None)
                             ], use_coordination=st.session_state.get('db_coordination', True))
                             if result.get('status') == 'success':
+                                invalidate_target_app_cache()
                                 st.toast("🧪 새 실험 활성화 완료", icon="✅")
                         except Exception as e:
                             pass  # Table creation may fail
+                        st.session_state['allocation_salt'] = f"exp_{int(datetime.now().timestamp() * 1000)}"  # Per-experiment bucketing salt
 
                         st.session_state['step'] = 2
                         st.rerun()
@@ -973,8 +980,23 @@ elif st.session_state['page'] == 'study':
         # [Layout: Traffic Split -> Sample Size Calculation]
         
         st.markdown("#### 1️⃣ 트래픽 비율 설정 (Traffic Allocation)")
-        split = st.slider("테스트(B) 그룹 배정 비율", 10, 90, 50, format="%d%%")
-        st.caption(f"나머지 {100-split}%는 Control(A) 그룹에 배정됩니다.")
+        prev_allocation = AllocationTable(st.session_state.get('allocation')).weights
+        arm_count = int(st.number_input("그룹 수 (Control 포함)", 2, 5, len(prev_allocation), step=1,
+                                        help="3개 이상이면 A/B/n 테스트: B, C, ... 변형을 각각 Control(A)과 비교합니다."))
+        arm_labels = [chr(ord('A') + i) for i in range(arm_count)]
+        arm_cols = st.columns(arm_count)
+        arm_weights = {}
+        for i, (col, label) in enumerate(zip(arm_cols, arm_labels)):
+            even = 100 // arm_count
+            default = int(prev_allocation.get(label, 100 - even * (arm_count - 1) if i == 0 else even))
+            role = "Control" if i == 0 else "Test"
+            arm_weights[label] = col.number_input(f"{role}({label}) 비율 %", 1, 99, min(max(default, 1), 99),
+                                                  step=5, key=f"alloc_{arm_count}_{label}")
+        # New experiments bucket users with their own salt (independent of earlier experiments)
+        salt = st.session_state.setdefault('allocation_salt', f"exp_{int(datetime.now().timestamp() * 1000)}")
+        allocation_table = AllocationTable(arm_weights, salt=salt, hash_version=FAST_HASH)
+        arm_shares = allocation_table.shares
+        st.caption("실제 배정 (해시 버킷 100개 기준): " + " | ".join(f"{v} {share * 100:.0f}%" for v, share in arm_shares.items()))
         
         st.divider()
         
@@ -1005,22 +1027,14 @@ elif st.session_state['page'] == 'study':
         mde_percent = st.session_state.get('min_effect', 5) # returns int like 5
         mde = mde_percent / 100.0
         
-        # Calculate Sample Size
-        n_per_group = al.calculate_sample_size(auto_baseline, mde)
+        # Calculate Sample Size (Bonferroni alpha when several test arms are compared to control)
+        comparisons = arm_count - 1
+        design_alpha = 0.05 / comparisons
+        n_per_group = al.calculate_sample_size(auto_baseline, mde, alpha=design_alpha)
         
-        # Account for traffic split
-        control_pct = split / 100.0
-        test_pct = 1.0 - control_pct
-        
-        # For 50:50 split, total = n * 2
-        # For unequal splits, we need more total traffic to get 'n' samples in each group
-        if split == 50:
-            total_needed = n_per_group * 2
-        else:
-            # Calculate based on which group needs more traffic
-            total_for_control = int(n_per_group / control_pct) if control_pct > 0 else n_per_group * 2
-            total_for_test = int(n_per_group / test_pct) if test_pct > 0 else n_per_group * 2
-            total_needed = max(total_for_control, total_for_test)
+        # Account for traffic split: every group needs 'n' samples,
+        # so the smallest group decides the total (50:50 -> n * 2)
+        total_needed = max(int(np.ceil(n_per_group / share)) for share in arm_shares.values())
         
         # Display Metrics in 3 Columns
         c1, c2, c3 = st.columns(3, gap="large")
@@ -1033,7 +1047,7 @@ elif st.session_state['page'] == 'study':
             
         with c3:
             st.metric(f"총 필요 표본 수", f"{total_needed:,}명", 
-                     delta=f"Control {int(total_needed * control_pct):,} | Test {int(total_needed * test_pct):,}", 
+                     delta=" | ".join(f"{v} {int(total_needed * share):,}" for v, share in arm_shares.items()), 
                      delta_color="off",
                      help=f"각 그룹당 최소 {n_per_group:,}명의 샘플이 필요합니다.")
         
@@ -1050,21 +1064,23 @@ elif st.session_state['page'] == 'study':
             - **p₁ (baseline)**: {:.2%} ← 현재 전환율
             - **p₂ (target)**: {:.2%} ← 목표 전환율 (baseline × (1 + MDE))
             - **p̄ (pooled)**: {:.2%} ← (p₁ + p₂) / 2
-            - **Zα**: 1.96 ← 95% 신뢰수준 (α=0.05)
+            - **Zα**: {:.2f} ← 95% 신뢰수준 (α=0.05, 비교 {}개 → Bonferroni α={:.4f})
             - **Zβ**: 0.84 ← 80% 검정력 (β=0.20)
             
             **계산 결과:**
             - **그룹당 필요 샘플**: {:,}명
-            - **트래픽 분배**: Control {}% / Test {}%
+            - **트래픽 분배**: {}
             - **총 방문자 필요**: {:,}명
             
             > ℹ️ 불균등 분배 시, 소수 그룹이 충분한 샘플을 얻기 위해 더 많은 총 방문자가 필요합니다.
+            > A/B/n 테스트는 변형마다 Control과 비교하므로, 거짓 양성을 막기 위해 비교 수만큼 α를 나눕니다 (분석 단계는 Holm 보정).
             """.format(
                 auto_baseline, 
                 auto_baseline * (1 + mde),
                 (auto_baseline + auto_baseline * (1 + mde)) / 2,
+                al.z_critical(design_alpha), comparisons, design_alpha,
                 n_per_group,
-                split, 100-split,
+                " / ".join(f"{v} {share * 100:.0f}%" for v, share in arm_shares.items()),
                 total_needed
             ))
             
@@ -1076,8 +1092,20 @@ elif st.session_state['page'] == 'study':
         st.write("")
         if st.button("다음: 데이터 수집 시작 (Simulation) ➡️", type="primary", width="stretch"):
             st.session_state['n'] = n_per_group
+            st.session_state['baseline'] = float(auto_baseline)  # Scale of the sequential test prior (Step 3)
             st.session_state['total_needed'] = total_needed
-            st.session_state['split'] = split
+            st.session_state['allocation'] = allocation_table.to_json()
+            # Target App assigns visitors from the same compiled allocation table
+            try:
+                from src.data.db import safe_write_batch, invalidate_target_app_cache
+                result = safe_write_batch([
+                    ("ALTER TABLE active_experiment ADD COLUMN IF NOT EXISTS allocation VARCHAR", None),
+                    ("UPDATE active_experiment SET allocation = ? WHERE is_active = true", [allocation_table.to_json()])
+                ], use_coordination=st.session_state.get('db_coordination', True))
+                if result.get('status') == 'success':
+                    invalidate_target_app_cache()
+            except Exception as e:
+                st.warning(f"트래픽 비율 저장 실패 (기본 50:50 배정 사용): {e}")
             st.session_state['step'] = 3
             st.rerun()
 
@@ -1178,6 +1206,7 @@ GROUP BY 1
             with st.container(border=True):
                 st.markdown("#### 📊 실시간 그룹 분포")
                 chart_placeholder = st.empty()
+                sequential_placeholder = st.empty()
                 # Show last chart if available (after simulation completion)
                 if 'last_live_chart' in st.session_state and not st.session_state.get('sim_process'):
                     df_last = st.session_state['last_live_chart']
@@ -1189,6 +1218,13 @@ GROUP BY 1
                     # Initial state
                     with chart_placeholder.container():
                         st.info("데이터 대기 중...")
+                if 'last_sequential' in st.session_state and not st.session_state.get('sim_process'):
+                    control_arm, last_seq = st.session_state['last_sequential']
+                    with sequential_placeholder.container():
+                        for arm, arm_seq in last_seq.items():
+                            if len(last_seq) > 1:
+                                st.caption(f"**{arm} vs {control_arm}**")
+                            ui.sequential_status(arm_seq, control_arm, arm)
         
         with col_sim:
             with st.container(border=True):
@@ -1196,12 +1232,33 @@ GROUP BY 1
                 # Use total_needed from Step 2, fallback to n*2 for backwards compatibility
                 total_target = st.session_state.get('total_needed', st.session_state.get('n', 100) * 2)
                 
-                # Fixed 10 agents for testing (reduced for Render free tier)
-                actual_agents = 10
-                weight_multiplier = total_target / actual_agents
-
-                st.info(f"📊 **투입 규모**: {actual_agents}명 에이전트 → 효과: {total_target:,}명 (×{weight_multiplier:.1f} 증폭)")
-                turbo = st.checkbox("Turbo Mode (무시 지연 제거)", value=True)
+                engine = st.radio(
+                    "시뮬레이션 엔진",
+                    ["HTTP Agent", "Direct (고속)"],
+                    horizontal=True,
+                    help="Direct: HTTP 없이 전체 인원을 NumPy로 한 번에 시뮬레이션하고 DB에 일괄 저장합니다."
+                )
+                use_direct = engine.startswith("Direct")
+
+                if use_direct:
+                    # Direct engine simulates the full population, so no weight amplification
+                    actual_agents = total_target
+                    weight_multiplier = 1.0
+                    st.info(f"📊 **투입 규모**: {actual_agents:,}명 에이전트 (Direct 엔진, 증폭 없음)")
+                    turbo = False
+                    journeys = False  # Direct engine has no page requests
+                else:
+                    # Fixed 10 agents for testing (reduced for Render free tier)
+                    actual_agents = 10
+                    weight_multiplier = total_target / actual_agents
+                    st.info(f"📊 **투입 규모**: {actual_agents}명 에이전트 → 효과: {total_target:,}명 (×{weight_multiplier:.1f} 증폭)")
+                    turbo = st.checkbox("Turbo Mode (무시 지연 제거)", value=True)
+                    journeys = st.checkbox("Page Journeys (검색/상세/장바구니/배송조회 탐색)", value=False,
+                                           help="페르소나별 마르코프 여정으로 /search, /detail, /cart, /tracking 페이지도 방문합니다.")
+                run_seed = st.number_input("Seed (0 = 무작위)", min_value=0, value=0, step=1,
+                                           help="같은 Seed로 실행하면 에이전트 ID와 행동이 그대로 재현됩니다.")
+                early_stop = st.checkbox("조기 종료 (Sequential Test)", value=True,
+                                         help="mSPRT / O'Brien-Fleming 경계로 매 갱신마다 검정하고, 결과가 확정되면 목표 표본 전에 시뮬레이션을 멈춥니다.")
                 
                 col_start, col_stop = st.columns(2)
                 
@@ -1224,6 +1281,17 @@ GROUP BY 1
                                "--run-id", current_run_id,
                                "--weight", str(weight_multiplier)]  # Add weight parameter
                         if turbo: cmd.append("--turbo")
+                        if journeys: cmd.append("--journeys")
+                        stop_file = None
+                        if use_direct:
+                            # The direct engine writes one transaction; it is stopped through a file it
+                            # checks between chunks (commits what it wrote, reconnects the Target App)
+                            stop_file = os.path.join(tempfile.gettempdir(), f"novarium_stop_{current_run_id}")
+                            cmd.extend(["--engine", "direct", "--stop-file", stop_file])
+                        if run_seed: cmd.extend(["--seed", str(int(run_seed))])
+                        allocation_table = AllocationTable(st.session_state.get('allocation'))
+                        cmd.extend(["--allocation", allocation_table.spec()])  # Agents assign like the Target App
+                        cmd.extend(["--progress-format", "ndjson"])  # Live stats come from stdout, not DB polling
                     
                         import subprocess
                         import time
@@ -1240,97 +1308,161 @@ GROUP BY 1
                         log_area = st.empty()
                         
                         try:
-                            # Launch non-blocking with PYTHONPATH
-                            proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                            # Launch non-blocking with PYTHONPATH; stderr is merged so the pipe never fills up
+                            proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                    text=True, bufsize=1)
                             
                             # Store process in session state for Stop button
                             st.session_state['sim_process'] = proc
+
+                            def _stop_runner():
+                                if stop_file:
+                                    open(stop_file, "w").close()  # Cooperative stop, never SIGTERM a bulk write
+                                else:
+                                    proc.terminate()
+
+                            # Reader thread: parse the runner's NDJSON progress lines into a queue
+                            import queue
+                            import threading
+                            from agent_swarm.progress import parse_progress_line
+
+                            messages = queue.Queue()
+
+                            def _read_progress(stream, sink):
+                                for line in stream:
+                                    msg = parse_progress_line(line)
+                                    if msg is not None:
+                                        sink.put(msg)
+
+                            reader = threading.Thread(target=_read_progress, args=(proc.stdout, messages), daemon=True)
+                            reader.start()
                             
-                            # CRITICAL: Wait for process to actually start before polling
-                            time.sleep(0.5)
-                            
+                            # Sequential test on the running counts (valid under continuous peeking),
+                            # one monitor per test arm at a Bonferroni share of alpha
+                            from src.core.sequential import SequentialMonitor
+                            seq_metric = 'purchases' if 'CVR' in st.session_state.get('metric', '') else 'clicks'
+                            planned_per_group = max(1, int(st.session_state.get('n', needed) / weight_multiplier))
+                            control_arm = allocation_table.control
+                            monitors = {
+                                arm: SequentialMonitor(
+                                    planned_per_group,
+                                    alpha=0.05 / len(allocation_table.test_variants),
+                                    tau=st.session_state.get('baseline', 0.10) * st.session_state.get('min_effect', 5) / 100.0,
+                                )
+                                for arm in allocation_table.test_variants
+                            }
+
+                            st.session_state.pop('last_sequential', None)
+                            stopped_early = False
+
                             start_time = time.time()
+                            last_message_at = start_time
                             last_count = 0
                             loop_count = 0
                             
                             # Force initial UI update
                             status_container.update(label="⚙️ 에이전트 투입 중...", state="running")
                             
-                            while proc.poll() is None:
+                            while proc.poll() is None or not messages.empty():
                                 loop_count += 1
                                 
                                 # Check if user requested stop
                                 if st.session_state.get('sim_stop_requested', False):
-                                    proc.terminate()
+                                    _stop_runner()
                                     status_container.update(label="⏹️ 사용자가 중지했습니다", state="error")
                                     st.session_state['sim_stop_requested'] = False
                                     st.session_state.pop('sim_process', None)
                                     break
-                                
-                                # 1. Update Progress
-                                run_filter = st.session_state.get('current_run_id', 'run_0')
-                                df_count = al.run_query(f"SELECT COUNT(*) as cnt FROM assignments WHERE run_id = '{run_filter}'", con=None)
-                                curr_count = df_count.iloc[0]['cnt'] if not df_count.empty else 0
-                                
-                                progress = min(curr_count / needed, 1.0) if needed > 0 else 0
-                                effective_count = int(curr_count * weight_multiplier)
-                                effective_total_display = int(needed * weight_multiplier)
-                                progress_bar.progress(progress, text=f"데이터 수집 중... ({curr_count}/{needed}) → 효과: ({effective_count:,}/{effective_total_display:,}) [Loop: {loop_count}]")
-                                
-                                # 2. Show Live Logs (Ticker)
-                                df_logs = al.run_query(f"""
-                                    SELECT timestamp, user_id, event_name
-                                    FROM events
-                                    WHERE run_id = '{run_filter}'
-                                    ORDER BY timestamp DESC LIMIT 5
-                                """, con=None)
-                                
-                                if not df_logs.empty:
-                                    # Fix: Convert string timestamp (from JSON API) to datetime object
-                                    df_logs['timestamp'] = pd.to_datetime(df_logs['timestamp'])
-                                    log_text = "  \n".join([f"🕒 {row['timestamp'].strftime('%H:%M:%S')} | 👤 {row['user_id']} | 📢 {row['event_name']}" for _, row in df_logs.iterrows()])
-                                    log_area.markdown(f"**최근 활동:**  \n{log_text}")
-                                else:
-                                    log_area.caption("에이전트 활동 대기 중...")
-                                
-                                # 3. Update Chart (RIGHT SIDE) - NEW!
-                                df_live = al.run_query(f"""
-                                    SELECT
-                                        variant,
-                                        COUNT(DISTINCT user_id) as visitors
-                                    FROM assignments
-                                    WHERE run_id = '{run_filter}'
-                                    GROUP BY 1
-                                """, con=None)
-
-                                # Save to session_state for persistence after completion
-                                if not df_live.empty:
-                                    st.session_state['last_live_chart'] = df_live.copy()
-                                    st.session_state['last_loop_count'] = loop_count
-
-                                with chart_placeholder.container():
-                                    if not df_live.empty:
-                                        st.bar_chart(df_live, x="variant", y="visitors", color="variant", horizontal=True)
-                                        st.caption(f"🔄 실시간 업데이트 중... (Loop: {loop_count})")
+
+                                # Keep only the latest progress snapshot (aggregates are cumulative)
+                                latest = None
+                                while not messages.empty():
+                                    msg = messages.get_nowait()
+                                    if msg.get("type") == "progress":
+                                        latest = msg
+                                    elif msg.get("type") == "result":
+                                        st.session_state['last_sim_result'] = msg
+
+                                if latest is not None:
+                                    last_message_at = time.time()
+                                    curr_count = latest["completed"]
+
+                                    # 1. Update Progress
+                                    progress = min(curr_count / needed, 1.0) if needed > 0 else 0
+                                    effective_count = int(curr_count * weight_multiplier)
+                                    effective_total_display = int(needed * weight_multiplier)
+                                    progress_bar.progress(progress, text=f"데이터 수집 중... ({curr_count}/{needed}) → 효과: ({effective_count:,}/{effective_total_display:,}) [Loop: {loop_count}]")
+
+                                    # 2. Show Live Logs (Ticker)
+                                    if latest["recent"]:
+                                        log_text = "  \n".join([f"🕒 {e['timestamp']} | 👤 {e['user_id']} | 📢 {e['event_name']}" for e in latest["recent"]])
+                                        log_area.markdown(f"**최근 활동:**  \n{log_text}")
                                     else:
-                                        st.info("데이터 수집 대기 중...")
+                                        log_area.caption("에이전트 활동 대기 중...")
+
+                                    # 3. Update Chart (RIGHT SIDE)
+                                    df_live = pd.DataFrame(
+                                        sorted(latest["visitors"].items()), columns=["variant", "visitors"]
+                                    )
+                                    if not df_live.empty:
+                                        st.session_state['last_live_chart'] = df_live.copy()
+                                        st.session_state['last_loop_count'] = loop_count
+
+                                    with chart_placeholder.container():
+                                        if not df_live.empty:
+                                            st.bar_chart(df_live, x="variant", y="visitors", color="variant", horizontal=True)
+                                            st.caption(f"🔄 실시간 업데이트 중... (Loop: {loop_count})")
+                                        else:
+                                            st.info("데이터 수집 대기 중...")
+
+                                    last_count = curr_count
+
+                                    # 4. Sequential test (each test arm vs control; stop once every arm is decided)
+                                    users, conv = latest["visitors"], latest.get(seq_metric, {})
+                                    seq = {
+                                        arm: monitor.update(users.get(control_arm, 0), conv.get(control_arm, 0),
+                                                            users.get(arm, 0), conv.get(arm, 0))
+                                        for arm, monitor in monitors.items()
+                                    }
+                                    st.session_state['last_sequential'] = (control_arm, seq)
+                                    with sequential_placeholder.container():
+                                        for arm, arm_seq in seq.items():
+                                            if len(seq) > 1:
+                                                st.caption(f"**{arm} vs {control_arm}**")
+                                            ui.sequential_status(arm_seq, control_arm, arm)
+                                    if all(arm_seq["stop"] for arm_seq in seq.values()) and early_stop and proc.poll() is None:
+                                        _stop_runner()
+                                        stopped_early = True
+                                        break
                                 
-                                # 4. Handle timeout or stuck
-                                elapsed = time.time() - start_time
-                                if elapsed > 120 and curr_count == last_count:
+                                # 5. Handle timeout or stuck
+                                if time.time() - last_message_at > 120:
                                     status_container.update(label="⚠️ 시뮬레이션 지연 발생", state="error")
-                                    st.warning(f"2분 경과, 데이터 증가 없음. 프로세스 상태: {proc.poll()}")
+                                    st.warning(f"2분 경과, 진행 상황 수신 없음. 프로세스 상태: {proc.poll()}")
                                     break
                                 
-                                last_count = curr_count
-                                time.sleep(1)
+                                time.sleep(0.5)
                             
-                            # Final Check
+                            # Final Check (a stopped direct run exits after committing its written chunks)
                             exit_code = proc.wait()
                             st.session_state.pop('sim_process', None)
+                            if stop_file and os.path.exists(stop_file):
+                                os.remove(stop_file)
+
+                            # The reader may still be parsing the last lines (incl. the result) after exit
+                            reader.join(timeout=10)
+                            while not messages.empty():
+                                msg = messages.get_nowait()
+                                if msg.get("type") == "progress":
+                                    last_count = msg["completed"]
+                                elif msg.get("type") == "result":
+                                    st.session_state['last_sim_result'] = msg
                             
                             if not st.session_state.get('sim_stop_requested', False):
-                                status_container.update(label=f"✅ 시뮬레이션 완료! (Exit Code: {exit_code})", state="complete", expanded=False)
+                                if stopped_early:
+                                    status_container.update(label=f"🏁 결과 확정: 목표 표본 전에 조기 종료했습니다 ({last_count}/{needed})", state="complete", expanded=False)
+                                else:
+                                    status_container.update(label=f"✅ 시뮬레이션 완료! (Exit Code: {exit_code})", state="complete", expanded=False)
                                 st.success(f"Loop 실행 횟수: {loop_count}회, 최종 데이터: {last_count}건")
                                 st.toast("시뮬레이션 완료! 데이터가 수집되었습니다.")
                                 time.sleep(1)  # Give UI a moment to render
@@ -1393,37 +1525,28 @@ GROUP BY 1
 
         st.caption(f"🔍 현재 분석 중인 실험: `{current_run_id}`")
 
-        # Build event filter based on metric type
-        # For CTR: match 'click_banner' OR 'banner_%' patterns (agent uses banner_A, banner_B)
-        # For CVR: match 'purchase'
-        if event_name == 'click_banner':
-            event_filter = "(e.event_name = 'click_banner' OR e.event_name LIKE 'banner_%')"
-        else:
-            event_filter = f"e.event_name = '{event_name}'"
-
-        sql = f"""
-        SELECT
-            a.variant,
-            COUNT(DISTINCT a.user_id) as users,
-            COUNT(DISTINCT CASE WHEN {event_filter} THEN e.user_id END) as conversions
-        FROM assignments a
-        LEFT JOIN events e ON a.user_id = e.user_id AND a.run_id = e.run_id
-        WHERE a.run_id = '{current_run_id}'
-        GROUP BY 1 ORDER BY 1
-        """
-
-        df = al.run_query(sql)
+        # Per-variant sufficient stats kept by the Target App (no assignments x events scan)
+        run_stats = al.get_run_stats(current_run_id)
+        # CTR counts banner clicks ('click_banner' / 'banner_A' / 'banner_B'); CVR and AOV count purchases
+        conversion_col = 'clicks' if event_name == 'click_banner' else 'purchases'
+        df = run_stats[['variant', 'users']].assign(conversions=run_stats[conversion_col]) if not run_stats.empty else run_stats
 
         if len(df) < 2:
             st.warning("📊 분석을 위한 충분한 데이터가 수집되지 않았습니다. (최소 2개의 그룹 필요)")
             st.info(f"현재 run_id '{current_run_id}'에 대한 데이터: {len(df)}개 그룹")
             st.stop()
             
-        # Calculate Stats
-        res = al.calculate_statistics(
-            df.iloc[0]['users'], df.iloc[0]['conversions'],
-            df.iloc[1]['users'], df.iloc[1]['conversions']
-        )
+        # Control is the first variant of the allocation (A unless configured otherwise)
+        control = AllocationTable(st.session_state.get('allocation')).control
+        if control not in set(df['variant']):
+            control = df.iloc[0]['variant']
+
+        # Calculate Stats: every test arm vs control in one pass, Holm-adjusted across arms (A/B: unchanged p)
+        arm_tests = al.segment_statistics(df, control=control, correction="holm")
+        best = arm_tests.loc[arm_tests['lift'].idxmax()]  # Headline / adoption candidate
+        test_arm = best['variant']
+        res = {key: float(best[key]) for key in ("control_rate", "test_rate", "lift", "z_score", "se")}
+        res['p_value'] = float(best['p_adjusted'])
         
         # Plotly CVR Comparison with CIs
         import plotly.graph_objects as go
@@ -1450,9 +1573,9 @@ GROUP BY 1
         plot_df = pd.DataFrame(rows)
         
         fig = go.Figure()
-        colors = {'A': '#135bec', 'B': '#ef4444'}
+        colors = {'A': '#135bec', 'B': '#ef4444', 'C': '#f59e0b', 'D': '#10b981', 'E': '#a855f7'}
         
-        for v in ['A', 'B']:
+        for v in plot_df['variant']:
             v_data = plot_df[plot_df['variant'] == v]
             if v_data.empty: continue
             
@@ -1479,11 +1602,21 @@ GROUP BY 1
         with c_stats:
             st.markdown("#### 🏁 최종 결과 요약")
             with st.container(border=True):
-                st.metric("Lift (개선율)", al.format_delta(res['lift']),
+                multi_arm = len(arm_tests) > 1
+                st.metric(f"Lift (개선율, {test_arm} vs {control})" if multi_arm else "Lift (개선율)",
+                         al.format_delta(res['lift']),
                          delta=f"{al.format_delta(res['lift'])} {'🔥' if res['lift'] > 0 else '❄️'}")
 
                 p_val_str = f"{res['p_value']:.4f}"
-                st.write(f"📊 **P-value:** {p_val_str}")
+                st.write(f"📊 **P-value{' (Holm 보정)' if multi_arm else ''}:** {p_val_str}")
+                if multi_arm:
+                    st.dataframe(pd.DataFrame({
+                        "변형": arm_tests['variant'],
+                        "Lift": arm_tests['lift'].map(al.format_delta),
+                        "P-value": arm_tests['p_value'].map(lambda p: f"{p:.4f}"),
+                        "Holm 보정": arm_tests['p_adjusted'].map(lambda p: f"{p:.4f}"),
+                    }), hide_index=True, use_container_width=True)
+                    st.caption(f"변형 {len(arm_tests)}개를 각각 {control}와 비교하므로 Holm 보정 p-value로 판단합니다.")
 
                 if res['p_value'] < 0.05:
                     st.success(f"🎊 **통계적으로 유의미함** (p < 0.05)")
@@ -1509,7 +1642,7 @@ GROUP BY 1
                         variant_data = st.session_state.get('exp_variant_data', {})
                         st.session_state['pending_adoption'] = {
                             'variant': {
-                                'winning_variant': 'B',  # Adopting means Test variant (B) won
+                                'winning_variant': test_arm,  # Adopting means the best test arm won
                                 'target': st.session_state.get('target', ''),
                                 'config': variant_data  # Store actual experiment configuration
                             },
@@ -1518,7 +1651,7 @@ GROUP BY 1
                             'p_value': res['p_value'],
                             'timestamp': pd.Timestamp.now().isoformat()
                         }
-                    st.success("✅ **채택 선택됨** - 회고록 저장 시 Target App에 Variant B가 적용됩니다.")
+                    st.success(f"✅ **채택 선택됨** - 회고록 저장 시 Target App에 Variant {test_arm}가 적용됩니다.")
                 else:
                     # Clear pending adoption if unchecked
                     if st.session_state.get('pending_adoption') is not None:
@@ -1558,6 +1691,51 @@ GROUP BY 1
             # Main CTR Chart
             st.plotly_chart(fig, use_container_width=True)
 
+            # CUPED: the same comparison adjusted for each user's warehouse pre-period orders
+            if st.toggle("🔬 CUPED 분산 감소 (사전 30일 데이터 보정)", value=False):
+                cuped_metrics = {"CTR": ("clicked", True), "CVR": ("purchased", True), "ARPU": ("revenue", False)}
+                primary_key = "CTR" if 'CTR' in primary_metric else "CVR"
+                cuped_rows = []
+                for label in (primary_key, "ARPU"):
+                    column, is_rate = cuped_metrics[label]
+                    cuped = al.cuped_analysis(current_run_id, metric=column, control=control)
+                    cuped = cuped[cuped['variant'] == test_arm] if not cuped.empty else cuped
+                    if cuped.empty:
+                        continue
+                    r = cuped.iloc[0]
+                    fmt = (lambda v: f"{v * 100:+.2f}%p") if is_rate else (lambda v: f"{v:+,.0f}원")
+                    cuped_rows.append({
+                        "지표": label,
+                        "보정 차이": fmt(r['diff']),
+                        "95% CI": f"[{fmt(r['ci_low'])}, {fmt(r['ci_high'])}]",
+                        "Lift": al.format_delta(r['lift']),
+                        "P-value": f"{r['p_value']:.4f}",
+                        "분산 감소": f"{r['variance_reduction'] * 100:.1f}%",
+                    })
+                if cuped_rows:
+                    st.dataframe(pd.DataFrame(cuped_rows), hide_index=True, use_container_width=True)
+                    st.caption(f"사전 주문 데이터 보유 유저: {cuped.iloc[0]['coverage'] * 100:.1f}% · "
+                               "분산이 X% 줄면 같은 검정력에 필요한 표본도 X% 줄어듭니다.")
+                else:
+                    st.info("CUPED 보정에 필요한 유저 단위 데이터가 없습니다.")
+
+            # Bayesian view of the same run stats (cached per run_id + counts)
+            if st.toggle("🎲 베이지안 분석 (Probability to Beat)", value=False):
+                bayes = al.bayesian_run_statistics(current_run_id, run_stats, control=control)
+                bayes_rows = []
+                for _, r in bayes.iterrows():
+                    is_rate = r['metric'] != "ARPU"
+                    loss = f"{r['expected_loss'] * 100:.3f}%p" if is_rate else f"{r['expected_loss']:,.0f}원"
+                    bayes_rows.append({
+                        "지표": f"{r['metric']} ({r['variant']})",
+                        "P(Test > Control)": f"{r['prob_beat'] * 100:.1f}%",
+                        "Expected Loss": loss,
+                        "Lift 95% 신용구간": f"[{al.format_delta(r['lift_low'])}, {al.format_delta(r['lift_high'])}]",
+                    })
+                st.dataframe(pd.DataFrame(bayes_rows), hide_index=True, use_container_width=True)
+                st.caption("Expected Loss: Test를 채택했는데 실제로 더 나쁠 경우 평균적으로 잃는 양입니다. "
+                           "P(Test > Control)가 높고 Expected Loss가 허용치보다 작으면 채택할 수 있습니다.")
+
             # ==========================================
             # Guardrail Metrics Section (Below CTR Chart in Right Column)
             # ==========================================
@@ -1568,40 +1746,38 @@ GROUP BY 1
             if guardrails:
                 st.markdown("#### 🛡️ 가드레일 지표 (Guardrail Metrics)")
 
-                # Query all metrics at once for efficiency
-                guard_sql = f"""
-                SELECT
-                    a.variant,
-                    COUNT(DISTINCT a.user_id) as users,
-                    COUNT(DISTINCT CASE WHEN e.event_name = 'purchase' THEN e.user_id END) as conversions,
-                    COALESCE(SUM(CASE WHEN e.event_name = 'purchase' THEN e.value ELSE 0 END), 0) as revenue,
-                    COUNT(DISTINCT CASE WHEN e.event_name LIKE 'banner%' OR e.event_name = 'click_banner' THEN e.user_id END) as clicks,
-                    COUNT(DISTINCT CASE WHEN e.event_name = 'bounce' THEN e.user_id END) as bounces
-                FROM assignments a
-                LEFT JOIN events e ON a.user_id = e.user_id AND a.run_id = e.run_id
-                WHERE a.run_id = '{current_run_id}'
-                GROUP BY 1 ORDER BY 1
-                """
-                df_guard = al.run_query(guard_sql)
+                # Same run stats as the primary metric; no extra query
+                df_guard = run_stats.rename(columns={'purchases': 'conversions', 'revenue_sum': 'revenue'})
 
                 if len(df_guard) >= 2:
-                    ctrl = df_guard.iloc[0]
-                    test = df_guard.iloc[1]
+                    ctrl = df_guard[df_guard['variant'] == control].iloc[0]
+                    test = df_guard[df_guard['variant'] == test_arm].iloc[0]
+
+                    # Proportion guardrails (CVR / CTR / Bounce) are tested in one vectorized pass
+                    rate_columns = {"CVR": "conversions", "CTR": "clicks", "Bounce": "bounces"}
+                    long_guard = pd.concat([
+                        df_guard[['variant', 'users']].assign(metric=metric, conversions=df_guard[col])
+                        for metric, col in rate_columns.items()
+                    ])
+                    guard_tests = al.segment_statistics(long_guard, by='metric', control=ctrl['variant'])
+                    guard_tests = guard_tests[guard_tests['variant'] == test['variant']].set_index('metric')
+
+                    def rate_guardrail(key, label, higher_is_better=True):
+                        row = guard_tests.loc[key]
+                        lift = float(row['lift'])
+                        return {
+                            "metric": label,
+                            "control": float(row['control_rate']),
+                            "test": float(row['test_rate']),
+                            "lift": lift,
+                            "p_value": float(row['p_value']),
+                            "passed": lift >= guard_threshold if higher_is_better else lift <= abs(guard_threshold)
+                        }
 
                     # Calculate each guardrail metric
                     for guardrail in guardrails:
                         if "CVR" in guardrail:
-                            control_rate = ctrl['conversions'] / ctrl['users'] if ctrl['users'] > 0 else 0
-                            test_rate = test['conversions'] / test['users'] if test['users'] > 0 else 0
-                            guard_lift = (test_rate - control_rate) / control_rate if control_rate > 0 else 0
-                            passed = guard_lift >= guard_threshold
-                            guard_results.append({
-                                "metric": "CVR (전환율)",
-                                "control": control_rate,
-                                "test": test_rate,
-                                "lift": guard_lift,
-                                "passed": passed
-                            })
+                            guard_results.append(rate_guardrail("CVR", "CVR (전환율)"))
                         elif "AOV" in guardrail:
                             control_aov = ctrl['revenue'] / ctrl['conversions'] if ctrl['conversions'] > 0 else 0
                             test_aov = test['revenue'] / test['conversions'] if test['conversions'] > 0 else 0
@@ -1615,29 +1791,9 @@ GROUP BY 1
                                 "passed": passed
                             })
                         elif "Bounce" in guardrail:
-                            control_bounce = ctrl['bounces'] / ctrl['users'] if ctrl['users'] > 0 else 0
-                            test_bounce = test['bounces'] / test['users'] if test['users'] > 0 else 0
-                            guard_lift = (test_bounce - control_bounce) / control_bounce if control_bounce > 0 else 0
-                            passed = guard_lift <= abs(guard_threshold)
-                            guard_results.append({
-                                "metric": "Bounce Rate (이탈률)",
-                                "control": control_bounce,
-                                "test": test_bounce,
-                                "lift": guard_lift,
-                                "passed": passed
-                            })
+                            guard_results.append(rate_guardrail("Bounce", "Bounce Rate (이탈률)", higher_is_better=False))
                         elif "CTR" in guardrail:
-                            control_ctr = ctrl['clicks'] / ctrl['users'] if ctrl['users'] > 0 else 0
-                            test_ctr = test['clicks'] / test['users'] if test['users'] > 0 else 0
-                            guard_lift = (test_ctr - control_ctr) / control_ctr if control_ctr > 0 else 0
-                            passed = guard_lift >= guard_threshold
-                            guard_results.append({
-                                "metric": "CTR (클릭률)",
-                                "control": control_ctr,
-                                "test": test_ctr,
-                                "lift": guard_lift,
-                                "passed": passed
-                            })
+                            guard_results.append(rate_guardrail("CTR", "CTR (클릭률)"))
 
                     # Compact display for guardrail metrics
                     if guard_results:
@@ -1648,11 +1804,11 @@ GROUP BY 1
 
                         fig_guard = go.Figure()
                         fig_guard.add_trace(go.Bar(
-                            name='A', x=guard_metrics, y=control_vals,
+                            name=str(control), x=guard_metrics, y=control_vals,
                             marker_color='#135bec', text=[f"{v:.1f}%" for v in control_vals], textposition='auto'
                         ))
                         fig_guard.add_trace(go.Bar(
-                            name='B', x=guard_metrics, y=test_vals,
+                            name=str(test_arm), x=guard_metrics, y=test_vals,
                             marker_color='#ef4444', text=[f"{v:.1f}%" for v in test_vals], textposition='auto'
                         ))
                         fig_guard.update_layout(
@@ -1666,7 +1822,8 @@ GROUP BY 1
                             status = "✅" if gr.get('passed', True) else "❌"
                             lift_val = gr['lift'] * 100
                             color = "green" if lift_val >= 0 else "red"
-                            st.caption(f"{status} **{gr['metric']}**: <span style='color:{color}'>{lift_val:+.1f}%</span> (A:{gr['control']*100:.1f}% → B:{gr['test']*100:.1f}%)", unsafe_allow_html=True)
+                            p_note = f", p={gr['p_value']:.3f}" if 'p_value' in gr else ""
+                            st.caption(f"{status} **{gr['metric']}**: <span style='color:{color}'>{lift_val:+.1f}%</span> ({control}:{gr['control']*100:.1f}% → {test_arm}:{gr['test']*100:.1f}%{p_note})", unsafe_allow_html=True)
                     else:
                         st.caption("가드레일 데이터 없음")
                 else:
@@ -1713,35 +1870,23 @@ GROUP BY 1
 
 
         # Calculate comprehensive metrics for both groups (weight-adjusted for hybrid simulation)
-        metrics_sql = f"""
-        WITH user_events AS (
-            SELECT
-                a.variant,
-                a.user_id,
-                a.weight,
-                MAX(CASE WHEN e.event_name LIKE 'banner%' OR e.event_name = 'click_banner' THEN 1 ELSE 0 END) as clicked,
-                MAX(CASE WHEN e.event_name = 'purchase' THEN 1 ELSE 0 END) as purchased,
-                SUM(CASE WHEN e.event_name = 'purchase' THEN e.value ELSE 0 END) as revenue
-            FROM assignments a
-            LEFT JOIN events e ON a.user_id = e.user_id AND a.run_id = e.run_id
-            WHERE a.run_id = '{current_run_id}'
-            GROUP BY a.variant, a.user_id, a.weight
-        )
-        SELECT
-            variant as 그룹,
-            CAST(ROUND(SUM(weight), 0) AS INTEGER) as 방문자수,
-            CAST(ROUND(SUM(CASE WHEN clicked = 1 THEN weight ELSE 0 END), 0) AS INTEGER) as 클릭수,
-            CAST(ROUND(SUM(CASE WHEN purchased = 1 THEN weight ELSE 0 END), 0) AS INTEGER) as 구매수,
-            CAST(ROUND(SUM(revenue * weight), 0) AS BIGINT) as 총매출,
-            ROUND(SUM(CASE WHEN clicked = 1 THEN weight ELSE 0 END) / NULLIF(SUM(weight), 0) * 100, 2) as CTR,
-            ROUND(SUM(CASE WHEN purchased = 1 THEN weight ELSE 0 END) / NULLIF(SUM(weight), 0) * 100, 2) as CVR,
-            CAST(ROUND(SUM(revenue * weight) / NULLIF(SUM(CASE WHEN purchased = 1 THEN weight ELSE 0 END), 0), 0) AS INTEGER) as AOV,
-            CAST(ROUND(SUM(revenue * weight) / NULLIF(SUM(weight), 0), 0) AS INTEGER) as ARPU
-        FROM user_events
-        GROUP BY variant
-        ORDER BY variant
-        """
-        df_metrics = al.run_query(metrics_sql)
+        # A run uses one weight per user, so weighted counts are counts x (weight_sum / users)
+        metric_rows = []
+        for _, row in run_stats.iterrows():
+            w = row['weight_sum'] / row['users'] if row['users'] else 0.0
+            w_clicks, w_purchases, w_revenue = row['clicks'] * w, row['purchases'] * w, row['revenue_sum'] * w
+            metric_rows.append({
+                '그룹': row['variant'],
+                '방문자수': int(round(row['weight_sum'])),
+                '클릭수': int(round(w_clicks)),
+                '구매수': int(round(w_purchases)),
+                '총매출': int(round(w_revenue)),
+                'CTR': round(w_clicks / row['weight_sum'] * 100, 2) if row['weight_sum'] else None,
+                'CVR': round(w_purchases / row['weight_sum'] * 100, 2) if row['weight_sum'] else None,
+                'AOV': int(round(w_revenue / w_purchases)) if w_purchases else None,
+                'ARPU': int(round(w_revenue / row['weight_sum'])) if row['weight_sum'] else None,
+            })
+        df_metrics = pd.DataFrame(metric_rows)
 
         # Educational fallback: Generate sample data if real data is insufficient
         use_sample_data = False
@@ -1772,35 +1917,59 @@ GROUP BY 1
             ])
 
         if not df_metrics.empty and len(df_metrics) >= 2:
-            # Add delta row
-            deltas = {}
-            for col in df_metrics.columns:
-                if col != '그룹':
-                    control_val = df_metrics.iloc[0][col]
-                    test_val = df_metrics.iloc[1][col]
-
-                    # Handle None/NaN values
-                    if pd.isna(control_val) or pd.isna(test_val):
-                        deltas[col] = "N/A"
-                    elif control_val == 0 or control_val is None:
-                        deltas[col] = "N/A"
-                    else:
-                        try:
-                            delta_pct = ((float(test_val) - float(control_val)) / float(control_val)) * 100
-                            deltas[col] = f"+{delta_pct:.1f}%" if delta_pct >= 0 else f"{delta_pct:.1f}%"
-                        except (TypeError, ValueError):
+            # Add one delta row per test arm (vs control)
+            control_label = control if control in set(df_metrics['그룹']) else df_metrics.iloc[0]['그룹']
+            control_row = df_metrics[df_metrics['그룹'] == control_label].iloc[0]
+            delta_rows = []
+            for _, test_row in df_metrics[df_metrics['그룹'] != control_label].iterrows():
+                deltas = {}
+                for col in df_metrics.columns:
+                    if col != '그룹':
+                        control_val = control_row[col]
+                        test_val = test_row[col]
+
+                        # Handle None/NaN values
+                        if pd.isna(control_val) or pd.isna(test_val):
                             deltas[col] = "N/A"
-            deltas['그룹'] = 'Δ (B vs A)'
+                        elif control_val == 0 or control_val is None:
+                            deltas[col] = "N/A"
+                        else:
+                            try:
+                                delta_pct = ((float(test_val) - float(control_val)) / float(control_val)) * 100
+                                deltas[col] = f"+{delta_pct:.1f}%" if delta_pct >= 0 else f"{delta_pct:.1f}%"
+                            except (TypeError, ValueError):
+                                deltas[col] = "N/A"
+                deltas['그룹'] = f"Δ ({test_row['그룹']} vs {control_label})"
+                delta_rows.append(deltas)
 
             # Create comparison dataframe
             import pandas as pd
-            df_comparison = pd.concat([df_metrics, pd.DataFrame([deltas])], ignore_index=True)
+            df_comparison = pd.concat([df_metrics, pd.DataFrame(delta_rows)], ignore_index=True)
 
             st.dataframe(df_comparison, width="stretch", hide_index=True)
             if use_sample_data:
                 st.caption("⚠️ 위 데이터는 학습용 샘플입니다. 실제 실험에서는 더 많은 트래픽을 수집하세요.")
             st.caption("💡 CTR = 클릭률, CVR = 전환율, AOV = 평균 주문액, ARPU = 유저당 평균 매출")
 
+            # Heavy-tailed revenue metrics: percentile bootstrap instead of a normal approximation
+            if not use_sample_data and st.toggle("📐 AOV / ARPU 부트스트랩 신뢰구간 (10,000회 재표본)", value=False):
+                with st.spinner("부트스트랩 재표본 추출 중..."):
+                    boot = al.bootstrap_run_revenue(current_run_id, control=control_label,
+                                                    workers=os.cpu_count())
+                if not boot.empty:
+                    boot_rows = []
+                    for _, r in boot.iterrows():
+                        boot_rows.append({
+                            "지표": r['metric'],
+                            "그룹": r['variant'],
+                            "추정값": f"{r['estimate']:,.0f}원",
+                            "95% CI": f"[{r['ci_low']:,.0f}, {r['ci_high']:,.0f}]" if pd.notna(r['ci_low']) else "N/A",
+                            "차이 95% CI": (f"[{r['diff_ci_low']:+,.0f}, {r['diff_ci_high']:+,.0f}]"
+                                           if pd.notna(r.get('diff_ci_low', np.nan)) else "-"),
+                            "P-value": f"{r['p_value']:.4f}" if pd.notna(r.get('p_value', np.nan)) else "-",
+                        })
+                    st.dataframe(pd.DataFrame(boot_rows), hide_index=True, width="stretch")
+
         # Raw Data Table with Sample and Download
         st.divider()
         col_raw_title, col_download = st.columns([3, 1])
@@ -2062,8 +2231,10 @@ GROUP BY 1
                     st.error(f"❌ DuckDB 저장 실패: {e}")
 
             if save_success:
-                # Clear caches
+                # Clear caches (Streamlit + Target App experiment state)
                 st.cache_data.clear()
+                from src.data.db import invalidate_target_app_cache
+                invalidate_target_app_cache()
 
                 had_adoption = st.session_state.get('pending_adoption') is not None
                 if had_adoption:
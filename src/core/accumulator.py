@@ -0,0 +1,190 @@
+"""
+Experiment Accumulator
+Running sufficient statistics per (run_id, variant), updated by the Target App
+as it ingests assignments and events and persisted to the `experiment_stats`
+table, so analysis reads one row per variant instead of scanning
+`assignments LEFT JOIN events`.
+
+Page views are event counts; clicks/bounces/purchases count users, like the
+COUNT(DISTINCT user_id) of the raw-table analysis: callers pass first=False
+for repeats of a USER_EVENTS kind (browser clicks, journey revisits, retried
+batches), which only add their revenue. Revenue keeps sum and sum of squares,
+so AOV/ARPU means and variances come straight from the row.
+"""
+import math
+import threading
+
+STATS_TABLE = "experiment_stats"
+KEY_COLUMNS = ["run_id", "variant"]
+SUM_COLUMNS = ["users", "weight_sum", "weight_sq_sum", "page_views", "clicks", "bounces",
+               "purchases", "revenue_sum", "revenue_sq_sum"]
+STATS_COLUMNS = KEY_COLUMNS + SUM_COLUMNS
+
+
+USER_EVENTS = ("click", "bounce", "purchase")  # Counted once per user and run
+
+
+def is_click_event(event_name: str) -> bool:
+    return event_name == "click_banner" or event_name.startswith("banner_")
+
+
+def user_event_kind(event_name: str):
+    """USER_EVENTS kind of an event, or None for events counted every time (page views)."""
+    if event_name in ("bounce", "purchase"):
+        return event_name
+    return "click" if is_click_event(event_name) else None
+
+
+class VariantStats:
+    """Additive sufficient statistics of one variant in one run."""
+
+    __slots__ = SUM_COLUMNS
+
+    def __init__(self, **values):
+        for column in SUM_COLUMNS:
+            setattr(self, column, values.get(column, 0) or 0)
+
+    def add_assignment(self, weight: float = 1.0):
+        weight = float(weight if weight is not None else 1.0)
+        self.users += 1
+        self.weight_sum += weight
+        self.weight_sq_sum += weight * weight
+
+    def add_event(self, event_name: str, value: float = 0.0, first: bool = True):
+        """first=False: the user already had an event of this USER_EVENTS kind in the run."""
+        if event_name == "page_view":
+            self.page_views += 1
+        elif event_name == "bounce":
+            self.bounces += first
+        elif event_name == "purchase":
+            value = float(value or 0.0)
+            self.purchases += first
+            self.revenue_sum += value
+            self.revenue_sq_sum += value * value
+        elif is_click_event(event_name):
+            self.clicks += first
+
+    def merge(self, other: "VariantStats"):
+        for column in SUM_COLUMNS:
+            setattr(self, column, getattr(self, column) + getattr(other, column))
+        return self
+
+    def to_row(self, run_id: str, variant: str) -> tuple:
+        return (run_id, variant, *(getattr(self, column) for column in SUM_COLUMNS))
+
+    @classmethod
+    def from_row(cls, row) -> "VariantStats":
+        """From a to_row() tuple or a mapping (e.g. a DataFrame row) with the SUM_COLUMNS."""
+        if isinstance(row, (tuple, list)):
+            return cls(**dict(zip(STATS_COLUMNS, row)))
+        return cls(**{column: row[column] for column in SUM_COLUMNS})
+
+    def summary(self) -> dict:
+        """Rates and revenue moments for the analysis page (all O(1))."""
+        users, purchases = self.users, self.purchases
+        aov = self.revenue_sum / purchases if purchases else 0.0
+        arpu = self.revenue_sum / users if users else 0.0
+        return {
+            "users": users,
+            "weighted_users": self.weight_sum,
+            "ctr": self.clicks / users if users else 0.0,
+            "cvr": purchases / users if users else 0.0,
+            "bounce_rate": self.bounces / users if users else 0.0,
+            "revenue": self.revenue_sum,
+            "aov": aov,
+            "aov_std": _sample_std(self.revenue_sq_sum, aov, purchases),
+            "arpu": arpu,
+            "arpu_std": _sample_std(self.revenue_sq_sum, arpu, users),
+        }
+
+
+def _sample_std(sq_sum: float, mean: float, n: int) -> float:
+    if n < 2:
+        return 0.0
+    return math.sqrt(max(sq_sum - n * mean * mean, 0.0) / (n - 1))
+
+
+class ExperimentAccumulator:
+    """
+    Pending per-(run_id, variant) deltas, drained into the stats table on flush.
+    Thread-safe; visits without a run_id (real traffic) are not accumulated.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, run_id, variant) -> VariantStats:
+        key = (run_id, variant)
+        stats = self._pending.get(key)
+        if stats is None:
+            stats = self._pending[key] = VariantStats()
+        return stats
+
+    def record_assignment(self, run_id, variant, weight=1.0):
+        if not run_id:
+            return
+        with self._lock:
+            self._stats(run_id, variant).add_assignment(weight)
+
+    def record_event(self, run_id, variant, event_name, value=0.0, first=True):
+        if not run_id:
+            return
+        with self._lock:
+            self._stats(run_id, variant).add_event(event_name, value, first)
+
+    def merge(self, other: "ExperimentAccumulator"):
+        with self._lock:
+            for (run_id, variant), stats in other.drain_stats().items():
+                self._stats(run_id, variant).merge(stats)
+
+    def drain_stats(self) -> dict:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def drain(self) -> list:
+        """Take all pending deltas as STATS_COLUMNS rows (the accumulator is left empty)."""
+        return [stats.to_row(run_id, variant) for (run_id, variant), stats in self.drain_stats().items()]
+
+    def restore(self, rows):
+        """Put drained rows back after a failed write, so the next flush retries them."""
+        with self._lock:
+            for row in rows:
+                self._stats(row[0], row[1]).merge(VariantStats.from_row(row))
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+def create_table_sql() -> str:
+    """DDL for the stats table (same statement for DuckDB and PostgreSQL)."""
+    return f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            run_id VARCHAR(255) NOT NULL,
+            variant VARCHAR(10) NOT NULL,
+            users BIGINT DEFAULT 0,
+            weight_sum DOUBLE PRECISION DEFAULT 0,
+            weight_sq_sum DOUBLE PRECISION DEFAULT 0,
+            page_views BIGINT DEFAULT 0,
+            clicks BIGINT DEFAULT 0,
+            bounces BIGINT DEFAULT 0,
+            purchases BIGINT DEFAULT 0,
+            revenue_sum DOUBLE PRECISION DEFAULT 0,
+            revenue_sq_sum DOUBLE PRECISION DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, variant)
+        )
+    """
+
+
+def upsert_sql(values_clause: str) -> str:
+    """
+    Additive upsert of delta rows: existing totals are incremented, so several
+    writers (or a restarted Target App) never overwrite each other.
+    values_clause: "VALUES (?, ...)" for DuckDB or "VALUES %s" for execute_values.
+    """
+    updates = ", ".join(f"{c} = {STATS_TABLE}.{c} + excluded.{c}" for c in SUM_COLUMNS)
+    return (f"INSERT INTO {STATS_TABLE} ({', '.join(STATS_COLUMNS)}) {values_clause} "
+            f"ON CONFLICT (run_id, variant) DO UPDATE SET {updates}, updated_at = now()")
@@ -0,0 +1,205 @@
+"""
+Traffic Allocation
+Variant assignment for A/B/n experiments from one compiled allocation table,
+shared by the Target App, the swarm agents (HTTP and direct engines) and the
+analysis page.
+
+An allocation maps variants to traffic weights, e.g. {"A": 50, "B": 25, "C": 25}
+or "A:50,B:25,C:25"; the first variant is the control. It is compiled once into
+a bucket -> variant table (largest-remainder rounding to BUCKETS buckets,
+contiguous ranges in variant order), so assigning a user is one hash and one
+tuple lookup. The default 50/50 A/B table puts buckets 0-49 on A and 50-99 on
+B, i.e. the same users as the former `md5 % 100 >= 50` split.
+
+Users are bucketed by src.core.bucketing. Allocations may carry a salt and a
+hash version ({"weights": {...}, "salt": "exp_42", "hash": "b2"}); plain
+weight specs use the unsalted legacy md5 hash, so stored experiments keep
+their assignments.
+"""
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from src.core.bucketing import BUCKETS, FAST_HASH, HASH_VERSIONS, LEGACY_HASH, get_bucketer
+
+DEFAULT_ALLOCATION = {"A": 50, "B": 50}
+ALLOCATION_ENV = "EXPERIMENT_ALLOCATION"  # Allocation spec for swarm processes (see runner --allocation)
+
+
+def parse_config(spec) -> dict:
+    """
+    Normalize an allocation spec to {"weights", "salt", "hash"}.
+    Accepts parse_allocation specs or a JSON object with a "weights" key plus
+    optional "salt" and "hash" (missing hash: legacy md5).
+    """
+    if isinstance(spec, AllocationTable):
+        return {"weights": dict(spec.weights), "salt": spec.salt, "hash": spec.hash_version}
+    if isinstance(spec, str) and spec.strip().startswith("{"):
+        spec = json.loads(spec)
+    salt, hash_version = "", LEGACY_HASH
+    if isinstance(spec, dict) and "weights" in spec:
+        salt, hash_version = str(spec.get("salt") or ""), spec.get("hash") or LEGACY_HASH
+        spec = spec["weights"]
+    if hash_version not in HASH_VERSIONS:
+        raise ValueError(f"Unknown hash version '{hash_version}' (expected one of {', '.join(HASH_VERSIONS)})")
+    return {"weights": parse_allocation(spec), "salt": salt, "hash": hash_version}
+
+
+def parse_allocation(spec) -> dict:
+    """
+    Normalize an allocation spec to an ordered {variant: weight} dict.
+    Accepts a dict, a JSON object string, "A:50,B:25,C:25" or a list of
+    variants (equal split). Weights must be non-negative and sum to > 0.
+    """
+    if isinstance(spec, AllocationTable):
+        return dict(spec.weights)
+    if isinstance(spec, dict) and "weights" in spec:
+        return parse_config(spec)["weights"]
+    if spec is None or spec == "":
+        return dict(DEFAULT_ALLOCATION)
+    if isinstance(spec, str):
+        text = spec.strip()
+        if text.startswith("{"):
+            return parse_config(text)["weights"]
+        elif ":" in text:
+            spec = {}
+            for part in text.split(","):
+                variant, _, weight = part.partition(":")
+                spec[variant.strip()] = weight
+        else:
+            spec = [v.strip() for v in text.split(",") if v.strip()]
+    if isinstance(spec, (list, tuple)):
+        spec = {variant: 1 for variant in spec}
+
+    allocation = {}
+    for variant, weight in dict(spec).items():
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid weight for variant '{variant}': {weight!r}")
+        if not str(variant) or weight < 0 or not np.isfinite(weight):
+            raise ValueError(f"Invalid allocation entry {variant!r}: {weight!r}")
+        allocation[str(variant)] = weight
+    if len(allocation) < 2:
+        raise ValueError("An allocation needs at least two variants")
+    if sum(allocation.values()) <= 0:
+        raise ValueError("Allocation weights must sum to more than zero")
+    return allocation
+
+
+class AllocationTable:
+    """
+    Compiled bucket -> variant lookup of one allocation (read-only, safe to share).
+
+        table = AllocationTable("A:50,B:25,C:25")
+        table.variant("user_1")         # 'A' / 'B' / 'C'
+        table.variants_for(agent_ids)   # NumPy array of labels
+
+    salt / hash_version override the spec's; migrate() moves a table to the
+    salted fast hash (this reassigns users, so only for new experiments).
+    """
+
+    def __init__(self, allocation=None, buckets: int = BUCKETS, salt: str = None, hash_version: str = None):
+        config = parse_config(allocation)
+        self.weights = config["weights"]
+        self.salt = config["salt"] if salt is None else str(salt)
+        self.hash_version = hash_version or config["hash"]
+        self.buckets = int(buckets)
+        self.bucketer = get_bucketer(self.salt, self.hash_version, self.buckets)
+        self.variants = tuple(self.weights)
+        self.control = self.variants[0]
+
+        counts = _largest_remainder(np.array(list(self.weights.values())), self.buckets)
+        for variant, weight, count in zip(self.variants, self.weights.values(), counts):
+            if weight > 0 and count == 0:
+                raise ValueError(f"Variant '{variant}' gets less than one of {self.buckets} buckets")
+        self.counts = dict(zip(self.variants, counts.tolist()))
+        self.codes = np.repeat(np.arange(len(self.variants)), counts)
+        self.codes.flags.writeable = False
+        self._labels = np.array(self.variants)
+        self._table = tuple(self.variants[code] for code in self.codes)
+
+    @property
+    def shares(self) -> dict:
+        """Actual traffic share per variant after rounding to buckets."""
+        return {variant: count / self.buckets for variant, count in self.counts.items()}
+
+    @property
+    def test_variants(self) -> tuple:
+        return self.variants[1:]
+
+    def variant(self, uid) -> str:
+        """Variant of one user id: one hash and one tuple lookup."""
+        return self._table[self.bucketer.bucket(uid)]
+
+    def variants_for(self, uids) -> np.ndarray:
+        """Variant label per user id (vectorized lookup)."""
+        return self._labels[self.codes[self.bucketer.buckets(uids)]]
+
+    def variants_series(self, series):
+        """Variant label per element of a pandas Series of user ids (each distinct id hashed once)."""
+        buckets = self.bucketer.bucket_series(series)
+        return buckets.map(dict(enumerate(self._table)))
+
+    def migrate(self, salt: str) -> "AllocationTable":
+        """Same weights on the salted fast hash (see src.core.bucketing)."""
+        return AllocationTable(self.weights, self.buckets, salt=salt, hash_version=FAST_HASH)
+
+    def config(self) -> dict:
+        return {"weights": dict(self.weights), "salt": self.salt, "hash": self.hash_version}
+
+    def to_json(self) -> str:
+        """Full config (weights, salt, hash version) for storage in active_experiment."""
+        return json.dumps(self.config())
+
+    def spec(self) -> str:
+        """Compact "A:50,B:25,C:25" form for legacy unsalted tables, else the JSON config (CLI flags, env vars)."""
+        if self.salt or self.hash_version != LEGACY_HASH:
+            return self.to_json()
+        return ",".join(f"{variant}:{weight:g}" for variant, weight in self.weights.items())
+
+    def __eq__(self, other):
+        return isinstance(other, AllocationTable) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def _key(self):
+        return tuple(self.weights.items()), self.buckets, self.salt, self.hash_version
+
+    def __repr__(self):
+        return f"AllocationTable({self.spec()!r})"
+
+
+def _largest_remainder(weights: np.ndarray, total: int) -> np.ndarray:
+    """Integer counts summing to `total`, proportional to weights (ties go to earlier variants)."""
+    exact = weights / weights.sum() * total
+    counts = np.floor(exact).astype(np.int64)
+    remainder = exact - counts
+    order = np.argsort(-remainder, kind="stable")
+    counts[order[:total - counts.sum()]] += 1
+    return counts
+
+
+@lru_cache(maxsize=32)
+def _compile(spec: str) -> AllocationTable:
+    return AllocationTable(spec or None)
+
+
+def compile_allocation(spec=None) -> AllocationTable:
+    """Compiled table for a spec string (cached per spec; None/'' = DEFAULT_ALLOCATION)."""
+    if isinstance(spec, AllocationTable):
+        return spec
+    if isinstance(spec, (dict, list, tuple)):
+        return AllocationTable(spec)
+    return _compile(spec or "")
+
+
+def allocation_from_env() -> AllocationTable:
+    """Table named by EXPERIMENT_ALLOCATION (default: 50/50 A/B), compiled once per value."""
+    return compile_allocation(os.getenv(ALLOCATION_ENV))
+
+
+DEFAULT_TABLE = compile_allocation()
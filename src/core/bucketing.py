@@ -0,0 +1,130 @@
+"""
+Bucketing
+Deterministic user -> bucket hashing shared by the allocation tables
+(src.core.allocation), stats.get_bucket, the Target App and the swarm agents.
+
+Two hash versions:
+- "md5" (legacy): int(md5(uid).hexdigest(), 16) % buckets, the original
+  assignment hash. Experiments without an explicit hash version keep it, so
+  existing assignments never move.
+- "b2" (fast): the 8-byte BLAKE2b digest of "<salt>:<uid>" read as a
+  little-endian uint64 (int.from_bytes / np.frombuffer). The salted hasher
+  state is built once per Bucketer and copied per id, so a call does no key
+  setup, hex formatting or big-int parsing. Different salts give independent
+  buckets for the same user.
+
+Both versions have a bulk form: digests are joined into one buffer and reduced
+modulo `buckets` in NumPy, and pandas Series hash each distinct id once.
+
+Switching an experiment from md5 to b2 reshuffles its users, so it is an
+explicit migration (scripts/db/migrate_bucketing.py) and never a default change.
+Benchmark: scripts/utils/benchmark_bucketing.py.
+"""
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+BUCKETS = 100
+LEGACY_HASH = "md5"
+FAST_HASH = "b2"
+HASH_VERSIONS = (LEGACY_HASH, FAST_HASH)
+
+
+class Bucketer:
+    """
+    Bucket function of one (salt, hash version, bucket count); immutable and shared.
+
+        bucketer = get_bucketer("exp_42", FAST_HASH)
+        bucketer.bucket("user_1")          # int in [0, buckets)
+        bucketer.buckets(agent_ids)        # int64 array
+        bucketer.bucket_series(df["user_id"])
+    """
+
+    __slots__ = ("salt", "hash_version", "n", "bucket", "_digest", "_2_64")
+
+    def __init__(self, salt: str = "", hash_version: str = LEGACY_HASH, buckets: int = BUCKETS):
+        if hash_version not in HASH_VERSIONS:
+            raise ValueError(f"Unknown hash version '{hash_version}' (expected one of {', '.join(HASH_VERSIONS)})")
+        if not 1 <= int(buckets) < 2 ** 32:
+            raise ValueError("Bucket count must be in [1, 2^32)")
+        self.salt = str(salt or "")
+        self.hash_version = hash_version
+        self.n = int(buckets)
+        self._2_64 = (1 << 64) % self.n  # For the two-word modulo of 128-bit md5 digests
+        self._digest = _digest_function(f"{self.salt}:".encode() if self.salt else b"", hash_version)
+
+        # bucket(uid) -> int, bound per instance so a call is one closure with local lookups
+        digest, n, from_bytes = self._digest, self.n, int.from_bytes
+        byteorder = "little" if hash_version == FAST_HASH else "big"
+
+        def bucket(uid) -> int:
+            return from_bytes(digest(uid), byteorder) % n
+
+        self.bucket = bucket
+
+    def buckets(self, uids) -> np.ndarray:
+        """bucket() of many ids (any iterable) as an int64 array."""
+        digest = self._digest
+        words = np.frombuffer(b"".join([digest(uid) for uid in uids]),
+                              dtype="<u8" if self.hash_version == FAST_HASH else ">u8")
+        n = np.uint64(self.n)
+        if self.hash_version == FAST_HASH:
+            return (words % n).astype(np.int64)
+        # md5: value = hi * 2^64 + lo, so value % n = ((hi % n) * (2^64 % n) + lo % n) % n
+        hi, lo = words[0::2], words[1::2]
+        return (((hi % n) * np.uint64(self._2_64) + lo % n) % n).astype(np.int64)
+
+    def bucket_series(self, series: pd.Series) -> pd.Series:
+        """Bucket per element of a Series (same index); each distinct id is hashed once."""
+        codes, uniques = pd.factorize(series)
+        out = np.full(len(codes), -1, dtype=np.int64)
+        valid = codes >= 0
+        out[valid] = self.buckets(uniques)[codes[valid]]
+        return pd.Series(out, index=series.index, name=series.name)
+
+    def __repr__(self):
+        return f"Bucketer(salt={self.salt!r}, hash_version={self.hash_version!r}, buckets={self.n})"
+
+
+def _digest_function(prefix: bytes, hash_version: str):
+    """uid -> digest bytes; salted states are prepared once and copied per call."""
+    if hash_version == FAST_HASH:
+        copy = hashlib.blake2b(prefix, digest_size=8).copy
+    elif prefix:
+        copy = hashlib.md5(prefix).copy
+    else:
+        md5 = hashlib.md5
+
+        def digest(uid) -> bytes:
+            return md5(uid.encode() if type(uid) is str else str(uid).encode()).digest()
+        return digest
+
+    def digest(uid) -> bytes:
+        h = copy()
+        h.update(uid.encode() if type(uid) is str else str(uid).encode())
+        return h.digest()
+    return digest
+
+
+@lru_cache(maxsize=256)
+def get_bucketer(salt: str = "", hash_version: str = LEGACY_HASH, buckets: int = BUCKETS) -> Bucketer:
+    """Shared Bucketer per (salt, hash version, bucket count)."""
+    return Bucketer(salt, hash_version, buckets)
+
+
+def bucket(uid, buckets: int = BUCKETS, salt: str = "", hash_version: str = LEGACY_HASH) -> int:
+    """Deterministic bucket of one user id in [0, buckets)."""
+    return get_bucketer(salt, hash_version, buckets).bucket(uid)
+
+
+def bucket_many(uids, buckets: int = BUCKETS, salt: str = "", hash_version: str = LEGACY_HASH) -> np.ndarray:
+    """bucket() for many user ids at once (int64 array)."""
+    return get_bucketer(salt, hash_version, buckets).buckets(uids)
+
+
+def bucket_series(series: pd.Series, buckets: int = BUCKETS, salt: str = "",
+                  hash_version: str = LEGACY_HASH) -> pd.Series:
+    """bucket() per element of a pandas Series (missing ids get -1)."""
+    return get_bucketer(salt, hash_version, buckets).bucket_series(series)
@@ -0,0 +1,184 @@
+"""
+Experiment Layers
+Concurrent experiments in the Target App, compiled into one in-memory lookup.
+
+Experiments belong to layers. Within a layer they are mutually exclusive: a
+user is hashed once per layer (salted fast hash, salt "layer:<name>") into
+LAYER_BUCKETS buckets, and each experiment owns a contiguous bucket range.
+Layers use independent salts, so one user can be in one experiment per layer
+and the layers do not correlate. Inside its range an experiment splits users
+with its own AllocationTable (unsalted legacy allocations are salted with
+the experiment id, so two experiments never share a split).
+
+Bucket ranges are stored with each experiment (see allocate_range), so
+stopping one experiment never moves the users of the others. The legacy
+active_experiment row is the full-layer experiment DEFAULT_EXPERIMENT in
+DEFAULT_LAYER and keeps its md5 assignments.
+
+    layers = LayeredAssignment(rows)   # rows from layer_experiments (is_active)
+    layers.assign("user_1")            # {"exp_default": "A", "exp_ranking": "B"}
+"""
+import numpy as np
+import pandas as pd
+
+from src.core.allocation import AllocationTable, compile_allocation
+from src.core.bucketing import FAST_HASH, LEGACY_HASH, get_bucketer
+
+LAYER_BUCKETS = 1000  # Traffic granularity within a layer (0.1%)
+DEFAULT_LAYER = "default"
+DEFAULT_EXPERIMENT = "exp_default"  # experiment_id of the active_experiment row (assignments.experiment_id)
+LAYERS_TABLE = "layer_experiments"
+
+
+def create_layers_table_sql() -> str:
+    """DDL for running layered experiments (same statement for DuckDB and PostgreSQL)."""
+    return f"""
+        CREATE TABLE IF NOT EXISTS {LAYERS_TABLE} (
+            experiment_id VARCHAR(255) PRIMARY KEY,
+            layer VARCHAR(255) NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            bucket_count INTEGER NOT NULL,
+            allocation TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+
+
+def layer_salt(layer: str) -> str:
+    return f"layer:{layer}"
+
+
+def allocate_range(taken, traffic: float, buckets: int = LAYER_BUCKETS) -> tuple:
+    """
+    First free (bucket_start, bucket_count) for `traffic` percent of a layer.
+    `taken` holds the (start, count) ranges of the layer's running experiments.
+    Raises ValueError when no contiguous range is free.
+    """
+    count = int(round(float(traffic) / 100 * buckets))
+    if not 0 < count <= buckets:
+        raise ValueError(f"Traffic must be within (0, 100] percent of the layer, got {traffic!r}")
+    start = 0
+    for used_start, used_count in sorted(taken):
+        if used_start - start >= count:
+            break
+        start = max(start, used_start + used_count)
+    if start + count > buckets:
+        raise ValueError(f"No free range of {count}/{buckets} buckets left in the layer")
+    return start, count
+
+
+def experiment_allocation(experiment_id: str, spec) -> AllocationTable:
+    """Allocation table of a layered experiment; unsalted legacy specs get the experiment id as salt."""
+    table = spec if isinstance(spec, AllocationTable) else compile_allocation(spec or None)
+    if experiment_id != DEFAULT_EXPERIMENT and not table.salt and table.hash_version == LEGACY_HASH:
+        table = table.migrate(experiment_id)
+    return table
+
+
+class LayeredAssignment:
+    """
+    Compiled layer -> bucket -> (experiment, allocation table) lookup (read-only, safe to share).
+
+    Rows are dicts with experiment_id, layer, bucket_start, bucket_count and
+    allocation. Invalid or overlapping rows are skipped and listed in
+    `rejected` so one bad row cannot take the others down.
+    """
+
+    def __init__(self, experiments=(), buckets: int = LAYER_BUCKETS):
+        self.buckets = int(buckets)
+        self.experiments = {}  # experiment_id -> {"layer", "bucket_start", "bucket_count", "table"}
+        self.rejected = {}     # experiment_id -> reason
+        slots = {}
+        for row in experiments:
+            experiment_id = str(row.get("experiment_id") or "")
+            try:
+                entry = self._compile_row(experiment_id, row)
+                layer_slots = slots.setdefault(entry["layer"], [None] * self.buckets)
+                start, end = entry["bucket_start"], entry["bucket_start"] + entry["bucket_count"]
+                clash = {layer_slots[b][0] for b in range(start, end) if layer_slots[b] is not None}
+                if clash:
+                    raise ValueError(f"Overlaps {', '.join(sorted(clash))} in layer '{entry['layer']}'")
+            except (ValueError, TypeError, KeyError) as e:
+                self.rejected[experiment_id] = str(e)
+                continue
+            layer_slots[start:end] = [(experiment_id, entry["table"])] * (end - start)
+            self.experiments[experiment_id] = entry
+
+        # (bucketer, slots, sole): a layer owned entirely by one experiment needs no layer hash
+        self._layers = tuple(
+            (get_bucketer(layer_salt(layer), FAST_HASH, self.buckets), tuple(layer_slots),
+             layer_slots[0] if all(s is layer_slots[0] for s in layer_slots) else None)
+            for layer, layer_slots in slots.items()
+        )
+        self._layer_of = {experiment_id: i for i, layer in enumerate(slots)
+                          for experiment_id, entry in self.experiments.items() if entry["layer"] == layer}
+
+    def _compile_row(self, experiment_id: str, row: dict) -> dict:
+        if not experiment_id:
+            raise ValueError("Missing experiment_id")
+        if experiment_id in self.experiments:
+            raise ValueError("Duplicate experiment_id")
+        start, count = int(row.get("bucket_start") or 0), int(row.get("bucket_count") or self.buckets)
+        if start < 0 or count <= 0 or start + count > self.buckets:
+            raise ValueError(f"Bucket range {start}+{count} outside 0-{self.buckets}")
+        table = experiment_allocation(experiment_id, row.get("allocation"))
+        return {"layer": str(row.get("layer") or DEFAULT_LAYER), "bucket_start": start,
+                "bucket_count": count, "table": table}
+
+    def assign(self, uid) -> dict:
+        """{experiment_id: variant} for every experiment `uid` is in (one hash per layer plus one per experiment)."""
+        assigned = {}
+        for bucketer, slots, sole in self._layers:
+            entry = sole or slots[bucketer.bucket(uid)]
+            if entry is not None:
+                assigned[entry[0]] = entry[1].variant(uid)
+        return assigned
+
+    def variant(self, uid, experiment_id: str):
+        """Variant of `uid` in one experiment, or None when the user is outside it."""
+        layer = self._layer_of.get(experiment_id)
+        if layer is None:
+            return None
+        bucketer, slots, sole = self._layers[layer]
+        entry = sole or slots[bucketer.bucket(uid)]
+        return entry[1].variant(uid) if entry is not None and entry[0] == experiment_id else None
+
+    def assign_series(self, series: pd.Series) -> pd.DataFrame:
+        """
+        Variant per experiment for a pandas Series of user ids (NaN outside the
+        experiment), e.g. to attribute logged events offline. Each distinct id
+        is hashed once per layer and experiment.
+        """
+        out = pd.DataFrame(index=series.index)
+        for bucketer, slots, sole in self._layers:
+            owners = np.array([slot[0] if slot is not None else None for slot in slots], dtype=object)
+            layer_bucket = bucketer.bucket_series(series).to_numpy()
+            owner = owners[np.where(layer_bucket >= 0, layer_bucket, 0)]
+            owner[layer_bucket < 0] = None
+            for experiment_id in dict.fromkeys(s[0] for s in slots if s is not None):
+                variants = self.experiments[experiment_id]["table"].variants_series(series)
+                out[experiment_id] = variants.where(owner == experiment_id)
+        return out
+
+    def config(self) -> dict:
+        """JSON-friendly view of the compiled layers (for /admin endpoints)."""
+        return {
+            "experiments": {
+                experiment_id: {
+                    "layer": entry["layer"],
+                    "bucket_start": entry["bucket_start"],
+                    "bucket_count": entry["bucket_count"],
+                    "traffic": entry["bucket_count"] / self.buckets * 100,
+                    "allocation": entry["table"].config(),
+                }
+                for experiment_id, entry in self.experiments.items()
+            },
+            "rejected": dict(self.rejected),
+        }
+
+    def __len__(self):
+        return len(self.experiments)
+
+
+EMPTY_LAYERS = LayeredAssignment()
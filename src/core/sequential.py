@@ -0,0 +1,214 @@
+"""
+Sequential Testing
+Peeking-safe decisions for the live simulation page, computed from the running
+per-variant counts (users / conversions) on every poll.
+
+Two procedures:
+- mSPRT (mixture sequential probability ratio test): an always-valid p-value
+  that may be checked after every visitor. The test stops as soon as p <= alpha.
+- Group-sequential boundaries (Lan-DeMets alpha spending with O'Brien-Fleming
+  or Pocock shapes): a z-test at a few planned looks (fractions of the Step 2
+  sample size), each with its own critical value, so the total type I error
+  stays at alpha.
+
+Both keep their state between polls (running minimum p-value, alpha already
+spent and the surviving null density), so each update is O(1) in traffic.
+"""
+import math
+
+import numpy as np
+from scipy import optimize, stats
+
+SPENDING_FUNCTIONS = ("obrien_fleming", "pocock")
+DEFAULT_LOOKS = 5
+_GRID_POINTS = 801  # Numerical integration grid over the continuation region
+
+
+def _rate_moments(c_users, c_conv, t_users, t_conv):
+    """Difference in rates and its (unpooled) variance, elementwise."""
+    c_users, c_conv = np.asarray(c_users, dtype=float), np.asarray(c_conv, dtype=float)
+    t_users, t_conv = np.asarray(t_users, dtype=float), np.asarray(t_conv, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_c = np.where(c_users > 0, c_conv / c_users, 0.0)
+        p_t = np.where(t_users > 0, t_conv / t_users, 0.0)
+        var = np.where((c_users > 0) & (t_users > 0),
+                       p_c * (1 - p_c) / c_users + p_t * (1 - p_t) / t_users, 0.0)
+    return p_c, p_t, p_t - p_c, var
+
+
+def msprt(c_users, c_conv, t_users, t_conv, tau=None, alpha=0.05):
+    """
+    Mixture SPRT for the difference of two proportions (normal approximation,
+    normal mixing distribution N(0, tau^2) over the true difference).
+
+    Args:
+        tau: Scale of plausible differences in rate units (e.g. baseline * MDE).
+             None: 10% of the pooled rate.
+        All count arguments broadcast like calculate_statistics / two_proportion_tests.
+
+    Returns a dict of arrays: diff, likelihood_ratio, p_value (1 / ratio, capped
+    at 1; take the running minimum over time, see SequentialMonitor) and reject.
+    """
+    _, _, diff, var = _rate_moments(c_users, c_conv, t_users, t_conv)
+    if tau is None:
+        total = np.asarray(c_users, dtype=float) + np.asarray(t_users, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pooled = np.where(total > 0, (np.asarray(c_conv) + np.asarray(t_conv)) / total, 0.0)
+        tau = 0.1 * pooled
+    tau2 = np.maximum(np.asarray(tau, dtype=float) ** 2, 1e-12)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_ratio = np.where(var > 0,
+                             0.5 * np.log(var / (var + tau2)) + tau2 * diff ** 2 / (2 * var * (var + tau2)),
+                             0.0)
+    ratio = np.exp(np.minimum(log_ratio, 700.0))
+    p_value = np.minimum(1.0, np.exp(-log_ratio))
+    return {
+        "diff": diff,
+        "likelihood_ratio": ratio,
+        "p_value": p_value,
+        "reject": p_value <= alpha,
+    }
+
+
+def alpha_spent(info_fraction, alpha=0.05, spending="obrien_fleming"):
+    """Cumulative two-sided alpha spent by information fraction t (Lan-DeMets)."""
+    t = min(max(float(info_fraction), 0.0), 1.0)
+    if t <= 0:
+        return 0.0
+    if spending == "obrien_fleming":
+        return float(2 * (1 - stats.norm.cdf(stats.norm.ppf(1 - alpha / 2) / math.sqrt(t))))
+    if spending == "pocock":
+        return float(alpha * math.log(1 + (math.e - 1) * t))
+    raise ValueError(f"Unknown spending function '{spending}' (expected one of {', '.join(SPENDING_FUNCTIONS)})")
+
+
+class GroupSequentialDesign:
+    """
+    Two-sided group-sequential boundaries computed one look at a time.
+
+    The z statistic at information fraction t is a Brownian motion S(t) = Z * sqrt(t)
+    under the null. After each look the design keeps the sub-density of S on the
+    continuation region (paths that have not crossed yet), so the next boundary
+    only needs one numerical integration step: it spends alpha(t_k) - alpha(t_{k-1}).
+    Looks may come at any information fractions; the look at t >= 1 spends the rest.
+    """
+
+    def __init__(self, alpha: float = 0.05, spending: str = "obrien_fleming"):
+        alpha_spent(0.5, alpha, spending)  # Validates the spending function
+        self.alpha = alpha
+        self.spending = spending
+        self.info_fractions = []
+        self.boundaries = []
+        self._spent = 0.0
+        self._grid = None      # S values of the continuation region at the last look
+        self._density = None   # Sub-density of S on that grid (integrates to 1 - spent)
+        self._step = None      # Trapezoid weights of the grid
+
+    def next_boundary(self, info_fraction: float) -> float:
+        """Critical |z| for a look at this information fraction (records the look)."""
+        t = min(float(info_fraction), 1.0)
+        prev_t = self.info_fractions[-1] if self.info_fractions else 0.0
+        if t <= prev_t:
+            raise ValueError(f"Information fraction must increase between looks ({t:.4f} <= {prev_t:.4f})")
+        target = alpha_spent(t, self.alpha, self.spending) - self._spent
+        sd = math.sqrt(t - prev_t)
+
+        if self._grid is None:
+            def crossing(c):
+                return 2 * stats.norm.sf(c / math.sqrt(t))
+        else:
+            weights = self._density * self._step
+
+            def crossing(c):
+                return float(weights @ (stats.norm.sf((c - self._grid) / sd) + stats.norm.cdf((-c - self._grid) / sd)))
+
+        if target <= 0:
+            c = math.inf
+        else:
+            c = optimize.brentq(lambda x: crossing(x) - target, 1e-9, 40.0 * math.sqrt(t), xtol=1e-10)
+        self._spent += target if np.isfinite(c) else 0.0
+
+        # Propagate the surviving density to the continuation region |S| < c
+        bound = c if np.isfinite(c) else 8.0 * math.sqrt(t)
+        grid = np.linspace(-bound, bound, _GRID_POINTS)
+        if self._grid is None:
+            density = stats.norm.pdf(grid, scale=math.sqrt(t))
+        else:
+            kernel = stats.norm.pdf((grid[:, None] - self._grid[None, :]) / sd) / sd
+            density = kernel @ (self._density * self._step)
+        self._grid, self._density = grid, density
+        self._step = _trapezoid_weights(grid)
+
+        boundary = c / math.sqrt(t)
+        self.info_fractions.append(t)
+        self.boundaries.append(boundary)
+        return boundary
+
+
+def _trapezoid_weights(grid):
+    step = np.full(grid.shape, grid[1] - grid[0])
+    step[[0, -1]] *= 0.5
+    return step
+
+
+def group_sequential_boundaries(info_fractions, alpha=0.05, spending="obrien_fleming") -> np.ndarray:
+    """Critical |z| per look for a planned set of increasing information fractions."""
+    design = GroupSequentialDesign(alpha, spending)
+    return np.array([design.next_boundary(t) for t in info_fractions])
+
+
+class SequentialMonitor:
+    """
+    Live early-stopping state of one experiment, fed the running counts on every poll.
+
+        monitor = SequentialMonitor(n_per_group=3000, tau=baseline * mde)
+        result = monitor.update(c_users, c_conv, t_users, t_conv)
+        if result["stop"]: ...
+
+    mSPRT is checked on every update (running-minimum p-value). The group-sequential
+    test is checked when the smaller group reaches the next planned look
+    (looks equally spaced up to n_per_group), using the fraction actually reached.
+    """
+
+    def __init__(self, n_per_group: int, alpha: float = 0.05, tau: float = None,
+                 looks: int = DEFAULT_LOOKS, spending: str = "obrien_fleming"):
+        self.n_per_group = max(int(n_per_group), 1)
+        self.alpha = alpha
+        self.tau = tau
+        self.looks = max(int(looks), 1)
+        self.design = GroupSequentialDesign(alpha, spending)
+        self.p_value = 1.0
+        self.z_scores = []
+        self.stopped_by = None
+
+    def update(self, c_users, c_conv, t_users, t_conv) -> dict:
+        seq = msprt(c_users, c_conv, t_users, t_conv, self.tau, self.alpha)
+        self.p_value = min(self.p_value, float(seq["p_value"]))
+        if self.stopped_by is None and self.p_value <= self.alpha:
+            self.stopped_by = "msprt"
+
+        info = min(c_users, t_users) / self.n_per_group
+        boundary = self.design.boundaries[-1] if self.design.boundaries else None
+        last = self.design.info_fractions[-1] if self.design.info_fractions else 0.0
+        # A poll without new users in the smaller group (failed sessions, one arm growing) takes no look
+        if last < 1.0 and info > last and info >= (len(self.design.boundaries) + 1) / self.looks:
+            # The last planned look (or any look past the horizon) spends all remaining alpha
+            final = info >= 1.0 or len(self.design.boundaries) + 1 >= self.looks
+            boundary = self.design.next_boundary(1.0 if final else info)
+            _, _, diff, var = _rate_moments(c_users, c_conv, t_users, t_conv)
+            z = float(diff / math.sqrt(var)) if var > 0 else 0.0
+            self.z_scores.append(z)
+            if self.stopped_by is None and abs(z) >= boundary:
+                self.stopped_by = "group_sequential"
+
+        return {
+            "always_valid_p": self.p_value,
+            "diff": float(seq["diff"]),
+            "info_fraction": info,
+            "look": len(self.design.boundaries),
+            "boundary": boundary,
+            "z_score": self.z_scores[-1] if self.z_scores else None,
+            "stop": self.stopped_by is not None,
+            "stopped_by": self.stopped_by,
+        }
@@ -1,12 +1,14 @@
 import duckdb
 import os
-import hashlib
 import numpy as np
 import pandas as pd
 from scipy import stats
 import streamlit as st
 import logging
 
+from src.core import bayesian, bucketing
+from src.core.accumulator import STATS_TABLE, SUM_COLUMNS
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("Stats")
@@ -266,13 +268,16 @@ def calculate_sample_size(baseline_cvr, mde, alpha=0.05, power=0.8):
     n = (2 * pooled_prob * (1 - pooled_prob) * (Z_alpha + Z_beta)**2) / (p1 - p2)**2
     return int(n)
 
-def get_bucket(user_id, num_buckets=100):
+def z_critical(alpha=0.05) -> float:
+    """Two-sided critical z value (1.96 for alpha=0.05)."""
+    return float(stats.norm.ppf(1 - alpha / 2))
+
+def get_bucket(user_id, num_buckets=100, salt="", hash_version=bucketing.LEGACY_HASH):
     """
     Deterministic hashing function to bucket users.
-    Returns an integer between 0 and num_buckets-1.
+    Returns an integer between 0 and num_buckets-1 (same buckets as the Target App, see src.core.bucketing).
     """
-    hash_obj = hashlib.md5(str(user_id).encode())
-    return int(hash_obj.hexdigest(), 16) % num_buckets
+    return bucketing.bucket(user_id, num_buckets, salt, hash_version)
 
 @st.cache_data(ttl=60)  # Cache for 1 minute (short TTL for live data)
 def calculate_statistics(c_users, c_conv, t_users, t_conv):
@@ -280,36 +285,442 @@ def calculate_statistics(c_users, c_conv, t_users, t_conv):
     Calculate A/B test statistics: CVRs, Lift, and P-value.
     Returns a dictionary with results.
     """
-    # Rates
-    c_rate = c_conv / c_users if c_users > 0 else 0
-    t_rate = t_conv / t_users if t_users > 0 else 0
-    
-    # Lift
-    lift = (t_rate - c_rate) / c_rate if c_rate > 0 else 0
-    
-    # P-value (Two-proportion Z-test)
-    p_val = 1.0
-    se = 0
-    z = 0
-    margin_of_error = 0
-    
-    if c_users > 0 and t_users > 0:
-        pooled_p = (c_conv + t_conv) / (c_users + t_users)
-        se = np.sqrt(pooled_p * (1 - pooled_p) * (1/c_users + 1/t_users))
-        
-        if se > 0:
-            z = (t_rate - c_rate) / se
-            p_val = stats.norm.sf(abs(z)) * 2  # Two-tailed
-    
+    res = two_proportion_tests(c_users, c_conv, t_users, t_conv)
+    return {key: float(res[key]) for key in ("control_rate", "test_rate", "lift", "p_value", "z_score", "se")}
+
+def two_proportion_tests(c_users, c_conv, t_users, t_conv, alpha=0.05):
+    """
+    Vectorized two-proportion z-tests: one test per element of the input arrays.
+    Same statistics as calculate_statistics (pooled SE for z / p-value), plus a
+    (1 - alpha) CI for the rate difference (unpooled SE) and the matching relative lift CI.
+    Returns a dict of NumPy arrays.
+    """
+    c_users, c_conv, t_users, t_conv = np.broadcast_arrays(*(np.asarray(x, dtype=float)
+                                                            for x in (c_users, c_conv, t_users, t_conv)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Rates
+        c_rate = np.where(c_users > 0, c_conv / c_users, 0.0)
+        t_rate = np.where(t_users > 0, t_conv / t_users, 0.0)
+        diff = t_rate - c_rate
+
+        # Lift
+        lift = np.where(c_rate > 0, diff / c_rate, 0.0)
+
+        # P-value (Two-proportion Z-test, pooled)
+        valid = (c_users > 0) & (t_users > 0)
+        pooled_p = np.where(valid, (c_conv + t_conv) / (c_users + t_users), 0.0)
+        se = np.where(valid, np.sqrt(pooled_p * (1 - pooled_p) * (1 / c_users + 1 / t_users)), 0.0)
+        z = np.where(se > 0, diff / se, 0.0)
+        p_val = np.where(se > 0, stats.norm.sf(np.abs(z)) * 2, 1.0)  # Two-tailed
+
+        # CI of the difference (unpooled)
+        se_diff = np.where(valid, np.sqrt(c_rate * (1 - c_rate) / c_users + t_rate * (1 - t_rate) / t_users), 0.0)
+        margin = stats.norm.ppf(1 - alpha / 2) * se_diff
+        ci_low, ci_high = diff - margin, diff + margin
+        lift_ci_low = np.where(c_rate > 0, ci_low / c_rate, 0.0)
+        lift_ci_high = np.where(c_rate > 0, ci_high / c_rate, 0.0)
+
     return {
         "control_rate": c_rate,
         "test_rate": t_rate,
+        "diff": diff,
         "lift": lift,
         "p_value": p_val,
         "z_score": z,
-        "se": se
+        "se": se,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+        "lift_ci_low": lift_ci_low,
+        "lift_ci_high": lift_ci_high,
+        "significant": p_val < alpha,
     }
 
+def _pair_with_control(df, by, variant_col, control, columns):
+    """
+    Test rows of a long DataFrame next to the control row of their segment.
+    columns maps source column -> name; the result has test_<name> and control_<name>.
+    """
+    counts = df[by + [variant_col] + list(columns)]
+    is_control = counts[variant_col] == control
+    ctrl = counts[is_control].rename(columns={c: f"control_{n}" for c, n in columns.items()})
+    test = counts[~is_control].rename(columns={c: f"test_{n}" for c, n in columns.items()})
+
+    ctrl = ctrl.drop(columns=variant_col)
+    merged = test.merge(ctrl, on=by, how="inner") if by else test.merge(ctrl, how="cross")
+    return merged.reset_index(drop=True)
+
+P_VALUE_CORRECTIONS = ("bonferroni", "holm", "bh")
+
+def adjust_p_values(p_values, method="holm", groups=None) -> np.ndarray:
+    """
+    Multiple-comparison adjusted p-values, vectorized over families.
+
+    method: 'bonferroni' / 'holm' (family-wise error rate) or 'bh'
+            (Benjamini-Hochberg false discovery rate).
+    groups: optional family label per p-value (e.g. the segment of each test
+            variant); None treats all p-values as one family.
+    """
+    if method not in P_VALUE_CORRECTIONS:
+        raise ValueError(f"Unknown correction '{method}' (expected one of {', '.join(P_VALUE_CORRECTIONS)})")
+    p = np.asarray(p_values, dtype=float)
+    if p.size == 0:
+        return p.copy()
+    family = np.zeros(p.size, dtype=np.int64) if groups is None else pd.factorize(np.asarray(groups))[0]
+
+    # Sort by (family, p) so each family is a contiguous ascending run
+    order = np.lexsort((p, family))
+    fam = family[order]
+    ps = p[order]
+    size = np.bincount(fam)[fam]
+    rank = np.arange(p.size) - np.searchsorted(fam, fam)  # 0-based rank within the family
+
+    if method == "bonferroni":
+        adj = ps * size
+    elif method == "holm":
+        adj = pd.Series(ps * (size - rank)).groupby(fam).cummax().to_numpy()
+    else:
+        scaled = pd.Series(ps * size / (rank + 1))
+        adj = scaled[::-1].groupby(fam[::-1]).cummin()[::-1].to_numpy()
+
+    out = np.empty_like(p)
+    out[order] = np.minimum(adj, 1.0)
+    return out
+
+def segment_statistics(df, by=(), variant_col="variant", control="A", users_col="users",
+                       conv_col="conversions", alpha=0.05, correction=None):
+    """
+    Two-proportion tests for every segment and test variant of a long DataFrame.
+
+    df has one row per (segment..., variant) with users and conversions, e.g.
+    columns [persona, day, metric, variant, users, conversions]. Each non-control
+    variant is compared to the control row of the same segment, all in one
+    vectorized pass. Returns one row per (segment..., variant) with the
+    two_proportion_tests columns.
+
+    correction: None or an adjust_p_values method for A/B/n runs. The test
+    variants of each segment form one family; adds p_adjusted and bases
+    `significant` on it.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    merged = _pair_with_control(df, by, variant_col, control, {users_col: "users", conv_col: "conversions"})
+
+    res = two_proportion_tests(merged["control_users"], merged["control_conversions"],
+                               merged["test_users"], merged["test_conversions"], alpha=alpha)
+    out = merged[by + [variant_col, "control_users", "control_conversions", "test_users", "test_conversions"]].copy()
+    for key, values in res.items():
+        out[key] = values
+    if correction:
+        groups = out.groupby(by, sort=False).ngroup().to_numpy() if by else None
+        out["p_adjusted"] = adjust_p_values(out["p_value"], correction, groups)
+        out["significant"] = out["p_adjusted"] < alpha
+    return out
+
+def bayesian_segment_statistics(df, by=(), variant_col="variant", control="A", users_col="users",
+                                conv_col="conversions", draws=bayesian.DEFAULT_DRAWS, seed=0):
+    """
+    Bayesian counterpart of segment_statistics: Beta-Binomial posteriors for every
+    segment and test variant in one vectorized pass (prob_beat, expected_loss,
+    lift credible interval; see src.core.bayesian).
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    merged = _pair_with_control(df, by, variant_col, control, {users_col: "users", conv_col: "conversions"})
+
+    res = bayesian.beta_binomial_test(merged["control_users"], merged["control_conversions"],
+                                      merged["test_users"], merged["test_conversions"], draws=draws, seed=seed)
+    out = merged[by + [variant_col, "control_users", "control_conversions", "test_users", "test_conversions"]].copy()
+    for key, values in res.items():
+        out[key] = values
+    return out
+
+@st.cache_data(ttl=600)  # Keyed by run_id and the run's counts, so new traffic recomputes
+def bayesian_run_statistics(run_id, run_stats, control="A", draws=bayesian.DEFAULT_DRAWS):
+    """
+    Bayesian results of a run from its get_run_stats() frame: one row per
+    (metric, test variant) for CTR and CVR (Beta-Binomial) and ARPU (Gamma
+    revenue model), with posterior means, prob_beat, expected_loss and the
+    lift credible interval.
+    """
+    rates = pd.concat([
+        run_stats[["variant", "users"]].assign(metric=metric, conversions=run_stats[col])
+        for metric, col in (("CTR", "clicks"), ("CVR", "purchases"))
+    ])
+    out = bayesian_segment_statistics(rates, by="metric", control=control, draws=draws)
+
+    revenue = _pair_with_control(run_stats, [], "variant", control, {
+        "users": "users", "purchases": "purchases", "revenue_sum": "revenue", "revenue_sq_sum": "revenue_sq"})
+    res = bayesian.gamma_revenue_test(*(revenue[f"{arm}_{n}"] for arm in ("control", "test")
+                                        for n in ("users", "purchases", "revenue", "revenue_sq")), draws=draws)
+    arpu = revenue[["variant", "control_users", "test_users"]].assign(metric="ARPU")
+    for key, values in res.items():
+        arpu[key] = values
+    return pd.concat([out, arpu], ignore_index=True)
+
+def get_run_stats(run_id, con=None):
+    """
+    Per-variant sufficient statistics of a run: variant + accumulator.SUM_COLUMNS
+    (users, weight sums, clicks, bounces, purchases, revenue sum / sum of squares).
+
+    Reads the experiment_stats rows the Target App keeps up to date while it
+    ingests traffic, so the cost does not grow with event volume. Runs it did
+    not ingest (direct engine, runs from before the table existed) fall back
+    to a single aggregate scan of assignments and events.
+    """
+    df = run_query(f"SELECT variant, {', '.join(SUM_COLUMNS)} FROM {STATS_TABLE} "
+                   f"WHERE run_id = '{run_id}' ORDER BY variant", con)
+    if df.empty:
+        df = run_query(_run_stats_scan_sql(run_id), con)
+    return df
+
+def _run_stats_scan_sql(run_id):
+    """Same columns as get_run_stats, derived from the raw tables (distinct users per event type)."""
+    return f"""
+    WITH a AS (
+        SELECT user_id, variant, weight FROM assignments WHERE run_id = '{run_id}'
+    ),
+    u AS (
+        SELECT variant, COUNT(*) AS users, SUM(weight) AS weight_sum, SUM(weight * weight) AS weight_sq_sum
+        FROM a GROUP BY 1
+    ),
+    ev AS (
+        SELECT
+            a.variant,
+            COUNT(CASE WHEN e.event_name = 'page_view' THEN 1 END) AS page_views,
+            COUNT(DISTINCT CASE WHEN e.event_name = 'click_banner' OR e.event_name LIKE 'banner_%' THEN e.user_id END) AS clicks,
+            COUNT(DISTINCT CASE WHEN e.event_name = 'bounce' THEN e.user_id END) AS bounces,
+            COUNT(DISTINCT CASE WHEN e.event_name = 'purchase' THEN e.user_id END) AS purchases,
+            SUM(CASE WHEN e.event_name = 'purchase' THEN e.value ELSE 0 END) AS revenue_sum,
+            SUM(CASE WHEN e.event_name = 'purchase' THEN e.value * e.value ELSE 0 END) AS revenue_sq_sum
+        FROM a JOIN events e ON a.user_id = e.user_id AND e.run_id = '{run_id}'
+        GROUP BY 1
+    )
+    SELECT
+        u.variant, u.users, u.weight_sum, u.weight_sq_sum,
+        COALESCE(ev.page_views, 0) AS page_views, COALESCE(ev.clicks, 0) AS clicks,
+        COALESCE(ev.bounces, 0) AS bounces, COALESCE(ev.purchases, 0) AS purchases,
+        COALESCE(ev.revenue_sum, 0) AS revenue_sum, COALESCE(ev.revenue_sq_sum, 0) AS revenue_sq_sum
+    FROM u LEFT JOIN ev ON u.variant = ev.variant
+    ORDER BY 1
+    """
+
+CUPED_COVARIATES = ("pre_orders", "pre_revenue")
+
+def get_run_user_outcomes(run_id, con=None):
+    """
+    One row per assigned user of a run: user_id, variant, weight, assigned_at and
+    the in-experiment outcomes clicked / purchased (0/1) and revenue.
+    """
+    sql = f"""
+    SELECT
+        a.user_id, a.variant, a.weight, MIN(a.assigned_at) AS assigned_at,
+        MAX(CASE WHEN e.event_name = 'click_banner' OR e.event_name LIKE 'banner_%' THEN 1 ELSE 0 END) AS clicked,
+        MAX(CASE WHEN e.event_name = 'purchase' THEN 1 ELSE 0 END) AS purchased,
+        COALESCE(SUM(CASE WHEN e.event_name = 'purchase' THEN e.value ELSE 0 END), 0) AS revenue
+    FROM assignments a
+    LEFT JOIN events e ON a.user_id = e.user_id AND e.run_id = '{run_id}'
+    WHERE a.run_id = '{run_id}'
+    GROUP BY a.user_id, a.variant, a.weight
+    """
+    return run_query(sql, con)
+
+def get_pre_period_covariates(start=None, days=30, con=None):
+    """
+    Pre-period behavior per warehouse user in one aggregate query: order count and
+    revenue in the `days` before `start` (default: now). Users without orders in
+    the window are absent (treat them as 0).
+    """
+    start_sql = f"TIMESTAMP '{pd.Timestamp(start):%Y-%m-%d %H:%M:%S}'" if start is not None else "CURRENT_TIMESTAMP"
+    sql = f"""
+    SELECT user_id, COUNT(*) AS pre_orders, SUM(amount) AS pre_revenue
+    FROM orders
+    WHERE order_at < {start_sql} AND order_at >= {start_sql} - INTERVAL '{int(days)} days'
+    GROUP BY 1
+    """
+    return run_query(sql, con, db_type='warehouse')
+
+def cuped_statistics(df, metric, covariates=CUPED_COVARIATES, variant_col="variant", control="A", alpha=0.05):
+    """
+    CUPED / regression adjustment on per-user data (one row per user with the
+    variant, the metric and pre-period covariates).
+
+    Y_adj = Y - (X - mean X) @ theta, with theta fitted by OLS on all users pooled.
+    Pre-period covariates cannot be affected by the assignment, so the adjusted
+    difference stays unbiased while its variance shrinks by the R^2 of X.
+    Returns one row per test variant: means, adjusted diff with (1 - alpha) CI and
+    p-value, lift / lift CI relative to the control mean, the unadjusted SE and
+    the variance reduction.
+    """
+    y = df[metric].to_numpy(dtype=float)
+    x = df[list(covariates)].to_numpy(dtype=float)
+    x = x - x.mean(axis=0) if len(x) else x
+    theta = np.linalg.lstsq(x, y - y.mean(), rcond=None)[0] if len(y) else np.zeros(x.shape[1])
+
+    groups = pd.DataFrame({"variant": df[variant_col].to_numpy(), "y": y, "y_adj": y - x @ theta})
+    agg = groups.groupby("variant").agg(users=("y", "size"), mean=("y", "mean"), var=("y", "var"),
+                                        mean_adj=("y_adj", "mean"), var_adj=("y_adj", "var")).fillna(0.0)
+    if control not in agg.index:
+        return pd.DataFrame()
+    ctrl, test = agg.loc[control], agg.drop(index=control)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        se_raw = np.sqrt(ctrl["var"] / ctrl["users"] + test["var"] / test["users"])
+        se = np.sqrt(ctrl["var_adj"] / ctrl["users"] + test["var_adj"] / test["users"])
+        diff = test["mean_adj"] - ctrl["mean_adj"]
+        z = np.where(se > 0, diff / se, 0.0)
+        margin = stats.norm.ppf(1 - alpha / 2) * se
+        base = ctrl["mean"]
+        out = pd.DataFrame({
+            "variant": test.index,
+            "control_users": int(ctrl["users"]),
+            "test_users": test["users"].to_numpy(),
+            "control_mean": base,
+            "test_mean": test["mean"].to_numpy(),
+            "diff": diff.to_numpy(),
+            "se": se.to_numpy(),
+            "ci_low": (diff - margin).to_numpy(),
+            "ci_high": (diff + margin).to_numpy(),
+            "p_value": np.where(se > 0, stats.norm.sf(np.abs(z)) * 2, 1.0),
+            "lift": (diff / base).to_numpy() if base > 0 else 0.0,
+            "lift_ci_low": ((diff - margin) / base).to_numpy() if base > 0 else 0.0,
+            "lift_ci_high": ((diff + margin) / base).to_numpy() if base > 0 else 0.0,
+            "se_unadjusted": se_raw.to_numpy(),
+            "variance_reduction": np.where(se_raw > 0, 1 - (se / se_raw) ** 2, 0.0),
+        })
+    out["significant"] = out["p_value"] < alpha
+    return out.reset_index(drop=True)
+
+def cuped_analysis(run_id, metric="revenue", days=30, control="A", con=None, warehouse_con=None):
+    """
+    CUPED-adjusted lift of a run: per-user outcomes (experiment DB) joined with the
+    warehouse pre-period covariates of the `days` before the run started.
+    metric: 'clicked' (CTR), 'purchased' (CVR) or 'revenue' (ARPU).
+    Adds `coverage`, the share of experiment users with pre-period orders.
+    """
+    users = get_run_user_outcomes(run_id, con)
+    if users.empty:
+        return pd.DataFrame()
+    pre = get_pre_period_covariates(users["assigned_at"].min(), days, warehouse_con)
+    merged = users.merge(pre, on="user_id", how="left")
+    coverage = float(merged["pre_orders"].notna().mean())
+    merged[list(CUPED_COVARIATES)] = merged[list(CUPED_COVARIATES)].astype(float).fillna(0.0)
+
+    out = cuped_statistics(merged, metric, control=control)
+    out["coverage"] = coverage
+    return out
+
+BOOTSTRAP_CHUNK_DRAWS = 4_000_000  # Purchaser draws per chunk (bounds memory per worker)
+
+def _bootstrap_chunk(args):
+    """
+    Revenue sums for a chunk of bootstrap resamples of one arm.
+
+    A resample of n users has multinomial counts over users. Only purchasers carry
+    revenue, so the counts are drawn in two exact stages: the number of draws that
+    land on purchasers (Binomial), the purchasers they hit (uniform indices), and
+    the non-purchasers by distinct weight (Multinomial). Cost scales with
+    purchasers, not users.
+    Returns (resamples, 3): sum(w * revenue), sum(w), sum(w) over purchasers.
+    """
+    buyer_w, buyer_wr, other_w, other_p, n, resamples, seed = args
+    rng = np.random.default_rng(seed)
+    m = len(buyer_w)
+    k = rng.binomial(n, m / n, size=resamples) if m else np.zeros(resamples, dtype=np.int64)
+
+    out = np.zeros((resamples, 3))
+    if k.sum():
+        idx = rng.integers(0, m, size=int(k.sum()), dtype=np.int32)
+        starts = np.concatenate(([0], np.cumsum(k)[:-1]))
+        hit = k > 0
+        out[hit, 0] = np.add.reduceat(buyer_wr[idx], starts[hit])
+        if np.ptp(buyer_w) == 0:
+            out[:, 2] = k * buyer_w[0]  # One weight per run (the usual case): no second gather
+        else:
+            out[hit, 2] = np.add.reduceat(buyer_w[idx], starts[hit])
+    out[:, 1] = out[:, 2]
+    if len(other_w):
+        out[:, 1] += rng.multinomial(n - k, other_p) @ other_w
+    return out
+
+def bootstrap_revenue_sums(revenue, weight=None, resamples=10_000, seed=0, workers=None):
+    """
+    Bootstrap distribution of weighted revenue sums for one group of users.
+    revenue / weight: per-user arrays (weight defaults to 1).
+    workers: processes for chunked resampling (None or 1: in-process). Chunks get
+    their own seeds from `seed`, so results do not depend on the worker count.
+    Returns (resamples, 3): sum(w * revenue), sum(w), sum(w) over purchasers.
+    """
+    revenue = np.asarray(revenue, dtype=float)
+    weight = np.ones_like(revenue) if weight is None else np.asarray(weight, dtype=float)
+    n = len(revenue)
+    if n == 0:
+        return np.zeros((resamples, 3))
+    buyers = revenue > 0
+    other_w, other_counts = np.unique(weight[~buyers], return_counts=True)
+
+    per_chunk = max(1, min(resamples, int(BOOTSTRAP_CHUNK_DRAWS / max(buyers.sum(), 1))))
+    sizes = [min(per_chunk, resamples - i) for i in range(0, resamples, per_chunk)]
+    seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(sizes))
+    tasks = [(weight[buyers], weight[buyers] * revenue[buyers], other_w, other_counts / other_counts.sum()
+              if len(other_w) else other_counts, n, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+
+    if workers and workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return np.concatenate(list(pool.map(_bootstrap_chunk, tasks)))
+    return np.concatenate([_bootstrap_chunk(task) for task in tasks])
+
+def bootstrap_revenue_statistics(users, control="A", resamples=10_000, alpha=0.05, seed=0, workers=None):
+    """
+    Bootstrap CIs for AOV and ARPU per variant from per-user data
+    (get_run_user_outcomes: variant, weight, revenue).
+
+    AOV = sum(w * revenue) / sum(w over purchasers); ARPU = sum(w * revenue) / sum(w),
+    the weighted definitions of the metrics table. Arms are resampled
+    independently; test variants also get the difference to control with its
+    percentile CI, relative lift CI and a two-sided bootstrap p-value.
+    """
+    tail = alpha / 2
+    groups = list(users.groupby("variant", sort=True))
+    draws, points = {}, {}
+    for (variant, group), arm_seed in zip(groups, np.random.SeedSequence(seed).spawn(len(groups))):
+        revenue = group["revenue"].to_numpy(dtype=float)
+        weight = group["weight"].fillna(1.0).to_numpy(dtype=float)
+        sums = bootstrap_revenue_sums(revenue, weight, resamples, arm_seed, workers)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            draws[variant] = {"AOV": sums[:, 0] / sums[:, 2], "ARPU": sums[:, 0] / sums[:, 1]}
+        total = (weight * revenue).sum()
+        points[variant] = {"AOV": total / weight[revenue > 0].sum() if (revenue > 0).any() else np.nan,
+                           "ARPU": total / weight.sum()}
+
+    rows = []
+    for metric in ("AOV", "ARPU"):
+        for variant, arm in draws.items():
+            values = arm[metric][np.isfinite(arm[metric])]
+            row = {"metric": metric, "variant": variant, "estimate": points[variant][metric],
+                   "ci_low": np.nan, "ci_high": np.nan, "se": np.nan}
+            if len(values) > 1:
+                row.update(ci_low=np.quantile(values, tail), ci_high=np.quantile(values, 1 - tail),
+                           se=values.std(ddof=1))
+            if variant != control and control in draws:
+                diff = arm[metric] - draws[control][metric]
+                diff = diff[np.isfinite(diff)]
+                base = points[control][metric]
+                if len(diff):
+                    low, high = np.quantile(diff, [tail, 1 - tail])
+                    row.update(diff=points[variant][metric] - base, diff_ci_low=low, diff_ci_high=high,
+                               lift_ci_low=low / base if base else np.nan, lift_ci_high=high / base if base else np.nan,
+                               p_value=min(1.0, 2 * min((diff <= 0).mean(), (diff >= 0).mean())))
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+@st.cache_data(ttl=60)  # Same short TTL as calculate_statistics (live data)
+def bootstrap_run_revenue(run_id, resamples=10_000, control="A", workers=None):
+    """Bootstrap AOV / ARPU CIs of a run (per-user arrays pulled once, see bootstrap_revenue_statistics)."""
+    users = get_run_user_outcomes(run_id)
+    if users.empty:
+        return pd.DataFrame()
+    return bootstrap_revenue_statistics(users, control=control, resamples=resamples, workers=workers)
+
 def format_delta(val, is_percent=True):
     """
     Helper to format delta strings (e.g., "+5.00%" or "-0.12")
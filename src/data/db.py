@@ -21,7 +21,7 @@ DATA_DIR = os.path.join(_BASE_DIR, 'data')
 
 # DB Split: Warehouse (persistent) vs Experiment (volatile)
 WAREHOUSE_DB_PATH = os.path.join(DATA_DIR, 'db', 'novarium_warehouse.db')  # users, orders, 30-day history
-EXPERIMENT_DB_PATH = os.path.join(DATA_DIR, 'db', 'novarium_experiment.db')  # assignments, events, experiments, adoptions, active_experiment
+EXPERIMENT_DB_PATH = os.path.join(DATA_DIR, 'db', 'novarium_experiment.db')  # assignments, events, experiments, adoptions, active_experiment, layer_experiments
 
 # Legacy alias (for gradual migration)
 DB_PATH = EXPERIMENT_DB_PATH
@@ -173,6 +173,20 @@ def _direct_write(sql: str, params: list = None):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def invalidate_target_app_cache():
+    """
+    Ask the Target App to drop its cached experiment state.
+    Call after activating, adopting or rolling back an experiment.
+
+    Returns:
+        True if the Target App acknowledged, False otherwise
+    """
+    try:
+        resp = requests.post(f"{TARGET_APP_URL}/admin/invalidate_cache", timeout=2)
+        return resp.status_code == 200
+    except requests.exceptions.RequestException:
+        return False  # Target App not running; its cache TTL will catch up
+
 def safe_write_batch(operations: list, use_coordination: bool = True):
     """
     Execute multiple write operations in a single coordinated session.
@@ -294,6 +308,84 @@ def _pg_batch_write(operations: list):
         logger.error(f"PG Batch Connection Error: {e}")
         return {"status": "error", "message": str(e), "results": results}
 
+def bulk_insert_frames(batches, use_coordination: bool = True):
+    """
+    Bulk-load DataFrames into experiment tables in a single transaction.
+    Used by the direct swarm engine to write millions of simulated rows at once.
+
+    Args:
+        batches: Iterable of {table_name: DataFrame}. Consumed lazily, so callers
+                 can generate rows chunk by chunk without holding them all in memory.
+        use_coordination: If True, coordinate with Target App (DuckDB only)
+
+    Returns:
+        dict with status and inserted row counts per table
+    """
+    rows = {}
+    if is_cloud_mode():
+        return _pg_bulk_insert(batches, rows)
+
+    if use_coordination:
+        try:
+            requests.post(f"{TARGET_APP_URL}/admin/db_release", timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.3)
+
+    try:
+        with duckdb.connect(DB_PATH) as con:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                for batch in batches:
+                    for table, df in batch.items():
+                        cols = ", ".join(df.columns)
+                        con.register("_bulk_frame", _as_arrow(df))
+                        try:
+                            con.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM _bulk_frame")
+                        finally:
+                            con.unregister("_bulk_frame")
+                        rows[table] = rows.get(table, 0) + len(df)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        return {"status": "success", "rows": rows}
+    except Exception as e:
+        logger.error(f"Bulk insert failed: {e}")
+        return {"status": "error", "message": str(e), "rows": rows}
+    finally:
+        if use_coordination:
+            try:
+                requests.post(f"{TARGET_APP_URL}/admin/db_reconnect", timeout=5)
+            except requests.exceptions.RequestException:
+                pass
+
+def _as_arrow(df):
+    """Arrow tables are scanned by DuckDB without copying string columns to Python objects."""
+    try:
+        import pyarrow as pa  # Installed with streamlit
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except ImportError:
+        return df
+
+def _pg_bulk_insert(batches, rows: dict):
+    """Stream DataFrames into PostgreSQL with COPY (one transaction)."""
+    import io
+    try:
+        with get_pg_connection() as conn:
+            with conn.cursor() as cur:
+                for batch in batches:
+                    for table, df in batch.items():
+                        buf = io.StringIO()
+                        df.to_csv(buf, index=False, header=False)
+                        buf.seek(0)
+                        cur.copy_expert(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+                        rows[table] = rows.get(table, 0) + len(df)
+        return {"status": "success", "rows": rows}
+    except Exception as e:
+        logger.error(f"PG Bulk Insert Error: {e}")
+        return {"status": "error", "message": str(e), "rows": rows}
+
 # =========================================================
 # DB Initialization Functions (Split Architecture)
 # =========================================================
@@ -359,6 +451,11 @@ def setup_experiment_schema(con, reset=False):
             weight FLOAT DEFAULT 1.0
         )
     """)
+    # One assignment per user per run (lets the Target App upsert with ON CONFLICT)
+    try:
+        con.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_user_run ON assignments (user_id, run_id)")
+    except Exception as e:
+        print(f"Warning: duplicate assignments found, run scripts/db/migrate_assignments_unique.py ({e})")
 
     # Events table
     print("Creating 'events' table...")
@@ -375,6 +472,13 @@ def setup_experiment_schema(con, reset=False):
         )
     """)
 
+    # Experiment stats (running sums per run/variant, maintained by the Target App)
+    from src.core.accumulator import STATS_TABLE, create_table_sql
+    print(f"Creating '{STATS_TABLE}' table...")
+    if reset:
+        con.execute(f"DROP TABLE IF EXISTS {STATS_TABLE}")
+    con.execute(create_table_sql())
+
     # Experiments table (Retrospective)
     print("Creating 'experiments' table...")
     if reset:
@@ -424,9 +528,18 @@ def setup_experiment_schema(con, reset=False):
         CREATE TABLE IF NOT EXISTS active_experiment (
             id INTEGER PRIMARY KEY,
             is_active BOOLEAN,
-            started_at TIMESTAMP
+            started_at TIMESTAMP,
+            allocation VARCHAR  -- JSON {variant: weight}; NULL = 50/50 A/B
         )
     """)
+    con.execute("ALTER TABLE active_experiment ADD COLUMN IF NOT EXISTS allocation VARCHAR")
+
+    # Layered experiments (concurrent experiments beside active_experiment, see src.core.layers)
+    from src.core.layers import LAYERS_TABLE, create_layers_table_sql
+    print(f"Creating '{LAYERS_TABLE}' table...")
+    if reset:
+        con.execute(f"DROP TABLE IF EXISTS {LAYERS_TABLE}")
+    con.execute(create_layers_table_sql())
 
     print("Experiment schema setup complete.")
 
@@ -448,7 +561,7 @@ def verify_warehouse(con):
 def verify_experiment(con):
     """Verify experiment DB tables."""
     print("\nVerifying Experiment DB...")
-    tables = ['assignments', 'events', 'experiments', 'adoptions', 'active_experiment']
+    tables = ['assignments', 'events', 'experiments', 'adoptions', 'active_experiment', 'layer_experiments']
     for table_name in tables:
         try:
             result = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()
@@ -436,6 +436,23 @@ def setup_pg_schema():
         run_id VARCHAR(255)
     );
 
+    -- Experiment stats (running sums per run/variant, maintained by the Target App)
+    CREATE TABLE IF NOT EXISTS experiment_stats (
+        run_id VARCHAR(255) NOT NULL,
+        variant VARCHAR(10) NOT NULL,
+        users BIGINT DEFAULT 0,
+        weight_sum DOUBLE PRECISION DEFAULT 0,
+        weight_sq_sum DOUBLE PRECISION DEFAULT 0,
+        page_views BIGINT DEFAULT 0,
+        clicks BIGINT DEFAULT 0,
+        bounces BIGINT DEFAULT 0,
+        purchases BIGINT DEFAULT 0,
+        revenue_sum DOUBLE PRECISION DEFAULT 0,
+        revenue_sq_sum DOUBLE PRECISION DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (run_id, variant)
+    );
+
     -- Experiments (Retrospective) table
     CREATE TABLE IF NOT EXISTS experiments (
         exp_id SERIAL PRIMARY KEY,
@@ -470,11 +487,25 @@ def setup_pg_schema():
     CREATE TABLE IF NOT EXISTS active_experiment (
         id SERIAL PRIMARY KEY,
         is_active BOOLEAN DEFAULT FALSE,
-        started_at TIMESTAMP
+        started_at TIMESTAMP,
+        allocation TEXT  -- JSON {variant: weight}; NULL = 50/50 A/B
+    );
+    ALTER TABLE active_experiment ADD COLUMN IF NOT EXISTS allocation TEXT;
+
+    -- Layered experiments (concurrent experiments beside active_experiment, see src.core.layers)
+    CREATE TABLE IF NOT EXISTS layer_experiments (
+        experiment_id VARCHAR(255) PRIMARY KEY,
+        layer VARCHAR(255) NOT NULL,
+        bucket_start INTEGER NOT NULL,
+        bucket_count INTEGER NOT NULL,
+        allocation TEXT,
+        is_active BOOLEAN DEFAULT TRUE,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
 
     -- Create indexes for performance
     CREATE INDEX IF NOT EXISTS idx_assignments_run_id ON assignments(run_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_user_run ON assignments(user_id, run_id);
     CREATE INDEX IF NOT EXISTS idx_events_run_id ON events(run_id);
     CREATE INDEX IF NOT EXISTS idx_events_user_id ON events(user_id);
     CREATE INDEX IF NOT EXISTS idx_experiments_run_id ON experiments(run_id);
@@ -224,3 +224,20 @@ def render_step_progress(steps, current_step):
         """, unsafe_allow_html=True)
     
     st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)
+
+def sequential_status(seq, control="A", test="B"):
+    """
+    Render the live sequential test result (SequentialMonitor.update output) of one test arm.
+    """
+    c1, c2 = st.columns(2)
+    c1.metric("Always-valid p (mSPRT)", f"{seq['always_valid_p']:.4f}",
+              help="계속 들여다봐도(peeking) 유효한 p-value입니다. 0.05 이하이면 결과가 확정됩니다.")
+    if seq["boundary"] is not None:
+        c2.metric(f"O'Brien-Fleming Look {seq['look']}", f"|z| {abs(seq['z_score']):.2f} / {seq['boundary']:.2f}",
+                  help="계획된 중간 분석 시점마다 z 통계량을 해당 경계값과 비교합니다.")
+    else:
+        c2.metric("다음 중간 분석까지", f"{seq['info_fraction'] * 100:.0f}% 수집")
+    if seq["stop"]:
+        label = "mSPRT" if seq["stopped_by"] == "msprt" else "Group-sequential"
+        direction = f"{test} 우세" if seq["diff"] > 0 else f"{control} 우세"
+        st.success(f"🏁 {label} 기준으로 결과 확정 ({direction}, 차이 {seq['diff'] * 100:+.2f}%p)")
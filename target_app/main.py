@@ -1,19 +1,34 @@
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import duckdb
+import asyncio
 import os
 import time
 from datetime import datetime
-import hashlib
+import json
 import uuid
+import sys
 import threading
+import queue
 import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Project root, for src.core
+from src.core.accumulator import (
+    STATS_COLUMNS, USER_EVENTS, ExperimentAccumulator, create_table_sql, upsert_sql, user_event_kind
+)
+from src.core.allocation import DEFAULT_TABLE, compile_allocation
+from src.core.layers import (
+    DEFAULT_EXPERIMENT, DEFAULT_LAYER, EMPTY_LAYERS, LAYERS_TABLE, LayeredAssignment, allocate_range,
+    create_layers_table_sql, experiment_allocation
+)
+
 # Try to load environment variables
 try:
     from dotenv import load_dotenv
@@ -69,9 +84,12 @@ def _ensure_ssl(url: str) -> str:
 DATABASE_URL = _ensure_ssl(_raw_database_url)
 logger.info(f"DB_MODE: {DB_MODE}, DATABASE_URL set: {bool(DATABASE_URL)}")
 
+# Worker threads for blocking DB calls; the PostgreSQL pool is sized to match
+DB_WORKERS = int(os.getenv('DB_WORKERS', '8'))
+
 # Singleton DB Connection (DuckDB for local, PostgreSQL pool for cloud)
 db_con = None
-db_lock = threading.Lock()
+db_writer = None  # DuckDBWriter owning all writes on db_con
 pg_pool = None
 
 def is_cloud_mode():
@@ -131,7 +149,7 @@ def get_pg_pool(force_retry: bool = False):
             # Create connection pool with timeout
             pg_pool = pg_pool_module.ThreadedConnectionPool(
                 minconn=1,
-                maxconn=10,
+                maxconn=DB_WORKERS + 2,  # Workers + event flusher + admin headroom
                 dsn=DATABASE_URL,
                 connect_timeout=10  # 10 second connection timeout
             )
@@ -199,9 +217,388 @@ def reset_pg_pool():
     _pg_pool_last_attempt = 0
     logger.info("PostgreSQL pool reset - will retry on next request")
 
+# =========================================================
+# DuckDB Single Writer + Read Cursors
+# =========================================================
+
+class DuckDBWriter:
+    """
+    Dedicated thread that owns DuckDB writes.
+
+    Callers submit `fn(con, *args)` jobs and get a Future back; jobs run one at
+    a time in submission order, so no lock is held by request threads.
+    Reads use separate cursors (see _duckdb_reader) and never wait on writes.
+    Once stop() is called, new jobs fail immediately instead of queueing
+    behind the stop sentinel.
+    """
+
+    STOP_TIMEOUT = 10  # Seconds stop() waits for queued jobs
+
+    def __init__(self, con):
+        self._con = con
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()  # Orders submit() against the stop sentinel
+        self._stopped = False
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                future.set_exception(RuntimeError("DuckDB writer stopped"))
+                return future
+            self._queue.put((fn, args, future))
+        return future
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            fn, args, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(self._con, *args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="DuckDBWriter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Finish queued jobs, then stop the thread; jobs it could not reach in time fail."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(None)
+        if self._thread:
+            self._thread.join(timeout=self.STOP_TIMEOUT)
+            if self._thread.is_alive():
+                self._fail_pending()
+            self._thread = None
+
+    def _fail_pending(self):
+        """Fail jobs still queued behind a stuck job (taken off the queue, so the thread never runs them)."""
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and job[2].set_running_or_notify_cancel():
+                job[2].set_exception(RuntimeError("DuckDB writer stopped before running this job"))
+        self._queue.put(None)  # Let the thread exit once its current job returns
+
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+DUCKDB_WRITE_TIMEOUT = float(os.getenv('DUCKDB_WRITE_TIMEOUT', '30'))  # Max seconds a caller waits for a write
+
+def _duckdb_write(fn, *args):
+    """Run fn(con, *args) on the writer thread and wait (bounded) for its result."""
+    writer = db_writer
+    if writer is None:
+        raise RuntimeError("DuckDB not connected")
+    return writer.submit(fn, *args).result(timeout=DUCKDB_WRITE_TIMEOUT)
+
+_reader_local = threading.local()
+
+def _duckdb_reader():
+    """
+    Per-thread read cursor on the shared DuckDB instance.
+    Cursors are independent connections, so analytics reads run concurrently with the writer.
+    """
+    con = db_con
+    if con is None:
+        return None
+    cached = getattr(_reader_local, "cursor", None)
+    if cached is None or cached[0] is not con:
+        cached = (con, con.cursor())
+        _reader_local.cursor = cached
+    return cached[1]
+
+_duckdb_lock = threading.Lock()  # Guards swapping db_con / db_writer
+
+def _open_duckdb():
+    """Open the DuckDB file and start its writer thread."""
+    global db_con, db_writer
+    with _duckdb_lock:
+        db_con = duckdb.connect(DB_PATH)
+        db_writer = DuckDBWriter(db_con).start()
+
+def _close_duckdb():
+    """
+    Drain the writer thread, then close the DuckDB file.
+    db_writer is unpublished first, so callers racing the close see
+    "not connected" instead of queueing jobs on a stopping writer.
+    """
+    global db_con, db_writer
+    with _duckdb_lock:
+        writer, db_writer = db_writer, None
+    if writer:
+        writer.stop()
+    with _duckdb_lock:
+        con, db_con = db_con, None
+    if con:
+        con.close()
+
+# =========================================================
+# Event Ingestion Buffer (Batched Writes)
+# =========================================================
+
+EVENT_COLUMNS = ["event_id", "user_id", "event_name", "timestamp", "value", "run_id"]
+EVENT_BUFFER_SIZE = int(os.getenv('EVENT_BUFFER_SIZE', '500'))  # Flush when this many events are queued
+EVENT_FLUSH_INTERVAL = float(os.getenv('EVENT_FLUSH_INTERVAL', '0.5'))  # Max seconds an event waits
+EVENT_BUFFER_MAX_BACKLOG = int(os.getenv('EVENT_BUFFER_MAX_BACKLOG', '50000'))  # Rows kept while DB is unavailable
+
+class EventBuffer:
+    """
+    In-process event buffer with size- and time-based flushing.
+
+    Request handlers only append a row under a short lock; a background
+    thread hands accumulated rows to `writer` in a single bulk insert.
+    """
+
+    def __init__(self, writer, max_size: int = EVENT_BUFFER_SIZE, flush_interval: float = EVENT_FLUSH_INTERVAL,
+                 max_backlog: int = EVENT_BUFFER_MAX_BACKLOG):
+        self._writer = writer  # Callable receiving a list of event rows
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self._rows = []
+        self._lock = threading.Lock()        # Guards _rows
+        self._flush_lock = threading.Lock()  # Serializes flushes
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed_total = 0
+        self.dropped_total = 0
+
+    def add(self, row: tuple):
+        """Queue one event row; wakes the flusher once the size threshold is hit."""
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self) -> int:
+        """Write all queued rows in one batch. Returns number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                self._writer(rows)
+                self.flushed_total += len(rows)
+                return len(rows)
+            except Exception as e:
+                # Keep the batch for the next flush (e.g. during /admin/db_release) unless backlog is full
+                with self._lock:
+                    if len(rows) + len(self._rows) <= self.max_backlog:
+                        self._rows = rows + self._rows
+                        logger.warning(f"Event flush failed, retrying {len(rows)} events later: {e}")
+                        return 0
+                self.dropped_total += len(rows)
+                logger.error(f"Event flush failed, dropped {len(rows)} events: {e}")
+                return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="EventBufferFlusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher thread and write whatever is still queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "flushed_total": self.flushed_total,
+            "dropped_total": self.dropped_total,
+            "max_size": self.max_size,
+            "flush_interval": self.flush_interval,
+            "max_backlog": self.max_backlog,
+        }
+
+# Persisted variant of each (user, run) in an event batch and which USER_EVENTS kinds
+# (click, bounce, purchase) it already has, read in the insert's transaction before the insert
+_BATCH_USERS_SQL = """
+    SELECT a.user_id, a.run_id, a.variant,
+           COALESCE(BOOL_OR(e.event_name = 'click_banner' OR e.event_name LIKE 'banner_%%'), false),
+           COALESCE(BOOL_OR(e.event_name = 'bounce'), false),
+           COALESCE(BOOL_OR(e.event_name = 'purchase'), false)
+    FROM assignments a JOIN {keys} ON a.user_id = k.user_id AND a.run_id = k.run_id
+    LEFT JOIN events e ON e.user_id = a.user_id AND e.run_id = a.run_id
+         AND (e.event_name IN ('click_banner', 'bounce', 'purchase') OR e.event_name LIKE 'banner_%%')
+    GROUP BY 1, 2, 3
+"""
+
+def _insert_event_batch(con, rows):
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=EVENT_COLUMNS)
+    con.register("_event_batch", df)
+    try:
+        keys = "(SELECT DISTINCT user_id, run_id FROM _event_batch WHERE run_id IS NOT NULL) k"
+        users = con.execute(_BATCH_USERS_SQL.format(keys=keys).replace("%%", "%")).fetchall()
+        con.execute(f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) SELECT {', '.join(EVENT_COLUMNS)} FROM _event_batch")
+        return users
+    finally:
+        con.unregister("_event_batch")
+
+def _write_events_duckdb(rows):
+    """
+    Bulk insert event rows into DuckDB via a registered DataFrame (on the writer thread,
+    so no other batch lands between the read and the insert).
+    Returns (user_id, run_id, variant, clicked, bounced, purchased) rows of the batch's
+    run-tagged users, as they were before the insert.
+    """
+    return _duckdb_write(_insert_event_batch, rows)
+
+def _write_events_pg(rows):
+    """Bulk insert event rows into PostgreSQL with execute_values (returns as _write_events_duckdb)."""
+    from psycopg2.extras import execute_values
+    pool = get_pg_pool()
+    if not pool:
+        raise RuntimeError("PostgreSQL pool not available")
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            keys = sorted({(row[1], row[5]) for row in rows if row[5]})
+            users = []
+            if keys:
+                # Serialize run-tagged batches so two of them never both see a user's event as first
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('events:user_events'))")
+                users = execute_values(
+                    cur, _BATCH_USERS_SQL.format(keys="(VALUES %s) AS k(user_id, run_id)"), keys, fetch=True
+                )
+            execute_values(
+                cur,
+                f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES %s",
+                rows,
+                page_size=1000
+            )
+        conn.commit()
+        return users
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+def _write_events(rows):
+    """
+    Route a batch of events to the active backend, then add the stored rows to
+    the experiment stats and persist them. Stats only count rows that were
+    written, under the variant in `assignments` (as the raw-table analysis
+    joins them), and count each USER_EVENTS kind once per user and run (its
+    COUNT(DISTINCT user_id)), so failed or dropped batches, repeated events
+    and state changes mid-run cannot make experiment_stats drift from the raw tables.
+    """
+    if is_cloud_mode():
+        assigned = _write_events_pg(rows)
+    else:
+        assigned = _write_events_duckdb(rows)
+    users = {(user_id, run_id): (variant, {kind for kind, had in zip(USER_EVENTS, flags) if had})
+             for user_id, run_id, variant, *flags in assigned}
+    stats = ExperimentAccumulator()
+    for _, uid, event_name, _, value, run_id in rows:
+        user = users.get((uid, run_id)) if run_id else None
+        if user is None:
+            continue
+        variant, seen = user
+        kind = user_event_kind(event_name)
+        stats.record_event(run_id, variant, event_name, value, first=kind not in seen)
+        if kind is not None:
+            seen.add(kind)
+    experiment_accumulator.merge(stats)
+    _flush_experiment_stats()
+
+event_buffer = EventBuffer(_write_events)
+
+# =========================================================
+# Experiment Stats (running sufficient statistics per run/variant)
+# =========================================================
+
+# Fed by assignment inserts and stored event batches; flushed with each event batch
+experiment_accumulator = ExperimentAccumulator()
+
+def _upsert_stats_duckdb(con, rows):
+    con.executemany(upsert_sql(f"VALUES ({', '.join('?' * len(STATS_COLUMNS))})"), rows)
+
+def _upsert_stats_pg(rows):
+    from psycopg2.extras import execute_values
+    pool = get_pg_pool()
+    if not pool:
+        raise RuntimeError("PostgreSQL pool not available")
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, upsert_sql("VALUES %s"), rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+def _flush_experiment_stats() -> int:
+    """Add pending stats deltas to experiment_stats. Returns number of (run, variant) rows written."""
+    rows = experiment_accumulator.drain()
+    if not rows:
+        return 0
+    try:
+        if is_cloud_mode():
+            _upsert_stats_pg(rows)
+        else:
+            _duckdb_write(_upsert_stats_duckdb, rows)
+        return len(rows)
+    except Exception as e:
+        experiment_accumulator.restore(rows)
+        logger.warning(f"Experiment stats flush failed, retrying {len(rows)} rows later: {e}")
+        return 0
+
+# =========================================================
+# Async DB Access (blocking drivers off the event loop)
+# =========================================================
+
+def _new_db_executor():
+    # Dedicated pool so DB concurrency is bounded by connections, not by the event loop
+    return ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+db_executor = _new_db_executor()
+
+async def run_db(fn, *args):
+    """Run a blocking DuckDB/psycopg2 call on the DB worker pool and await the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, fn, *args)
+
 @app.on_event("startup")
 async def startup_event():
-    global db_con
+    global db_executor
+    db_executor = _new_db_executor()
     try:
         if is_cloud_mode():
             # Cloud mode: Use PostgreSQL
@@ -234,6 +631,8 @@ async def startup_event():
                                 weight FLOAT DEFAULT 1.0
                             )
                         """)
+                        cur.execute(create_table_sql())
+                        cur.execute(create_layers_table_sql())
                         cur.execute("""
                             CREATE TABLE IF NOT EXISTS adoptions (
                                 adoption_id SERIAL PRIMARY KEY,
@@ -243,28 +642,39 @@ async def startup_event():
                             )
                         """)
                     conn.commit()
+                    _ensure_assignment_index_pg(conn)
                 finally:
                     pool.putconn(conn)
                 logger.info("PostgreSQL tables checked/created")
         else:
             # Local mode: Use DuckDB
             logger.info(f"Starting in LOCAL mode (DuckDB at {DB_PATH})")
-            db_con = duckdb.connect(DB_PATH)
+            _open_duckdb()
 
             # Ensure tables exist
-            with db_lock:
-                db_con.execute("CREATE TABLE IF NOT EXISTS events (event_id VARCHAR, user_id VARCHAR, event_name VARCHAR, timestamp TIMESTAMP, value DOUBLE, run_id VARCHAR)")
-                db_con.execute("CREATE TABLE IF NOT EXISTS assignments (user_id VARCHAR, experiment_id VARCHAR, variant VARCHAR, assigned_at TIMESTAMP, run_id VARCHAR, weight FLOAT DEFAULT 1.0)")
+            def _create_tables(con):
+                con.execute("CREATE TABLE IF NOT EXISTS events (event_id VARCHAR, user_id VARCHAR, event_name VARCHAR, timestamp TIMESTAMP, value DOUBLE, run_id VARCHAR)")
+                con.execute("CREATE TABLE IF NOT EXISTS assignments (user_id VARCHAR, experiment_id VARCHAR, variant VARCHAR, assigned_at TIMESTAMP, run_id VARCHAR, weight FLOAT DEFAULT 1.0)")
+                con.execute(create_table_sql())
+                con.execute(create_layers_table_sql())
+                _ensure_assignment_index_duckdb(con)
+            _duckdb_write(_create_tables)
 
             logger.info("DuckDB Connected and Tables Checked")
     except Exception as e:
         logger.error(f"DB Startup Error: {e}")
 
+    event_buffer.start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     global db_con, pg_pool
+    # Drain buffered events and in-flight DB calls before connections go away
+    event_buffer.stop()
+    _flush_experiment_stats()
+    db_executor.shutdown(wait=True)
     if db_con:
-        db_con.close()
+        _close_duckdb()
         logger.info("DuckDB Connection Closed")
     if pg_pool:
         pg_pool.closeall()
@@ -292,7 +702,7 @@ async def health_check():
                 status["error"] = "PostgreSQL pool is None"
         else:
             if db_con:
-                db_con.execute("SELECT 1")
+                _duckdb_reader().execute("SELECT 1")
                 status["database"] = "duckdb"
                 status["db_connected"] = True
             else:
@@ -330,7 +740,9 @@ async def db_status(force_retry: bool = False):
         "pg_pool_exists": pg_pool is not None,
         "pg_pool_error": get_pg_pool_error(),
         "duckdb_con_exists": db_con is not None,
+        "duckdb_write_backlog": db_writer.backlog() if db_writer else None,
         "retry_interval_seconds": _PG_RETRY_INTERVAL,
+        "event_buffer": event_buffer.stats(),
     }
 
     # Test connection
@@ -351,7 +763,7 @@ async def db_status(force_retry: bool = False):
                 status["connection_test"] = "FAILED - pool is None"
         else:
             if db_con:
-                result = db_con.execute("SELECT COUNT(*) FROM assignments").fetchone()
+                result = _duckdb_reader().execute("SELECT COUNT(*) FROM assignments").fetchone()
                 status["connection_test"] = "SUCCESS"
                 status["assignments_count"] = result[0] if result else 0
             else:
@@ -376,41 +788,21 @@ async def reset_pool_endpoint():
     }
 
 def log_event(uid, variant, event_name, value=0.0, run_id=None):
-    """Log an event to the database (supports both DuckDB and PostgreSQL)."""
-    global db_con
-
+    """
+    Queue an event for batched insertion (supports both DuckDB and PostgreSQL).
+    The row is timestamped here so batching does not shift event times.
+    Experiment stats count it once written, under the user's stored
+    assignment (see _write_events); `variant` is only logged.
+    """
     try:
         eid = str(uuid.uuid4())
-        print(f"[App] Logging Event: {event_name} by {uid} (Value: {value})")
-
-        if is_cloud_mode():
-            # PostgreSQL mode
-            pool = get_pg_pool()
-            if pool:
-                conn = pool.getconn()
-                try:
-                    with conn.cursor() as cur:
-                        cur.execute(
-                            "INSERT INTO events (event_id, user_id, event_name, timestamp, value, run_id) VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s, %s)",
-                            (eid, uid, event_name, value, run_id)
-                        )
-                    conn.commit()
-                finally:
-                    pool.putconn(conn)
-        else:
-            # DuckDB mode
-            if not db_con:
-                logger.error("DB Not Connected")
-                return
-            with db_lock:
-                db_con.execute("INSERT INTO events VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?)",
-                             [eid, uid, event_name, value, run_id])
+        logger.debug(f"Logging Event: {event_name} by {uid} ({variant}, value: {value})")
+        event_buffer.add((eid, uid, event_name, datetime.now(), float(value or 0.0), run_id))
     except Exception as e:
         print(f"[App] Log Error: {e}")
 
-def get_adopted_variant():
-    """Check if there's an adopted experiment and return the winning variant."""
-    global db_con
+def _query_adopted_variant():
+    """Check if there's an adopted experiment and return the winning variant (uncached DB read)."""
     import json
 
     try:
@@ -438,31 +830,38 @@ def get_adopted_variant():
                         return variant_config
         else:
             # DuckDB mode
-            if not db_con:
+            cur = _duckdb_reader()
+            if not cur:
                 return None
-            with db_lock:
-                result = db_con.execute("""
-                    SELECT variant_config
-                    FROM adoptions
-                    ORDER BY adopted_at DESC
-                    LIMIT 1
-                """).fetchone()
-
-                if result and result[0]:
-                    variant_config = json.loads(result[0])
-                    if variant_config and isinstance(variant_config, dict) and variant_config.get('winning_variant'):
-                        logger.info(f"Adopted variant detected: {variant_config}")
-                        return variant_config
-                    else:
-                        logger.warning(f"Invalid variant_config found: {variant_config}")
+            result = cur.execute("""
+                SELECT variant_config
+                FROM adoptions
+                ORDER BY adopted_at DESC
+                LIMIT 1
+            """).fetchone()
+
+            if result and result[0]:
+                variant_config = json.loads(result[0])
+                if variant_config and isinstance(variant_config, dict) and variant_config.get('winning_variant'):
+                    logger.info(f"Adopted variant detected: {variant_config}")
+                    return variant_config
+                else:
+                    logger.warning(f"Invalid variant_config found: {variant_config}")
     except Exception as e:
         logger.warning(f"No adoptions table or error: {e}")
 
     return None
 
-def is_experiment_active():
-    """Check if there's an active experiment running (supports both DuckDB and PostgreSQL)."""
-    global db_con
+def _query_active_experiment():
+    """
+    Active experiment row (uncached DB read, DuckDB and PostgreSQL).
+    Returns None when no experiment is running, else its allocation spec
+    ('' for rows without one, i.e. the default 50/50 A/B split).
+    """
+
+    def _allocation(cur, row):
+        columns = [d[0] for d in cur.description]
+        return (row[columns.index("allocation")] or "") if "allocation" in columns else ""
 
     try:
         if is_cloud_mode():
@@ -472,42 +871,221 @@ def is_experiment_active():
                 conn = pool.getconn()
                 try:
                     with conn.cursor() as cur:
-                        cur.execute("SELECT 1 FROM active_experiment WHERE is_active = true LIMIT 1")
+                        cur.execute("SELECT * FROM active_experiment WHERE is_active = true LIMIT 1")
                         result = cur.fetchone()
-                        return result is not None
+                        return _allocation(cur, result) if result is not None else None
                 finally:
                     pool.putconn(conn)
         else:
             # DuckDB mode
-            if not db_con:
-                return False
-            with db_lock:
-                result = db_con.execute("""
-                    SELECT 1 FROM active_experiment WHERE is_active = true LIMIT 1
-                """).fetchone()
-                return result is not None
+            cur = _duckdb_reader()
+            if not cur:
+                return None
+            result = cur.execute("""
+                SELECT * FROM active_experiment WHERE is_active = true LIMIT 1
+            """).fetchone()
+            return _allocation(cur, result) if result is not None else None
     except Exception as e:
         # Table doesn't exist yet = no active experiment
-        return False
+        return None
+
+    return None
+
+def _query_experiment_active():
+    """Check if there's an active experiment running (uncached DB read)."""
+    return _query_active_experiment() is not None
 
-    return False
+def _query_layer_experiments():
+    """Running layered experiments as row dicts (uncached DB read, one query for all layers)."""
+    sql = f"SELECT * FROM {LAYERS_TABLE} WHERE is_active = true ORDER BY started_at, experiment_id"
+
+    def _rows(cur, rows):
+        columns = [d[0] for d in cur.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    try:
+        if is_cloud_mode():
+            # PostgreSQL mode
+            pool = get_pg_pool()
+            if pool:
+                conn = pool.getconn()
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(sql)
+                        return _rows(cur, cur.fetchall())
+                finally:
+                    pool.putconn(conn)
+        else:
+            # DuckDB mode
+            cur = _duckdb_reader()
+            if not cur:
+                return []
+            return _rows(cur, cur.execute(sql).fetchall())
+    except Exception as e:
+        # Table doesn't exist yet = no layered experiments
+        logger.debug(f"No layered experiments: {e}")
+
+    return []
+
+def _compile_layers(allocation_table, rows):
+    """
+    Compile the active_experiment row (full DEFAULT_LAYER, when running) and
+    the layered experiments into one lookup; invalid rows are logged and skipped.
+    """
+    experiments = list(rows)
+    if allocation_table is not None:
+        experiments.insert(0, {"experiment_id": DEFAULT_EXPERIMENT, "layer": DEFAULT_LAYER,
+                               "allocation": allocation_table})
+    layers = LayeredAssignment(experiments)
+    for experiment_id, reason in layers.rejected.items():
+        logger.warning(f"Layered experiment {experiment_id!r} skipped: {reason}")
+    return layers
+
+def _compile_allocation(spec):
+    """Compiled allocation table of the active experiment; invalid specs fall back to 50/50 A/B."""
+    try:
+        return compile_allocation(spec)
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Invalid experiment allocation {spec!r}: {e}")
+        return DEFAULT_TABLE
+
+# =========================================================
+# Experiment State Cache (TTL + explicit invalidation)
+# =========================================================
+
+EXPERIMENT_STATE_TTL = float(os.getenv('EXPERIMENT_STATE_TTL', '5'))  # Seconds before re-reading the DB
+
+class ExperimentStateCache:
+    """
+    Process-local cache for experiment state (active flag, adopted variant and
+    the compiled allocation / layer lookups).
+
+    All values are loaded together at most once per TTL window, so assignment
+    never queries the DB per request. Concurrent misses share one load: the
+    first caller runs the loader, the others wait on its Future. Streamlit calls /admin/invalidate_cache
+    after activating, adopting or rolling back (the /admin/layers endpoints
+    invalidate themselves), so changes show up immediately instead of after the TTL.
+    """
+
+    def __init__(self, loader, ttl: float = EXPERIMENT_STATE_TTL):
+        self._loader = loader  # Callable returning {"active": bool, "adopted": dict | None}
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = 0.0
+        self._generation = 0  # Bumped on invalidate so in-flight loads are not stored
+        self._loading = None  # Future of the current generation's in-flight load
+        self.hits = 0
+        self.misses = 0
+
+    def _is_fresh(self) -> bool:
+        return self._value is not None and (time.monotonic() - self._loaded_at) < self.ttl
+
+    def get(self) -> dict:
+        if self._is_fresh():
+            self.hits += 1
+            return self._value
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._value
+            self.misses += 1
+            loading = self._loading
+            if loading is None:
+                loading = self._loading = Future()
+                generation = self._generation
+            else:
+                generation = None  # Another caller is loading this generation
+        if generation is None:
+            return loading.result()
+
+        try:
+            value = self._loader()
+        except BaseException as e:
+            with self._lock:
+                if self._loading is loading:
+                    self._loading = None
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = time.monotonic()
+            if self._loading is loading:
+                self._loading = None
+        loading.set_result(value)
+        return value
+
+    async def aget(self) -> dict:
+        """Async variant of get(); only cache misses leave the event loop."""
+        if self._is_fresh():
+            self.hits += 1
+            return self._value
+        return await run_db(self.get)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._loading = None  # Callers after this start a new load instead of waiting on the old one
+            self._value = None
+            self._loaded_at = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "cached": self._value is not None,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 3) if self._value is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+def _load_experiment_state() -> dict:
+    allocation = _query_active_experiment()
+    table = _compile_allocation(allocation)
+    return {
+        "active": allocation is not None,
+        "adopted": _query_adopted_variant(),
+        "allocation": table,  # Compiled once per cache load
+        "layers": _compile_layers(table if allocation is not None else None, _query_layer_experiments()),
+    }
+
+experiment_state = ExperimentStateCache(_load_experiment_state)
+
+def get_adopted_variant():
+    """Adopted variant config (cached, see ExperimentStateCache)."""
+    return experiment_state.get()["adopted"]
+
+def is_experiment_active():
+    """Whether an experiment is running (cached, see ExperimentStateCache)."""
+    return experiment_state.get()["active"]
 
 def get_assignment(uid: str):
     """
     Assignment logic for continuous experimentation:
-    1. If experiment is active -> A/B split (A=current baseline, B=new variant)
+    1. If experiment is active -> split by its allocation table (A=current baseline, B, C...=new variants)
     2. If no experiment but has adoption -> everyone sees adopted variant (baseline)
     3. If no experiment and no adoption -> default A/B split (initial state)
     """
-    experiment_active = is_experiment_active()
-    adopted = get_adopted_variant()
+    return _choose_variant(uid, experiment_state.get())
+
+async def get_assignment_async(uid: str):
+    """get_assignment() for request handlers; DB reads run on the worker pool."""
+    return _choose_variant(uid, await experiment_state.aget())
+
+def _choose_experiments(uid: str, state: dict) -> dict:
+    """{experiment_id: variant} across all layers from the compiled lookup (no DB access)."""
+    return state.get("layers", EMPTY_LAYERS).assign(uid)
+
+def _choose_variant(uid: str, state: dict):
+    """Pick the variant for `uid` given cached experiment state (see get_assignment)."""
+    experiment_active = state["active"]
+    adopted = state["adopted"]
 
     if experiment_active:
-        # Active experiment: A/B split
+        # Active experiment: bucket lookup in the compiled allocation table
         # A = current baseline (adopted variant or original A)
-        # B = new variant being tested
-        hash_val = int(hashlib.md5(uid.encode()).hexdigest(), 16)
-        variant = 'B' if (hash_val % 100) >= 50 else 'A'
+        # B, C, ... = new variants being tested
+        variant = state.get("allocation", DEFAULT_TABLE).variant(uid)
         logger.info(f"Experiment active: {uid} -> {variant}")
         return variant
 
@@ -518,8 +1096,146 @@ def get_assignment(uid: str):
         return winning
 
     # Initial state: no experiment, no adoption = default A/B split
-    hash_val = int(hashlib.md5(uid.encode()).hexdigest(), 16)
-    return 'B' if (hash_val % 100) >= 50 else 'A'
+    return DEFAULT_TABLE.variant(uid)
+
+# =========================================================
+# Assignment Logging (idempotent upsert + recent-user LRU)
+# =========================================================
+
+ASSIGNMENT_CACHE_SIZE = int(os.getenv('ASSIGNMENT_CACHE_SIZE', '100000'))
+ASSIGNMENT_INDEX = "idx_assignments_user_run"
+
+# Set at startup once the (user_id, run_id) unique index exists; until then
+# inserts use the NOT EXISTS form, which needs no index.
+_assignment_index_ready = False
+
+class RecentAssignments:
+    """Bounded LRU of (user_id, run_id) keys already written, so repeat visits skip the DB."""
+
+    def __init__(self, capacity: int = ASSIGNMENT_CACHE_SIZE):
+        self.capacity = capacity
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return True
+            return False
+
+    def add(self, key):
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            if len(self._keys) > self.capacity:
+                self._keys.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+recent_assignments = RecentAssignments()
+
+def _assignment_insert_sql(user_id, variant, run_id, weight, placeholder="?"):
+    """
+    Build a single-statement idempotent insert.
+    Run-scoped rows use ON CONFLICT on the unique index; NULL run_id rows
+    (real visitors) never conflict on a unique index, so they use NOT EXISTS.
+    """
+    p = placeholder
+    cols = "user_id, experiment_id, variant, assigned_at, run_id, weight"
+    values = [user_id, 'exp_default', variant, run_id, weight]
+    if run_id and _assignment_index_ready:
+        sql = (f"INSERT INTO assignments ({cols}) VALUES ({p}, {p}, {p}, CURRENT_TIMESTAMP, {p}, {p}) "
+               "ON CONFLICT (user_id, run_id) DO NOTHING")
+        return sql, values
+    run_filter = f"run_id = {p}" if run_id else "run_id IS NULL"
+    sql = (f"INSERT INTO assignments ({cols}) SELECT {p}, {p}, {p}, CURRENT_TIMESTAMP, {p}, {p} "
+           f"WHERE NOT EXISTS (SELECT 1 FROM assignments WHERE user_id = {p} AND {run_filter})")
+    return sql, values + [user_id] + ([run_id] if run_id else [])
+
+def _ensure_assignment_index_duckdb(con):
+    global _assignment_index_ready
+    try:
+        con.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {ASSIGNMENT_INDEX} ON assignments (user_id, run_id)")
+        _assignment_index_ready = True
+    except Exception as e:
+        _assignment_index_ready = False
+        logger.warning(f"Assignment unique index not created (run scripts/db/migrate_assignments_unique.py): {e}")
+
+def _ensure_assignment_index_pg(conn):
+    global _assignment_index_ready
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {ASSIGNMENT_INDEX} ON assignments (user_id, run_id)")
+        conn.commit()
+        _assignment_index_ready = True
+    except Exception as e:
+        conn.rollback()
+        _assignment_index_ready = False
+        logger.warning(f"Assignment unique index not created (run scripts/db/migrate_assignments_unique.py): {e}")
+
+def log_assignment(user_id, variant, run_id=None, weight=1.0):
+    """Record a user's variant assignment once per run (blocking, run via run_db)."""
+    key = (user_id, run_id)
+    if key in recent_assignments:
+        return
+    try:
+        if is_cloud_mode():
+            # PostgreSQL mode
+            pool = get_pg_pool()
+            if pool:
+                conn = pool.getconn()
+                try:
+                    sql, params = _assignment_insert_sql(user_id, variant, run_id, weight, placeholder="%s")
+                    with conn.cursor() as cur:
+                        cur.execute(sql, params)
+                        inserted = cur.rowcount
+                    conn.commit()
+                finally:
+                    pool.putconn(conn)
+                _remember_assignment(key, variant, weight, inserted)
+        else:
+            # DuckDB mode
+            if db_writer:
+                inserted = _duckdb_write(_insert_assignment_duckdb, user_id, variant, run_id, weight)
+                _remember_assignment(key, variant, weight, inserted)
+    except Exception as e:
+        print(f"[App] Assignment Log Error: {e}")
+
+def _insert_assignment_duckdb(con, user_id, variant, run_id, weight):
+    sql, params = _assignment_insert_sql(user_id, variant, run_id, weight)
+    return con.execute(sql, params).fetchone()[0]
+
+def _remember_assignment(key, variant, weight, inserted):
+    recent_assignments.add(key)
+    if inserted:
+        experiment_accumulator.record_assignment(key[1], variant, weight)
+        logger.debug(f"Logged assignment: {key[0]} -> {variant} (run_id: {key[1]}, weight: {weight})")
+
+async def log_assignment_async(user_id, variant, run_id=None, weight=1.0):
+    """
+    log_assignment() for request handlers. Recently assigned users return
+    without touching the DB; DuckDB writes are awaited straight from the
+    writer thread's Future; PostgreSQL goes through the DB worker pool.
+    """
+    key = (user_id, run_id)
+    if key in recent_assignments:
+        return
+    writer = db_writer
+    if is_cloud_mode() or writer is None:
+        return await run_db(log_assignment, user_id, variant, run_id, weight)
+    try:
+        inserted = await asyncio.wait_for(
+            asyncio.wrap_future(writer.submit(_insert_assignment_duckdb, user_id, variant, run_id, weight)),
+            DUCKDB_WRITE_TIMEOUT)
+        _remember_assignment(key, variant, weight, inserted)
+    except Exception as e:
+        print(f"[App] Assignment Log Error: {e}")
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request, uid: str = None, run_id: str = None, weight: float = 1.0):
@@ -530,8 +1246,9 @@ async def read_root(request: Request, uid: str = None, run_id: str = None, weigh
         user_id = f"user_{uuid.uuid4().hex[:8]}"
         is_new = True
 
-    variant = get_assignment(user_id)
-    adopted = get_adopted_variant()
+    state = await experiment_state.aget()
+    variant = _choose_variant(user_id, state)
+    adopted = state["adopted"]
 
     # Extract adopted config for dynamic banner customization
     adopted_config = None
@@ -539,53 +1256,17 @@ async def read_root(request: Request, uid: str = None, run_id: str = None, weigh
         adopted_config = adopted['config']
 
     # Render
-    response = templates.TemplateResponse("index.html", {
+    response = templates.TemplateResponse(request, "index.html", {
         "request": request,
         "uid": user_id,
         "variant": variant,
         "is_adopted": adopted is not None,  # Flag to show adoption badge
+        "experiments": _choose_experiments(user_id, state),  # Variant per running layered experiment
         "adopted_config": adopted_config  # Dynamic banner config (title, badge, theme)
     })
 
     if is_new or uid:  # Log assignment if new OR if explicitly passed (Agent run)
-        try:
-            if is_cloud_mode():
-                # PostgreSQL mode
-                pool = get_pg_pool()
-                if pool:
-                    conn = pool.getconn()
-                    try:
-                        with conn.cursor() as cur:
-                            if run_id:
-                                cur.execute("SELECT 1 FROM assignments WHERE user_id = %s AND run_id = %s", (user_id, run_id))
-                            else:
-                                cur.execute("SELECT 1 FROM assignments WHERE user_id = %s AND run_id IS NULL", (user_id,))
-                            exists = cur.fetchone()
-
-                            if not exists:
-                                cur.execute(
-                                    "INSERT INTO assignments (user_id, experiment_id, variant, assigned_at, run_id, weight) VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s, %s)",
-                                    (user_id, 'exp_default', variant, run_id, weight)
-                                )
-                                print(f"[App] Logged assignment: {user_id} -> {variant} (run_id: {run_id}, weight: {weight})")
-                        conn.commit()
-                    finally:
-                        pool.putconn(conn)
-            else:
-                # DuckDB mode
-                global db_con
-                if db_con:
-                    with db_lock:
-                        if run_id:
-                            exists = db_con.execute("SELECT 1 FROM assignments WHERE user_id = ? AND run_id = ?", [user_id, run_id]).fetchone()
-                        else:
-                            exists = db_con.execute("SELECT 1 FROM assignments WHERE user_id = ? AND run_id IS NULL", [user_id]).fetchone()
-
-                        if not exists:
-                            db_con.execute("INSERT INTO assignments VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?)", [user_id, 'exp_default', variant, run_id, weight])
-                            print(f"[App] Logged assignment: {user_id} -> {variant} (run_id: {run_id}, weight: {weight})")
-        except Exception as e:
-            print(f"[App] Assignment Log Error: {e}")
+        await log_assignment_async(user_id, variant, run_id, weight)
 
     if is_new:
         response.set_cookie(key="user_id", value=user_id)
@@ -604,56 +1285,137 @@ async def read_root(request: Request, uid: str = None, run_id: str = None, weigh
     return response
 
 @app.get("/cart", response_class=HTMLResponse)
-async def view_cart(request: Request):
-    uid = request.cookies.get("user_id") or "guest"
-    group = get_assignment(uid)
-    log_event(uid, group, 'page_view_cart', 0.0, None)
-    return templates.TemplateResponse("cart.html", {"request": request, "uid": uid, "group": group})
+async def view_cart(request: Request, uid: str = None, run_id: str = None):
+    uid = uid or request.cookies.get("user_id") or "guest"  # Agents pass uid/run_id like on "/"
+    group = await get_assignment_async(uid)
+    log_event(uid, group, 'page_view_cart', 0.0, run_id)
+    return templates.TemplateResponse(request, "cart.html", {"request": request, "uid": uid, "group": group})
 
 @app.get("/detail", response_class=HTMLResponse)
-async def view_detail(request: Request, id: str = "item_001"):
-    uid = request.cookies.get("user_id") or "guest"
-    group = get_assignment(uid)
-    log_event(uid, group, 'page_view_detail', 0.0, None)
-    return templates.TemplateResponse("detail.html", {"request": request, "uid": uid, "group": group, "item_id": id})
+async def view_detail(request: Request, id: str = "item_001", uid: str = None, run_id: str = None):
+    uid = uid or request.cookies.get("user_id") or "guest"  # Agents pass uid/run_id like on "/"
+    group = await get_assignment_async(uid)
+    log_event(uid, group, 'page_view_detail', 0.0, run_id)
+    return templates.TemplateResponse(request, "detail.html", {"request": request, "uid": uid, "group": group, "item_id": id})
 
 @app.get("/search", response_class=HTMLResponse)
-async def view_search(request: Request, q: str = ""):
-    uid = request.cookies.get("user_id") or "guest"
-    group = get_assignment(uid)
-    log_event(uid, group, 'page_view_search', 0.0, None)
-    return templates.TemplateResponse("search.html", {"request": request, "uid": uid, "group": group, "query": q})
+async def view_search(request: Request, q: str = "", uid: str = None, run_id: str = None):
+    uid = uid or request.cookies.get("user_id") or "guest"  # Agents pass uid/run_id like on "/"
+    group = await get_assignment_async(uid)
+    log_event(uid, group, 'page_view_search', 0.0, run_id)
+    return templates.TemplateResponse(request, "search.html", {"request": request, "uid": uid, "group": group, "query": q})
 
 @app.get("/tracking", response_class=HTMLResponse)
-async def view_tracking(request: Request):
-    uid = request.cookies.get("user_id") or "guest"
-    group = get_assignment(uid)
-    log_event(uid, group, 'page_view_tracking', 0.0, None)
-    return templates.TemplateResponse("tracking.html", {"request": request, "uid": uid, "group": group})
+async def view_tracking(request: Request, uid: str = None, run_id: str = None):
+    uid = uid or request.cookies.get("user_id") or "guest"  # Agents pass uid/run_id like on "/"
+    group = await get_assignment_async(uid)
+    log_event(uid, group, 'page_view_tracking', 0.0, run_id)
+    return templates.TemplateResponse(request, "tracking.html", {"request": request, "uid": uid, "group": group})
 
 @app.post("/click")
 async def track_click(uid: str = Form(...), element: str = Form(...), run_id: str = Form(None)):
-    group = get_assignment(uid)
+    group = await get_assignment_async(uid)
     log_event(uid, group, element, 0.0, run_id)
     return {"status": "success", "event": "click", "uid": uid}
 
 @app.post("/order")
 async def track_order(uid: str = Form(...), amount: float = Form(...), run_id: str = Form(None)):
-    group = get_assignment(uid)
+    group = await get_assignment_async(uid)
     log_event(uid, group, 'purchase', amount, run_id)
     return {"status": "success", "event": "order", "uid": uid}
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 class SqlRequest(BaseModel):
     sql: str
 
+# =========================================================
+# Bulk Event Ingestion (/events/batch)
+# =========================================================
+
+EVENT_BATCH_MAX = int(os.getenv('EVENT_BATCH_MAX', '10000'))  # Max events accepted per request
+
+class BatchEvent(BaseModel):
+    uid: str
+    event_name: str
+    value: float = 0.0
+    run_id: Optional[str] = None
+    timestamp: Optional[datetime] = None  # Client-side event time; server time if omitted
+    event_id: Optional[str] = None        # Lets clients retry a batch without minting new ids
+
+def _parse_event_batch(raw: bytes, content_type: str) -> list:
+    """Decode a JSON array, {"events": [...]} object or NDJSON body into a list of dicts."""
+    text = raw.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    payload = json.loads(text)
+    if isinstance(payload, dict):
+        payload = payload.get("events")
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array of events or an object with an 'events' array")
+    return payload
+
+def _batch_event_row(event: BatchEvent, received_at: datetime) -> tuple:
+    ts = event.timestamp or received_at
+    if ts.tzinfo is not None:
+        # events.timestamp is naive local time, same as log_event
+        ts = ts.astimezone().replace(tzinfo=None)
+    return (event.event_id or str(uuid.uuid4()), event.uid, event.event_name, ts, event.value, event.run_id)
+
+def _batch_error(message: str, errors: list = None, status_code: int = 422):
+    content = {"status": "error", "message": message}
+    if errors:
+        content["errors"] = errors
+    return JSONResponse(status_code=status_code, content=content)
+
+@app.post("/events/batch")
+async def ingest_event_batch(request: Request):
+    """
+    Accept many events in one request and write them in a single transaction.
+
+    Body is a JSON array (or {"events": [...]}) or NDJSON with
+    Content-Type application/x-ndjson. The whole batch is rejected if any
+    event fails validation, so clients can safely retry it as a unit.
+    """
+    try:
+        items = _parse_event_batch(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:  # JSONDecodeError and UnicodeDecodeError are ValueErrors
+        return _batch_error(f"Malformed batch: {e}", status_code=400)
+
+    if len(items) > EVENT_BATCH_MAX:
+        return _batch_error(f"Batch too large: {len(items)} events (max {EVENT_BATCH_MAX})", status_code=413)
+
+    received_at = datetime.now()
+    rows, errors = [], []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": i, "error": "Event must be an object"})
+            continue
+        try:
+            rows.append(_batch_event_row(BatchEvent(**item), received_at))
+        except ValidationError as e:
+            fields = "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+            errors.append({"index": i, "error": fields})
+    if errors:
+        return _batch_error(f"{len(errors)} invalid event(s); batch rejected", errors)
+    if not rows:
+        return {"status": "success", "accepted": 0}
+
+    try:
+        # Bypass the buffer: the response acknowledges that the batch is durable
+        await run_db(_write_events, rows)
+    except Exception as e:
+        logger.error(f"Batch ingest failed ({len(rows)} events): {e}")
+        return _batch_error(str(e), status_code=503)
+    return {"status": "success", "accepted": len(rows)}
+
 @app.get("/admin/debug")
 async def debug_status():
     """Debug endpoint to check adoption status and DB mode."""
     import json
-    adopted = get_adopted_variant()
-    experiment_active = is_experiment_active()
+    adopted = _query_adopted_variant()
+    allocation = _query_active_experiment()
+    experiment_active = allocation is not None
     pool = get_pg_pool() if is_cloud_mode() else None
 
     # Try to query adoptions directly
@@ -679,18 +1441,166 @@ async def debug_status():
         "DATABASE_URL_set": bool(DATABASE_URL),
         "pg_pool_available": pool is not None,
         "experiment_active": experiment_active,
+        "allocation": _compile_allocation(allocation).weights if experiment_active else None,
+        "layers": _compile_layers(None, await run_db(_query_layer_experiments)).config(),
         "adopted_variant": adopted,
-        "adoptions_table": adoptions_data
+        "adoptions_table": adoptions_data,
+        "experiment_state_cache": experiment_state.stats()
     }
 
+@app.get("/assignments")
+async def get_assignments(uid: str):
+    """Variants of `uid` in every running experiment, one per layer (served from cached state)."""
+    state = await experiment_state.aget()
+    return {"uid": uid, "variant": _choose_variant(uid, state), "experiments": _choose_experiments(uid, state)}
+
+class LayerExperimentRequest(BaseModel):
+    experiment_id: str
+    layer: str = DEFAULT_LAYER
+    traffic: float = 100.0           # Percent of the layer's users
+    allocation: Optional[str] = None  # Allocation spec (see src.core.allocation); default 50/50 A/B
+
+@app.get("/admin/layers")
+async def list_layers():
+    """Compiled layer config the Target App is currently assigning with."""
+    return (await experiment_state.aget()).get("layers", EMPTY_LAYERS).config()
+
+@app.post("/admin/layers/experiments")
+async def start_layer_experiment(body: LayerExperimentRequest):
+    """Start an experiment in a layer on the first free bucket range that fits its traffic."""
+    if body.experiment_id == DEFAULT_EXPERIMENT:
+        return _admin_error(f"'{DEFAULT_EXPERIMENT}' is managed through active_experiment")
+    try:
+        allocation = experiment_allocation(body.experiment_id, body.allocation)
+        start, count = await run_db(_start_layer_experiment, body.experiment_id, body.layer, body.traffic,
+                                    allocation.to_json())
+    except ValueError as e:
+        return _admin_error(str(e))
+    except Exception as e:
+        logger.error(f"Layered experiment start failed: {e}")
+        return _admin_error(str(e), status_code=503)
+    experiment_state.invalidate()
+    return {"status": "success", "experiment_id": body.experiment_id, "layer": body.layer,
+            "bucket_start": start, "bucket_count": count, "allocation": allocation.config()}
+
+@app.post("/admin/layers/experiments/{experiment_id}/stop")
+async def stop_layer_experiment(experiment_id: str):
+    """Stop a layered experiment; its bucket range becomes free, other experiments keep their users."""
+    try:
+        await run_db(_execute_layers_sql, f"UPDATE {LAYERS_TABLE} SET is_active = false WHERE experiment_id = ?", [experiment_id])
+    except Exception as e:
+        logger.error(f"Layered experiment stop failed: {e}")
+        return _admin_error(str(e), status_code=503)
+    experiment_state.invalidate()
+    return {"status": "success", "experiment_id": experiment_id}
+
+_LAYER_RANGES_SQL = f"SELECT experiment_id, bucket_start, bucket_count FROM {LAYERS_TABLE} WHERE is_active = true AND layer = ?"
+_START_LAYER_SQL = (f"INSERT INTO {LAYERS_TABLE} (experiment_id, layer, bucket_start, bucket_count, allocation, is_active, started_at) "
+                    "VALUES (?, ?, ?, ?, ?, true, CURRENT_TIMESTAMP) "
+                    "ON CONFLICT (experiment_id) DO UPDATE SET layer = excluded.layer, bucket_start = excluded.bucket_start, "
+                    "bucket_count = excluded.bucket_count, allocation = excluded.allocation, is_active = true, "
+                    "started_at = excluded.started_at")
+
+def _start_layer_experiment(experiment_id, layer, traffic, allocation_json):
+    """
+    Blocking read-allocate-insert of a layered experiment, returns (bucket_start, bucket_count).
+
+    Serialized per layer so concurrent starts never get overlapping ranges: on the
+    DuckDB writer thread, or in one PostgreSQL transaction holding the layer's
+    advisory lock. Raises ValueError when the experiment is already running in
+    the layer or no free range fits its traffic.
+    """
+    default_running = layer == DEFAULT_LAYER and is_experiment_active()
+
+    def allocate(rows):
+        if any(row[0] == experiment_id for row in rows):
+            raise ValueError(f"Experiment '{experiment_id}' is already running")
+        taken = [(row[1], row[2]) for row in rows]
+        if default_running:
+            taken.append((0, EMPTY_LAYERS.buckets))
+        start, count = allocate_range(taken, traffic)
+        return start, count, [experiment_id, layer, start, count, allocation_json]
+
+    if is_cloud_mode():
+        pool = get_pg_pool()
+        if not pool:
+            raise RuntimeError("PostgreSQL pool not available")
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(create_layers_table_sql())
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"{LAYERS_TABLE}:{layer}"])
+                cur.execute(_LAYER_RANGES_SQL.replace("?", "%s"), [layer])
+                start, count, params = allocate(cur.fetchall())
+                cur.execute(_START_LAYER_SQL.replace("?", "%s"), params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+        return start, count
+    if not db_writer:
+        raise RuntimeError("DuckDB not connected")
+    return _duckdb_write(_start_layer_duckdb, layer, allocate)
+
+def _start_layer_duckdb(con, layer, allocate):
+    con.execute(create_layers_table_sql())
+    start, count, params = allocate(con.execute(_LAYER_RANGES_SQL, [layer]).fetchall())
+    con.execute(_START_LAYER_SQL, params)
+    return start, count
+
+def _admin_error(message: str, status_code: int = 409):
+    return JSONResponse(status_code=status_code, content={"status": "error", "message": message})
+
+def _execute_layers_sql(sql, params):
+    """Blocking write to the layer_experiments table (DuckDB writer thread or PostgreSQL pool)."""
+    if is_cloud_mode():
+        pool = get_pg_pool()
+        if not pool:
+            raise RuntimeError("PostgreSQL pool not available")
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(create_layers_table_sql())
+                cur.execute(sql.replace("?", "%s"), params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+    else:
+        if not db_writer:
+            raise RuntimeError("DuckDB not connected")
+        _duckdb_write(_execute_layers_duckdb, sql, params)
+
+def _execute_layers_duckdb(con, sql, params):
+    con.execute(create_layers_table_sql())
+    con.execute(sql, params)
+
+@app.post("/admin/invalidate_cache")
+async def invalidate_cache():
+    """Drop cached experiment state (called by Streamlit after activate/adopt/rollback)."""
+    experiment_state.invalidate()
+    logger.info("Experiment state cache invalidated")
+    return {"status": "success", "message": "Experiment state cache invalidated"}
+
 @app.post("/admin/execute_sql")
 async def execute_sql(body: SqlRequest):
     """Execute SQL query (supports both DuckDB and PostgreSQL)."""
-    global db_con
+    # Analytics queries can be slow; keep them off the event loop
+    return await run_db(_execute_sql, body.sql)
 
+def _execute_sql(sql: str):
+    """Blocking body of /admin/execute_sql."""
     try:
         logger.info(f"Executing Admin SQL (mode={DB_MODE})")
 
+        # Make buffered events (and their experiment stats) visible to dashboard queries
+        event_buffer.flush()
+        _flush_experiment_stats()
+
         if is_cloud_mode():
             # PostgreSQL mode
             pool = get_pg_pool()
@@ -703,7 +1613,7 @@ async def execute_sql(body: SqlRequest):
                 result = None
                 columns = []
                 with conn.cursor() as cur:
-                    cur.execute(body.sql)
+                    cur.execute(sql)
                     if cur.description:
                         columns = [desc[0] for desc in cur.description]
                         result = cur.fetchall()
@@ -720,30 +1630,13 @@ async def execute_sql(body: SqlRequest):
             if not db_con:
                 return {"status": "error", "message": "DuckDB not connected"}
 
-            with db_lock:
-                result = None
-                columns = []
-                try:
-                    db_con.execute(body.sql)
-                    try:
-                        result = db_con.fetchall()
-                        if db_con.description:
-                            columns = [desc[0] for desc in db_con.description]
-                    except Exception:
-                        pass
-                    try:
-                        db_con.execute("COMMIT")
-                    except Exception as e:
-                        if "no transaction is active" in str(e).lower():
-                            pass
-                        else:
-                            raise e
-                except Exception as e:
-                    try:
-                        db_con.execute("ROLLBACK")
-                    except Exception:
-                        pass
-                    raise e
+            if _is_read_only_sql(sql):
+                # Dashboard reads use a separate cursor and never block ingestion
+                cur = _duckdb_reader()
+                result = cur.execute(sql).fetchall()
+                columns = [desc[0] for desc in cur.description] if cur.description else []
+            else:
+                result, columns = _duckdb_write(_execute_write_sql, sql)
 
             return {"status": "success", "data": result, "columns": columns}
 
@@ -751,33 +1644,81 @@ async def execute_sql(body: SqlRequest):
         logger.error(f"SQL Exec Error: {type(e).__name__}: {e}")
         return {"status": "error", "message": str(e)}
 
+_READ_ONLY_PREFIXES = ("select", "with", "show", "describe", "explain", "summarize")
+
+def _is_read_only_sql(sql: str) -> bool:
+    """True for statements that can run on a read cursor instead of the writer thread."""
+    stripped = sql.lstrip().lstrip("(").lower()
+    while stripped.startswith("--"):
+        stripped = stripped.split("\n", 1)[1].lstrip() if "\n" in stripped else ""
+    return stripped.startswith(_READ_ONLY_PREFIXES)
+
+def _execute_write_sql(con, sql):
+    result = None
+    columns = []
+    try:
+        con.execute(sql)
+        try:
+            result = con.fetchall()
+            if con.description:
+                columns = [desc[0] for desc in con.description]
+        except Exception:
+            pass
+        try:
+            con.execute("COMMIT")
+        except Exception as e:
+            if "no transaction is active" in str(e).lower():
+                pass
+            else:
+                raise e
+    except Exception as e:
+        try:
+            con.execute("ROLLBACK")
+        except Exception:
+            pass
+        raise e
+    return result, columns
+
 @app.post("/admin/db_release")
 async def release_db():
     """Release DB connection to allow external writes (for Streamlit)."""
-    global db_con
     try:
-        if db_con:
-            db_con.close()
-            db_con = None
-            logger.info("DB connection released")
+        # Flushing and joining the writer thread block; keep them off the event loop
+        await run_db(_release_db)
         return {"status": "success", "message": "DB connection released"}
     except Exception as e:
         logger.error(f"DB release error: {e}")
         return {"status": "error", "message": str(e)}
 
+def _release_db():
+    """Blocking body of /admin/db_release."""
+    # Persist queued events while we still hold the connection
+    event_buffer.flush()
+    _flush_experiment_stats()
+    if db_con:
+        _close_duckdb()
+        logger.info("DB connection released")
+
 @app.post("/admin/db_reconnect")
 async def reconnect_db():
     """Reconnect to DB after external writes."""
-    global db_con
     try:
-        if not db_con:
-            db_con = duckdb.connect(DB_PATH)
-            logger.info("DB reconnected in READ/WRITE mode")
+        await run_db(_reconnect_db)
+        # External writes may have changed experiment state and deleted run data
+        experiment_state.invalidate()
+        recent_assignments.clear()
         return {"status": "success", "message": "DB reconnected"}
     except Exception as e:
         logger.error(f"DB reconnect error: {e}")
         return {"status": "error", "message": str(e)}
 
+def _reconnect_db():
+    """Blocking body of /admin/db_reconnect."""
+    if not db_con:
+        _open_duckdb()
+        _duckdb_write(_ensure_assignment_index_duckdb)
+        logger.info("DB reconnected in READ/WRITE mode")
+
 if __name__ == "__main__":
     # Ensure tables exist before server start if running directly
     if not os.path.exists(DB_PATH):
@@ -0,0 +1,106 @@
+import pytest
+import sys
+import os
+
+import duckdb
+import numpy as np
+
+# Add root to path to import src modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.accumulator import (
+    STATS_COLUMNS, ExperimentAccumulator, VariantStats, create_table_sql, upsert_sql, user_event_kind
+)
+
+
+class TestVariantStats:
+    """Test suite for the per-variant sufficient statistics."""
+
+    def test_events_update_the_right_counters(self):
+        stats = VariantStats()
+        for weight in (2.0, 2.0, 2.0):
+            stats.add_assignment(weight)
+        for name in ("page_view", "banner_B", "click_banner", "bounce", "page_view_cart"):
+            stats.add_event(name)
+        stats.add_event("purchase", 30000)
+
+        assert (stats.users, stats.weight_sum, stats.weight_sq_sum) == (3, 6.0, 12.0)
+        assert (stats.page_views, stats.clicks, stats.bounces, stats.purchases) == (1, 2, 1, 1)
+        assert stats.revenue_sum == 30000 and stats.revenue_sq_sum == 30000 ** 2
+
+    def test_repeats_only_add_revenue(self):
+        stats = VariantStats()
+        stats.add_assignment()
+        for first in (True, False):
+            for name, value in (("banner_A", 0.0), ("bounce", 0.0), ("purchase", 100.0), ("page_view", 0.0)):
+                stats.add_event(name, value, first=first)
+
+        assert (stats.page_views, stats.clicks, stats.bounces, stats.purchases) == (2, 1, 1, 1)
+        assert stats.revenue_sum == 200.0 and stats.summary()["cvr"] == 1.0
+
+    def test_summary_moments_match_numpy(self):
+        amounts = [15000.0, 42000.0, 27500.0, 31000.0]
+        stats = VariantStats()
+        for _ in range(10):
+            stats.add_assignment()
+        for amount in amounts:
+            stats.add_event("purchase", amount)
+
+        summary = stats.summary()
+        per_user = np.array(amounts + [0.0] * 6)
+        assert summary["cvr"] == pytest.approx(0.4)
+        assert summary["aov"] == pytest.approx(np.mean(amounts))
+        assert summary["aov_std"] == pytest.approx(np.std(amounts, ddof=1))
+        assert summary["arpu"] == pytest.approx(per_user.mean())
+        assert summary["arpu_std"] == pytest.approx(per_user.std(ddof=1))
+
+    def test_row_round_trip(self):
+        stats = VariantStats(users=5, clicks=2, revenue_sum=10.0)
+        row = stats.to_row("run_1", "A")
+        assert row[:2] == ("run_1", "A")
+        assert VariantStats.from_row(row).summary() == stats.summary()
+
+
+class TestExperimentAccumulator:
+    """Test suite for pending deltas and their persistence."""
+
+    def test_ignores_untagged_traffic(self):
+        acc = ExperimentAccumulator()
+        acc.record_assignment(None, "A")
+        acc.record_event(None, "A", "page_view")
+        assert acc.drain() == []
+
+    def test_drain_restore_and_merge(self):
+        acc = ExperimentAccumulator()
+        acc.record_assignment("run_1", "A", 1.5)
+        rows = acc.drain()
+        assert acc.pending() == 0
+
+        acc.restore(rows)
+        other = ExperimentAccumulator()
+        other.record_assignment("run_1", "A", 1.5)
+        other.record_event("run_1", "B", "bounce")
+        acc.merge(other)
+
+        by_key = {row[:2]: VariantStats.from_row(row) for row in acc.drain()}
+        assert by_key[("run_1", "A")].users == 2
+        assert by_key[("run_1", "B")].bounces == 1
+        assert other.pending() == 0
+
+    def test_upsert_adds_to_persisted_totals(self):
+        con = duckdb.connect()
+        con.execute(create_table_sql())
+        sql = upsert_sql(f"VALUES ({', '.join('?' * len(STATS_COLUMNS))})")
+
+        for _ in range(2):
+            acc = ExperimentAccumulator()
+            acc.record_assignment("run_1", "A")
+            acc.record_event("run_1", "A", "purchase", 100.0)
+            con.executemany(sql, acc.drain())
+
+        row = con.execute("SELECT users, purchases, revenue_sum, revenue_sq_sum FROM experiment_stats").fetchall()
+        assert row == [(2, 2, 200.0, 20000.0)]
+
+    def test_user_event_kinds(self):
+        assert [user_event_kind(name) for name in ("banner_B", "click_banner", "bounce", "purchase", "page_view")] == \
+            ["click", "click", "bounce", "purchase", None]
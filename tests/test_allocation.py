@@ -0,0 +1,85 @@
+import pytest
+import sys
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Add root to path to import src modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.allocation import (
+    ALLOCATION_ENV, DEFAULT_TABLE, AllocationTable, allocation_from_env, parse_allocation
+)
+from src.core.bucketing import FAST_HASH, LEGACY_HASH, bucket
+
+
+class TestParseAllocation:
+    """Test suite for allocation spec parsing."""
+
+    @pytest.mark.parametrize("spec", [
+        "A:50,B:25,C:25",
+        '{"A": 50, "B": 25, "C": 25}',
+        {"A": 50, "B": 25, "C": 25},
+    ])
+    def test_formats_are_equivalent(self, spec):
+        assert parse_allocation(spec) == {"A": 50.0, "B": 25.0, "C": 25.0}
+
+    def test_variant_list_is_an_equal_split(self):
+        assert parse_allocation("A,B,C") == {"A": 1.0, "B": 1.0, "C": 1.0}
+
+    @pytest.mark.parametrize("spec", ["A:100", "A:-1,B:50", "A:x,B:1", "A:0,B:0"])
+    def test_invalid_specs_are_rejected(self, spec):
+        with pytest.raises(ValueError):
+            parse_allocation(spec)
+
+
+class TestAllocationTable:
+    """Test suite for the compiled bucket -> variant table."""
+
+    def test_default_table_matches_legacy_md5_split(self):
+        ids = [f"agent_{i}" for i in range(500)]
+        legacy = ['B' if int(hashlib.md5(uid.encode()).hexdigest(), 16) % 100 >= 50 else 'A' for uid in ids]
+        assert [DEFAULT_TABLE.variant(uid) for uid in ids] == legacy
+
+    def test_buckets_follow_largest_remainder_rounding(self):
+        table = AllocationTable({"A": 1, "B": 1, "C": 1})
+        assert table.counts == {"A": 34, "B": 33, "C": 33}
+        assert table.control == "A" and table.test_variants == ("B", "C")
+
+    def test_too_small_weight_is_rejected(self):
+        with pytest.raises(ValueError):
+            AllocationTable({"A": 1000, "B": 1})
+
+    def test_vectorized_lookup_matches_scalar(self):
+        table = AllocationTable("A:50,B:30,C:20")
+        ids = [f"user_{i}" for i in range(300)]
+        assert list(table.variants_for(ids)) == [table.variant(uid) for uid in ids]
+        assert all(table.variant(uid) == table.variants[np.searchsorted(np.cumsum([50, 30, 20]), bucket(uid), "right")]
+                   for uid in ids)
+
+    def test_traffic_follows_the_allocation(self):
+        table = AllocationTable("A:50,B:30,C:20")
+        labels, counts = np.unique(table.variants_for(f"u{i}" for i in range(20000)), return_counts=True)
+        assert dict(zip(labels, np.round(counts / 20000, 1))) == {"A": 0.5, "B": 0.3, "C": 0.2}
+
+    def test_spec_round_trips(self, monkeypatch):
+        table = AllocationTable("A:50,B:25,C:25")
+        assert AllocationTable(table.spec()) == table
+        assert AllocationTable(table.to_json()) == table
+
+        monkeypatch.setenv(ALLOCATION_ENV, table.spec())
+        assert allocation_from_env() == table
+
+    def test_salted_config_round_trips_and_plain_specs_stay_legacy(self):
+        table = AllocationTable("A:50,B:50").migrate("exp_7")
+        assert (table.salt, table.hash_version) == ("exp_7", FAST_HASH)
+        assert AllocationTable(table.to_json()) == table
+        assert AllocationTable(table.spec()).variant("user_1") == table.variant("user_1")
+        assert AllocationTable('{"A": 50, "B": 50}').hash_version == LEGACY_HASH
+
+    def test_series_lookup_matches_scalar(self):
+        table = AllocationTable("A:50,B:25,C:25", salt="exp_7", hash_version=FAST_HASH)
+        ids = [f"user_{i}" for i in range(100)] * 2
+        assert table.variants_series(pd.Series(ids)).tolist() == [table.variant(uid) for uid in ids]
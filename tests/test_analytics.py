@@ -73,3 +73,162 @@ def test_calculate_retention_rate():
     # Border cases
     assert al.calculate_retention_rate(100, 0) == 0.0
     assert al.calculate_retention_rate(0, 0) == 0.0 # Divide by zero safety
+
+def test_two_proportion_tests_match_scalar():
+    c_users, c_conv = np.array([1000, 1000, 500]), np.array([100, 100, 40])
+    t_users, t_conv = np.array([1000, 1000, 520]), np.array([200, 101, 60])
+
+    res = al.two_proportion_tests(c_users, c_conv, t_users, t_conv)
+
+    for i in range(3):
+        single = al.calculate_statistics(c_users[i], c_conv[i], t_users[i], t_conv[i])
+        for key, value in single.items():
+            assert res[key][i] == pytest.approx(value)
+    assert res['significant'].tolist() == [True, False, False]
+    assert (res['ci_low'] < res['diff']).all() and (res['diff'] < res['ci_high']).all()
+    assert res['lift_ci_low'][0] == pytest.approx(res['ci_low'][0] / 0.1)
+
+def test_two_proportion_tests_empty_groups():
+    res = al.two_proportion_tests([0, 100], [0, 0], [50, 0], [5, 0])
+    assert res['p_value'].tolist() == [1.0, 1.0]
+    assert res['lift'].tolist() == [0.0, 0.0]
+
+def test_segment_statistics_per_segment_and_variant():
+    import pandas as pd
+    df = pd.DataFrame({
+        'persona': ['Window'] * 3 + ['Mission'] * 3,
+        'variant': ['A', 'B', 'C'] * 2,
+        'users': [1000, 1000, 1000, 400, 400, 400],
+        'conversions': [100, 200, 90, 40, 40, 80],
+    })
+
+    out = al.segment_statistics(df, by='persona')
+
+    assert len(out) == 4  # 2 personas x 2 test variants
+    row = out[(out['persona'] == 'Window') & (out['variant'] == 'B')].iloc[0]
+    assert row['lift'] == pytest.approx(1.0)
+    assert row['control_users'] == 1000
+    mission_c = out[(out['persona'] == 'Mission') & (out['variant'] == 'C')].iloc[0]
+    assert mission_c['significant']
+    assert len(al.segment_statistics(df[df['persona'] == 'Window'])) == 2  # No segment columns
+
+def test_adjust_p_values_per_family():
+    p = [0.01, 0.04, 0.03, 0.005, 0.5, 0.02]
+    groups = ['x', 'x', 'x', 'y', 'y', 'y']
+
+    assert al.adjust_p_values(p, 'bonferroni', groups) == pytest.approx([0.03, 0.12, 0.09, 0.015, 1.0, 0.06])
+    assert al.adjust_p_values(p, 'holm', groups) == pytest.approx([0.03, 0.06, 0.06, 0.015, 0.5, 0.04])
+    assert al.adjust_p_values(p, 'bh', groups) == pytest.approx([0.03, 0.04, 0.04, 0.015, 0.5, 0.03])
+    assert al.adjust_p_values([0.02], 'holm') == pytest.approx([0.02])  # A/B: one comparison, unchanged
+    with pytest.raises(ValueError):
+        al.adjust_p_values(p, 'sidak')
+
+def test_segment_statistics_multiple_comparison_correction():
+    import pandas as pd
+    df = pd.DataFrame({
+        'variant': ['A', 'B', 'C', 'D'],
+        'users': [2000] * 4,
+        'conversions': [200, 245, 200, 180],
+    })
+
+    out = al.segment_statistics(df, correction='holm')
+    b = out[out['variant'] == 'B'].iloc[0]
+    assert b['p_value'] < 0.05 and b['p_adjusted'] == pytest.approx(min(3 * b['p_value'], 1.0))
+    assert not b['significant']  # Significant alone, not after correcting for three arms
+    assert (out['p_adjusted'] >= out['p_value']).all()
+
+def test_get_run_stats_prefers_accumulated_rows_and_falls_back_to_scan():
+    import duckdb
+    from src.core.accumulator import create_table_sql
+    con = duckdb.connect()
+    con.execute(create_table_sql())
+    con.execute("CREATE TABLE assignments (user_id VARCHAR, variant VARCHAR, run_id VARCHAR, weight FLOAT)")
+    con.execute("CREATE TABLE events (user_id VARCHAR, event_name VARCHAR, value FLOAT, run_id VARCHAR)")
+    con.execute("INSERT INTO assignments VALUES ('u1', 'A', 'r1', 1), ('u2', 'B', 'r1', 1), ('u3', 'B', 'r1', 1)")
+    con.execute("INSERT INTO events VALUES ('u2', 'banner_B', 0, 'r1'), ('u2', 'purchase', 100, 'r1')")
+
+    scanned = al.get_run_stats('r1', con)
+    assert scanned['variant'].tolist() == ['A', 'B']
+    assert scanned['users'].tolist() == [1, 2]
+    assert scanned[['clicks', 'purchases', 'revenue_sum']].iloc[1].tolist() == [1, 1, 100.0]
+
+    con.execute("INSERT INTO experiment_stats (run_id, variant, users, clicks) VALUES ('r1', 'A', 7, 3)")
+    assert al.get_run_stats('r1', con)['users'].tolist() == [7]
+
+def test_cuped_statistics_shrinks_variance_without_bias():
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    n = 20000
+    pre = rng.gamma(2, 10000, n)
+    variant = np.where(rng.random(n) < 0.5, 'A', 'B')
+    revenue = 0.6 * pre + rng.normal(0, 8000, n) + np.where(variant == 'B', 500, 0)
+    df = pd.DataFrame({'variant': variant, 'revenue': revenue, 'pre_orders': 0, 'pre_revenue': pre})
+
+    row = al.cuped_statistics(df, 'revenue').iloc[0]
+
+    assert row['ci_low'] < 500 < row['ci_high']
+    assert row['se'] < row['se_unadjusted']
+    assert row['variance_reduction'] > 0.4
+
+def test_cuped_analysis_joins_warehouse_pre_period():
+    import duckdb
+    exp = duckdb.connect()
+    exp.execute("CREATE TABLE assignments (user_id VARCHAR, variant VARCHAR, run_id VARCHAR, weight FLOAT, assigned_at TIMESTAMP)")
+    exp.execute("CREATE TABLE events (user_id VARCHAR, event_name VARCHAR, value FLOAT, run_id VARCHAR)")
+    exp.execute("""INSERT INTO assignments SELECT 'u' || i, CASE WHEN i % 2 = 0 THEN 'A' ELSE 'B' END, 'r1', 1,
+                   TIMESTAMP '2026-03-01' FROM range(40) t(i)""")
+    exp.execute("INSERT INTO events SELECT 'u' || i, 'purchase', 1000 * (i % 4), 'r1' FROM range(40) t(i)")
+    wh = duckdb.connect()
+    wh.execute("CREATE TABLE orders (user_id VARCHAR, order_at TIMESTAMP, amount INTEGER)")
+    wh.execute("""INSERT INTO orders SELECT 'u' || i, TIMESTAMP '2026-02-20', 1000 * (i % 4) FROM range(20) t(i)
+                  UNION ALL SELECT 'u' || i, TIMESTAMP '2025-01-01', 99999 FROM range(20, 40) t(i)""")
+
+    out = al.cuped_analysis('r1', metric='revenue', con=exp, warehouse_con=wh)
+
+    assert out['variant'].tolist() == ['B']
+    assert out.iloc[0]['coverage'] == pytest.approx(0.5)  # Orders older than 30 days are not pre-period
+    assert out.iloc[0]['variance_reduction'] > 0
+
+def test_bayesian_run_statistics_covers_rates_and_revenue():
+    import pandas as pd
+    run_stats = pd.DataFrame({
+        'variant': ['A', 'B'], 'users': [5000, 5000], 'clicks': [1000, 1150], 'purchases': [200, 230],
+        'revenue_sum': [200 * 32500.0, 230 * 33000.0], 'revenue_sq_sum': [200 * (32500.0 ** 2 + 1e8), 230 * (33000.0 ** 2 + 1e8)],
+    })
+
+    out = al.bayesian_run_statistics('run_bayes', run_stats)
+
+    assert out['metric'].tolist() == ['CTR', 'CVR', 'ARPU']
+    assert out.loc[0, 'prob_beat'] > 0.99
+    assert out.loc[2, 'control_aov'] == pytest.approx(32500, rel=0.01)
+
+def test_bootstrap_revenue_sums_match_analytic_standard_errors():
+    rng = np.random.default_rng(0)
+    n = 200000
+    revenue = np.where(rng.random(n) < 0.05, rng.integers(15000, 50001, n), 0).astype(float)
+
+    sums = al.bootstrap_revenue_sums(revenue, resamples=2000, seed=1)
+    arpu, aov = sums[:, 0] / sums[:, 1], sums[:, 0] / sums[:, 2]
+
+    assert sums[:, 1].tolist() == [n] * 2000  # Every resample has n users
+    assert arpu.std() == pytest.approx(revenue.std() / np.sqrt(n), rel=0.1)
+    assert aov.std() == pytest.approx(revenue[revenue > 0].std() / np.sqrt((revenue > 0).sum()), rel=0.1)
+    assert np.array_equal(sums, al.bootstrap_revenue_sums(revenue, resamples=2000, seed=1))
+
+def test_bootstrap_revenue_statistics_compares_to_control():
+    import pandas as pd
+    rng = np.random.default_rng(2)
+    users = pd.DataFrame({
+        'variant': ['A'] * 5000 + ['B'] * 5000,
+        'weight': 2.0,
+        'revenue': np.where(rng.random(10000) < 0.2, rng.integers(15000, 50001, 10000), 0).astype(float),
+    })
+    users.loc[users['variant'] == 'B', 'revenue'] *= 1.5
+
+    out = al.bootstrap_revenue_statistics(users, resamples=1000).set_index(['metric', 'variant'])
+
+    arpu_a = users.loc[users['variant'] == 'A', 'revenue'].mean()
+    assert out.loc[('ARPU', 'A'), 'estimate'] == pytest.approx(arpu_a)
+    assert out.loc[('ARPU', 'A'), 'ci_low'] < arpu_a < out.loc[('ARPU', 'A'), 'ci_high']
+    assert out.loc[('AOV', 'B'), 'diff_ci_low'] > 0
+    assert out.loc[('AOV', 'B'), 'p_value'] < 0.01
@@ -0,0 +1,54 @@
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# Add root to path to import src modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core import bayesian
+
+
+class TestBetaBinomial:
+    """Test suite for rate posteriors."""
+
+    @pytest.mark.parametrize("counts", [(1000, 100, 1000, 120), (50, 3, 50, 6), (100000, 10000, 100000, 10100)])
+    def test_monte_carlo_matches_closed_form(self, counts):
+        exact = bayesian.prob_beat_exact(*counts)
+        res = bayesian.beta_binomial_test(*counts, draws=100000)
+        assert res["prob_beat"][0] == pytest.approx(exact, abs=0.01)
+
+    def test_segments_are_vectorized_and_deterministic(self):
+        users = np.full(300, 2000)
+        conv = np.linspace(150, 250, 300).astype(int)
+        res = bayesian.beta_binomial_test(users, 200, users, conv)
+
+        assert res["prob_beat"].shape == (300,)
+        assert res["prob_beat"][0] < 0.01 and res["prob_beat"][-1] > 0.99
+        assert (res["lift_low"] < res["lift_mean"]).all() and (res["lift_mean"] < res["lift_high"]).all()
+        again = bayesian.beta_binomial_test(users, 200, users, conv)
+        assert np.array_equal(res["prob_beat"], again["prob_beat"])
+
+    def test_expected_loss_is_small_for_a_clear_winner(self):
+        res = bayesian.beta_binomial_test(10000, 1000, 10000, 1300)
+        assert res["expected_loss"][0] < 1e-5 < res["expected_loss_control"][0]
+
+
+class TestGammaRevenue:
+    """Test suite for the revenue-per-user model."""
+
+    def test_posterior_recovers_order_amounts(self):
+        rng = np.random.default_rng(0)
+        amounts = rng.integers(15000, 50001, size=(2, 400)).astype(float)
+        amounts[1] *= 1.1
+        sums, squares = amounts.sum(axis=1), (amounts ** 2).sum(axis=1)
+
+        res = bayesian.gamma_revenue_test(4000, 400, sums[0], squares[0], 4000, 400, sums[1], squares[1])
+
+        assert res["control_aov"][0] == pytest.approx(amounts[0].mean(), rel=0.01)
+        assert res["test_mean"][0] == pytest.approx(amounts[1].sum() / 4000, rel=0.05)
+        assert res["prob_beat"][0] > 0.8
+
+    def test_amount_shape_without_spread(self):
+        assert bayesian.amount_shape([0, 1, 3], [0, 10, 30], [0, 100, 300]).tolist() == [1.0, 1.0, 1.0]
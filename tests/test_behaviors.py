@@ -1,6 +1,10 @@
 import pytest
 import sys
 import os
+import json
+import random
+
+import numpy as np
 
 # Add agent_swarm to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -14,6 +18,7 @@ from agent_swarm.behaviors import (
     CautiousBehavior,
     get_behavior_by_name
 )
+from agent_swarm.personas import PersonaCatalog, load_catalog
 
 
 class TestImpulsiveBehavior:
@@ -220,3 +225,151 @@ class TestBehaviorStrategyInterface:
         behavior = behavior_class()
         result = behavior.should_purchase()
         assert isinstance(result, bool)
+
+
+class TestBehaviorProbabilities:
+    """Probabilities exposed for the vectorized (direct) engine."""
+
+    @pytest.mark.parametrize("behavior_class", [
+        ImpulsiveBehavior,
+        CalculatorBehavior,
+        BrowserBehavior,
+        MissionBehavior,
+        CautiousBehavior
+    ])
+    def test_probabilities_are_valid(self, behavior_class):
+        behavior = behavior_class()
+        for variant in ('A', 'B'):
+            assert 0.0 <= behavior.click_probability(variant) <= 1.0
+        assert 0.0 <= behavior.purchase_probability() <= 1.0
+
+    def test_impulsive_probabilities(self):
+        behavior = ImpulsiveBehavior()
+        assert behavior.click_probability('A') == pytest.approx(0.30)
+        assert behavior.click_probability('B') == pytest.approx(0.55)
+        assert behavior.purchase_probability() == pytest.approx(0.25)
+
+
+class TestBatchDecisions:
+    """Vectorized BehaviorStrategy API (N agents per call)."""
+
+    def test_click_probabilities_follow_variants(self):
+        behavior = ImpulsiveBehavior()
+        probs = behavior.click_probabilities(np.array(['A', 'B', 'B', 'A']))
+        assert probs.tolist() == pytest.approx([0.30, 0.55, 0.55, 0.30])
+
+    def test_batch_rates_match_probabilities(self):
+        behavior = ImpulsiveBehavior()
+        rng = np.random.default_rng(0)
+        variants = np.array(['A'] * 50_000 + ['B'] * 50_000)
+
+        clicks = behavior.should_click_batch(variants, rng)
+        purchases = behavior.should_purchase_batch(100_000, rng)
+
+        assert clicks.dtype == bool and clicks.shape == (100_000,)
+        assert clicks[:50_000].mean() == pytest.approx(0.30, abs=0.01)
+        assert clicks[50_000:].mean() == pytest.approx(0.55, abs=0.01)
+        assert purchases.mean() == pytest.approx(0.25, abs=0.01)
+
+    def test_per_agent_methods_wrap_batch_draws(self):
+        """A seeded random.Random gives the same decisions one by one or in a batch."""
+        behavior = CalculatorBehavior()
+        variants = ['A', 'B'] * 20
+        one_by_one_rng, batch_rng = random.Random(3), random.Random(3)
+        one_by_one = [behavior.should_click(v, one_by_one_rng) for v in variants]
+        assert one_by_one == behavior.should_click_batch(variants, batch_rng).tolist()
+
+    def test_decision_only_strategies_get_batch_defaults(self):
+        """Strategies implementing only should_click / should_purchase still work in batches."""
+        class AlwaysB(BehaviorStrategy):
+            name = "always_b"
+
+            def should_click(self, variant, rng=None):
+                return variant == 'B'
+
+            def should_purchase(self, rng=None, variant=None):
+                return True
+
+        behavior = AlwaysB()
+        assert behavior.should_click_batch(np.array(['A', 'B', 'B'])).tolist() == [False, True, True]
+        assert behavior.should_purchase_batch(2, variants=['A', 'B']).tolist() == [True, True]
+        assert behavior.should_purchase_batch(3).all()
+
+    def test_legacy_strategies_keep_working(self):
+        """Baseline overrides should_click(variant) / should_purchase() take no rng and expose no probabilities."""
+        class Legacy(BehaviorStrategy):
+            name = "legacy"
+
+            def should_click(self, variant):
+                return variant == 'B'
+
+            def should_purchase(self):
+                return random.random() < 0.5
+
+        behavior = Legacy()
+        rng = random.Random(0)
+        assert behavior.should_click('B', rng=rng) and not behavior.should_click('A', rng=rng)
+        assert isinstance(behavior.should_purchase(rng=rng, variant='B'), bool)
+        expected = behavior.expected_outcome(['A'] * 10 + ['B'] * 10)
+        assert expected["clicks"] == 10.0
+        assert expected["purchases"] == pytest.approx(5.0, abs=0.3)
+
+    def test_strategy_without_decisions_or_probabilities_is_rejected(self):
+        class Empty(BehaviorStrategy):
+            name = "empty"
+
+            def click_probability(self, variant):
+                return 0.5
+
+        with pytest.raises(TypeError, match="should_purchase or purchase_probability"):
+            Empty()
+
+    def test_expected_outcome_is_analytical(self):
+        behavior = ImpulsiveBehavior()
+        expected = behavior.expected_outcome(['A'] * 100 + ['B'] * 100)
+        assert expected["clicks"] == pytest.approx(85.0)
+        assert expected["purchases"] == pytest.approx(85.0 * 0.25)
+
+
+class TestPersonaCatalog:
+    """Personas compiled from the JSON/YAML catalog."""
+
+    def test_catalog_tables_are_read_only(self):
+        catalog = load_catalog()
+        assert catalog.click.shape == (len(catalog), len(catalog.variants))
+        with pytest.raises(ValueError):
+            catalog.click[0, 0] = 1.0
+
+    def test_aliases_and_shared_instances(self):
+        assert get_behavior_by_name("rational") is get_behavior_by_name("calculator")
+        assert get_behavior_by_name("Window").name == "browser"
+
+    def test_custom_catalog_per_variant_fields(self, tmp_path, monkeypatch):
+        path = tmp_path / "personas.json"
+        path.write_text(json.dumps({
+            "variants": ["A", "B", "C"],
+            "personas": [{
+                "name": "bargain",
+                "click": {"A": 0.1, "B": 0.2, "C": 0.3},
+                "purchase": {"A": 0.5, "B": 0.6, "C": 0.7},
+                "amount": {"A": {"low": 1000, "high": 1000}, "B": {"low": 2000, "high": 3000},
+                           "C": {"low": 5000, "high": 5000}},
+            }],
+        }))
+        monkeypatch.setenv("PERSONA_CATALOG", str(path))
+
+        behavior = get_behavior_by_name("bargain")
+        assert behavior.name == "bargain"
+        assert behavior.click_probabilities(['C', 'A']).tolist() == pytest.approx([0.3, 0.1])
+        assert behavior.purchase_probability('B') == pytest.approx(0.6)
+        amounts = behavior.purchase_amounts(['A', 'B', 'C'], np.random.default_rng(0))
+        assert amounts[0] == 1000 and 2000 <= amounts[1] <= 3000 and amounts[2] == 5000
+        assert behavior.expected_outcome(['A'])["revenue"] == pytest.approx(0.1 * 0.5 * 1000)
+
+    def test_invalid_catalog_is_rejected(self):
+        with pytest.raises(ValueError):
+            PersonaCatalog({"personas": [{"name": "x", "click": 1.5, "purchase": 0.1,
+                                          "amount": {"low": 1, "high": 2}}]})
+        with pytest.raises(ValueError):
+            PersonaCatalog({"personas": [{"name": "x", "click": {"A": 0.1}, "purchase": 0.1,
+                                          "amount": {"low": 1, "high": 2}}]})
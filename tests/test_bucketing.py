@@ -0,0 +1,61 @@
+import pytest
+import sys
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Add root to path to import src modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.bucketing import FAST_HASH, Bucketer, bucket, bucket_many, bucket_series, get_bucketer
+
+
+def _original(uid, buckets=100):
+    return int(hashlib.md5(str(uid).encode()).hexdigest(), 16) % buckets
+
+
+class TestLegacyHash:
+    """The legacy version must reproduce the original md5 assignments exactly."""
+
+    @pytest.mark.parametrize("buckets", [2, 100, 1000, 2 ** 31 - 1])
+    def test_scalar_and_bulk_match_original(self, buckets):
+        ids = [f"agent_{i}" for i in range(2000)] + [12345, "한글_user"]
+        expected = [_original(uid, buckets) for uid in ids]
+
+        assert [bucket(uid, buckets) for uid in ids] == expected
+        assert bucket_many(ids, buckets).tolist() == expected
+
+
+class TestFastHash:
+    """Test suite for the salted 64-bit hash."""
+
+    def test_matches_definition(self):
+        digest = hashlib.blake2b(b"exp_1:user_9", digest_size=8).digest()
+        assert bucket("user_9", 100, "exp_1", FAST_HASH) == int.from_bytes(digest, "little") % 100
+
+    def test_bulk_and_series_match_scalar(self):
+        bucketer = get_bucketer("exp_1", FAST_HASH)
+        ids = [f"user_{i}" for i in range(1000)]
+        scalar = [bucketer.bucket(uid) for uid in ids]
+
+        assert bucketer.buckets(ids).tolist() == scalar
+        series = pd.Series(ids * 3, index=np.arange(3000) + 10, name="user_id")
+        out = bucket_series(series, salt="exp_1", hash_version=FAST_HASH)
+        assert out.tolist() == scalar * 3 and out.index.equals(series.index)
+
+    def test_missing_ids_get_no_bucket(self):
+        assert bucket_series(pd.Series(["a", None])).tolist() == [_original("a"), -1]
+
+    def test_salts_are_independent(self):
+        ids = [f"user_{i}" for i in range(20000)]
+        first = bucket_many(ids, 2, "layer_1", FAST_HASH)
+        second = bucket_many(ids, 2, "layer_2", FAST_HASH)
+        assert abs(first.mean() - 0.5) < 0.02
+        assert abs((first == second).mean() - 0.5) < 0.02  # No correlation between layers
+
+    @pytest.mark.parametrize("kwargs", [{"hash_version": "sha1"}, {"buckets": 0}])
+    def test_invalid_settings_are_rejected(self, kwargs):
+        with pytest.raises(ValueError):
+            Bucketer(**kwargs)
@@ -0,0 +1,108 @@
+import pytest
+import sys
+import os
+
+import duckdb
+
+# Add root to path to import agent_swarm
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from agent_swarm.agent import HeuristicAgent
+from agent_swarm.behaviors import get_behavior_by_name
+from agent_swarm.direct import assign_variants, run_direct_swarm
+from src.data import db
+
+
+@pytest.fixture
+def experiment_db(tmp_path, monkeypatch):
+    """Temporary experiment DB with the assignments/events tables."""
+    path = str(tmp_path / "experiment.db")
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE events (event_id VARCHAR, user_id VARCHAR, event_name VARCHAR, timestamp TIMESTAMP, value DOUBLE, run_id VARCHAR)")
+        con.execute("CREATE TABLE assignments (user_id VARCHAR, experiment_id VARCHAR, variant VARCHAR, assigned_at TIMESTAMP, run_id VARCHAR, weight FLOAT DEFAULT 1.0)")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    monkeypatch.setattr(db, "DB_MODE", "duckdb")
+    return path
+
+
+def _direct_writer(batches):
+    return db.bulk_insert_frames(batches, use_coordination=False)
+
+
+class TestDirectSwarm:
+    """Test suite for the vectorized in-process swarm engine."""
+
+    def test_variants_match_http_agent(self):
+        ids = [f"agent_impulsive_{i}" for i in range(200)]
+        expected = [HeuristicAgent(uid, "impulsive")._get_variant() for uid in ids]
+        assert list(assign_variants(ids)) == expected
+
+    def test_rows_match_http_session_shape(self, experiment_db):
+        results = run_direct_swarm({"impulsive": 300, "cautious": 200}, run_id="run_d", seed=7,
+                                   writer=_direct_writer, chunk_size=128)
+
+        with duckdb.connect(experiment_db) as con:
+            n_assign = con.execute("SELECT COUNT(DISTINCT user_id) FROM assignments WHERE run_id = 'run_d'").fetchone()[0]
+            events = dict(con.execute("SELECT event_name, COUNT(*) FROM events WHERE run_id = 'run_d' GROUP BY 1").fetchall())
+
+        assert results["success"] == n_assign == 500
+        assert events["page_view"] == 500
+        assert events.get("banner_A", 0) + events.get("banner_B", 0) == results["clicked"]
+        assert events["bounce"] == results["bounced"] == 500 - results["clicked"]
+        assert events.get("purchase", 0) == results["purchased"]
+        assert results["by_trait"]["impulsive"]["total"] == 300
+
+    def test_rates_follow_behavior_probabilities(self):
+        frames_seen = []
+
+        def counting_writer(batches):
+            frames_seen.extend(batches)
+            return {"status": "success"}
+
+        results = run_direct_swarm({"browser": 50000}, seed=1, writer=counting_writer)
+        behavior = get_behavior_by_name("browser")
+
+        assert results["clicked"] / results["total"] == pytest.approx(behavior.click_probability("A"), abs=0.01)
+        assert len(frames_seen) == 1
+
+    def test_same_seed_same_outcome(self):
+        def discard_writer(batches):
+            for _ in batches:
+                pass
+            return {"status": "success"}
+
+        # Mission agents ignore the variant, so outcomes depend on the seed only
+        first = run_direct_swarm({"mission": 1000}, seed=3, writer=discard_writer)
+        second = run_direct_swarm({"mission": 1000}, seed=3, writer=discard_writer)
+        assert (first["clicked"], first["purchased"]) == (second["clicked"], second["purchased"])
+
+    def test_cooperative_stop_commits_written_chunks(self, experiment_db):
+        reported = []
+        results = run_direct_swarm({"browser": 500}, lambda c, t, m: reported.append(c), run_id="run_stop",
+                                   writer=_direct_writer, chunk_size=100, should_stop=lambda: len(reported) >= 2)
+
+        with duckdb.connect(experiment_db) as con:
+            n_assign = con.execute("SELECT COUNT(*) FROM assignments WHERE run_id = 'run_stop'").fetchone()[0]
+        assert reported == [100, 200]
+        assert results["stopped_early"] and results["total"] == results["success"] == n_assign == 200
+
+    def test_failed_write_marks_run_failed(self):
+        results = run_direct_swarm({"browser": 10}, writer=lambda b: {"status": "error", "message": "locked"})
+        assert results["failed"] == 10
+        assert results["error"] == "locked"
+
+
+class TestBulkInsertFrames:
+    """Test suite for the single-transaction bulk loader."""
+
+    def test_failed_batch_rolls_back_everything(self, experiment_db):
+        import pandas as pd
+
+        good = pd.DataFrame({"event_id": ["e1"], "user_id": ["u1"], "event_name": ["page_view"],
+                             "timestamp": [pd.Timestamp("2026-01-01")], "value": [0.0], "run_id": ["run_r"]})
+        bad = pd.DataFrame({"no_such_column": [1]})
+        status = db.bulk_insert_frames([{"events": good}, {"events": bad}], use_coordination=False)
+
+        assert status["status"] == "error"
+        with duckdb.connect(experiment_db) as con:
+            assert con.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 0
@@ -0,0 +1,101 @@
+import pytest
+import sys
+import os
+import asyncio
+import random
+
+import httpx
+
+# Add root to path to import agent_swarm
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from agent_swarm import runner
+from agent_swarm.behaviors import get_behavior_by_name
+from agent_swarm.journeys import JourneyModel, ThinkTime, merge_journey_spec
+
+
+LINEAR = {
+    "home": {"search": 1.0},
+    "search": {"detail": 1.0},
+    "detail": {"cart": 1.0},
+    "cart": {"exit": 1.0},
+}
+
+
+class TestJourneyModel:
+    """Test suite for the Markov page-journey model."""
+
+    def test_deterministic_chain_walks_in_order(self):
+        model = JourneyModel(LINEAR)
+        assert model.walk(random.Random(0)) == ["search", "detail", "cart"]
+        assert model.expected_page_views() == pytest.approx(
+            {"home": 0.0, "search": 1.0, "detail": 1.0, "cart": 1.0, "tracking": 0.0})
+
+    def test_walk_is_capped_by_max_steps(self):
+        loop = JourneyModel({"home": {"detail": 1.0}, "detail": {"detail": 1.0}}, max_steps=5)
+        assert loop.walk(random.Random(0)) == ["detail"] * 5
+
+    def test_sampled_walks_match_expected_page_views(self):
+        model = get_behavior_by_name("browser").journey
+        rng = random.Random(42)
+        walks = [model.walk(rng) for _ in range(20_000)]
+        expected = model.expected_page_views()
+        for page in ("search", "detail", "cart"):
+            observed = sum(walk.count(page) for walk in walks) / len(walks)
+            assert observed == pytest.approx(expected[page], rel=0.05)
+
+    def test_invalid_transitions_are_rejected(self):
+        with pytest.raises(ValueError):
+            JourneyModel({"home": {"search": 0.5}})
+        with pytest.raises(ValueError):
+            JourneyModel({"checkout": {"exit": 1.0}})
+        with pytest.raises(ValueError):
+            ThinkTime("lognormal", median=1.0)
+
+    def test_think_time_distributions(self):
+        rng = random.Random(1)
+        uniform = ThinkTime("uniform", low=0.5, high=2.0)
+        assert all(0.5 <= uniform.sample(rng) <= 2.0 for _ in range(100))
+        lognormal = ThinkTime.from_spec({"dist": "lognormal", "median": 2.0, "sigma": 0.5})
+        samples = sorted(lognormal.sample(rng) for _ in range(5001))
+        assert samples[2500] == pytest.approx(2.0, rel=0.1)
+
+    def test_persona_rows_override_default(self):
+        spec = merge_journey_spec({"transitions": LINEAR, "max_steps": 8},
+                                  {"transitions": {"home": {"exit": 1.0}}})
+        assert spec["transitions"]["home"] == {"exit": 1.0}
+        assert spec["transitions"]["search"] == {"detail": 1.0}
+        assert spec["max_steps"] == 8
+
+
+class TestAgentJourneys:
+    """Swarm sessions walking the journey pages."""
+
+    def _run(self, monkeypatch, journeys):
+        monkeypatch.setenv("AGENT_TURBO", "1")
+        if journeys:
+            monkeypatch.setenv("AGENT_JOURNEYS", "1")
+        else:
+            monkeypatch.delenv("AGENT_JOURNEYS", raising=False)
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.path)
+            return httpx.Response(200, text="ok")
+
+        results = asyncio.run(runner.arun_agent_swarm(
+            {"browser": 30}, run_id="run_journey", transport=httpx.MockTransport(handler), seed=11
+        ))
+        return paths, results
+
+    def test_journeys_are_opt_in(self, monkeypatch):
+        paths, _ = self._run(monkeypatch, journeys=False)
+        assert set(paths) <= {"/", "/click", "/order"}
+
+    def test_journey_pages_are_requested_and_timed(self, monkeypatch):
+        paths, results = self._run(monkeypatch, journeys=True)
+        endpoints = results["latency"]["endpoints"]
+
+        assert {"/search", "/detail"} <= set(paths)
+        assert endpoints["GET /detail"]["count"] == paths.count("/detail")
+        assert results["success"] == 30
@@ -0,0 +1,75 @@
+import pytest
+import sys
+import os
+
+import pandas as pd
+
+# Add root to path to import src modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.allocation import DEFAULT_TABLE
+from src.core.bucketing import FAST_HASH
+from src.core.layers import DEFAULT_EXPERIMENT, LayeredAssignment, allocate_range
+
+ROWS = [
+    {"experiment_id": DEFAULT_EXPERIMENT, "layer": "default", "allocation": DEFAULT_TABLE},
+    {"experiment_id": "exp_rank", "layer": "ranking", "bucket_start": 0, "bucket_count": 500, "allocation": "A:50,B:50"},
+    {"experiment_id": "exp_rank_v2", "layer": "ranking", "bucket_start": 500, "bucket_count": 300, "allocation": "A,B,C"},
+]
+
+
+class TestAllocateRange:
+    """Test suite for bucket range allocation within a layer."""
+
+    def test_first_free_gap_is_used(self):
+        assert allocate_range([], 50) == (0, 500)
+        assert allocate_range([(0, 500), (700, 300)], 20) == (500, 200)
+        assert allocate_range([(100, 100)], 10) == (0, 100)
+
+    @pytest.mark.parametrize("taken, traffic", [([(0, 900)], 20), ([], 0), ([], 150)])
+    def test_unavailable_traffic_is_rejected(self, taken, traffic):
+        with pytest.raises(ValueError):
+            allocate_range(taken, traffic)
+
+
+class TestLayeredAssignment:
+    """Test suite for the compiled multi-layer lookup."""
+
+    def test_experiments_in_a_layer_are_mutually_exclusive(self):
+        layers = LayeredAssignment(ROWS)
+        assigned = [layers.assign(f"user_{i}") for i in range(20000)]
+
+        assert all(DEFAULT_EXPERIMENT in a and not ("exp_rank" in a and "exp_rank_v2" in a) for a in assigned)
+        share = pd.Series(["exp_rank" in a for a in assigned]).mean()
+        assert abs(share - 0.5) < 0.02
+        assert abs(pd.Series(["exp_rank_v2" in a for a in assigned]).mean() - 0.3) < 0.02
+
+    def test_legacy_experiment_keeps_its_assignments(self):
+        layers = LayeredAssignment(ROWS)
+        assert all(layers.variant(f"user_{i}", DEFAULT_EXPERIMENT) == DEFAULT_TABLE.variant(f"user_{i}")
+                   for i in range(500))
+
+    def test_layers_are_independent(self):
+        layers = LayeredAssignment(ROWS)
+        frame = layers.assign_series(pd.Series([f"user_{i}" for i in range(20000)]))
+        in_rank = frame["exp_rank"].notna()
+        by_default = in_rank.groupby(frame[DEFAULT_EXPERIMENT]).mean()
+        assert (abs(by_default - 0.5) < 0.03).all()
+
+    def test_unsalted_allocations_get_the_experiment_salt(self):
+        table = LayeredAssignment(ROWS).experiments["exp_rank"]["table"]
+        assert (table.salt, table.hash_version) == ("exp_rank", FAST_HASH)
+
+    def test_series_matches_scalar(self):
+        layers = LayeredAssignment(ROWS)
+        ids = [f"user_{i}" for i in range(300)]
+        frame = layers.assign_series(pd.Series(ids))
+        assert all(frame.loc[i].dropna().to_dict() == layers.assign(uid) for i, uid in enumerate(ids))
+
+    def test_invalid_and_overlapping_rows_are_skipped(self):
+        layers = LayeredAssignment(ROWS + [
+            {"experiment_id": "exp_clash", "layer": "ranking", "bucket_start": 400, "bucket_count": 200},
+            {"experiment_id": "exp_bad", "layer": "pricing", "allocation": "A:100"},
+        ])
+        assert set(layers.rejected) == {"exp_clash", "exp_bad"}
+        assert len(layers) == 3
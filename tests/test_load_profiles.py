@@ -0,0 +1,150 @@
+import pytest
+import sys
+import os
+import io
+import json
+import asyncio
+import subprocess
+
+import httpx
+import numpy as np
+
+# Add root to path to import agent_swarm
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from agent_swarm import runner
+from agent_swarm.progress import NdjsonProgress
+from agent_swarm.load_profiles import (
+    ConstantProfile,
+    RampProfile,
+    StepProfile,
+    SpikeProfile,
+    DiurnalProfile,
+    arrival_times,
+    parse_profile
+)
+
+
+class TestLoadProfiles:
+    """Test suite for arrival-rate curves."""
+
+    def test_step_rates(self):
+        profile = StepProfile([10, 50, 100], step_duration=30)
+        assert profile.duration == 90
+        assert list(profile.rate(np.array([0, 29.9, 30, 89.9]))) == [10, 10, 50, 100]
+
+    def test_spike_window(self):
+        profile = SpikeProfile(base_rps=20, spike_rps=300, duration=120, spike_at=60, spike_duration=10)
+        assert list(profile.rate(np.array([59, 60, 69, 70]))) == [20, 300, 300, 20]
+
+    def test_diurnal_peaks_at_peak_hour(self):
+        profile = DiurnalProfile(peak_rps=80, trough_rps=5, duration=240, peak_hour=20)
+        # 240s run = 10s per simulated hour
+        assert profile.rate(np.array([200.0]))[0] == pytest.approx(80)
+        assert profile.rate(np.array([80.0]))[0] == pytest.approx(5)
+
+    def test_expected_sessions_is_area_under_rate(self):
+        assert RampProfile(0, 100, duration=10).expected_sessions() == pytest.approx(500, rel=1e-3)
+
+
+class TestArrivalTimes:
+    """Test suite for the open-loop arrival schedule."""
+
+    def test_deterministic_constant_rate_is_evenly_spaced(self):
+        arrivals = arrival_times(ConstantProfile(rps=10, duration=2), poisson=False)
+        assert len(arrivals) == 20
+        assert np.allclose(np.diff(arrivals), 0.1)
+
+    def test_ramp_arrivals_concentrate_late(self):
+        arrivals = arrival_times(RampProfile(0, 200, duration=10), np.random.default_rng(0))
+        first_half = (arrivals < 5).sum()
+        # Rate integral is 1/4 of the total in the first half of a 0 -> max ramp
+        assert first_half / len(arrivals) == pytest.approx(0.25, abs=0.05)
+        assert np.all(np.diff(arrivals) >= 0)
+
+    def test_seeded_arrivals_repeat(self):
+        profile = ConstantProfile(rps=50, duration=5)
+        first = arrival_times(profile, np.random.default_rng(1))
+        second = arrival_times(profile, np.random.default_rng(1))
+        assert np.array_equal(first, second)
+
+
+class TestParseProfile:
+    """Test suite for CLI profile specs."""
+
+    def test_parse_step(self):
+        profile = parse_profile("step:rates=10/50/100,step=30")
+        assert isinstance(profile, StepProfile)
+        assert profile.rates == [10, 50, 100]
+
+    @pytest.mark.parametrize("spec", ["wave:rps=1", "ramp:start=1,stop=5,duration=10", "constant:rps=5"])
+    def test_invalid_specs_raise_value_error(self, spec):
+        with pytest.raises(ValueError):
+            parse_profile(spec)
+
+
+class TestOpenLoopRunner:
+    """Test suite for running a swarm on a load profile."""
+
+    def test_sessions_follow_profile(self, monkeypatch):
+        monkeypatch.setenv("AGENT_TURBO", "1")
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+
+        results = asyncio.run(runner.arun_load_profile(
+            {"impulsive": 1, "browser": 1}, ConstantProfile(rps=100, duration=0.3),
+            seed=5, transport=transport
+        ))
+
+        assert results["total"] == results["success"] > 0
+        assert results["dropped"] == 0
+        assert results["profile"] == "constant"
+        assert sum(t["total"] for t in results["by_trait"].values()) == results["total"]
+
+    def test_dropped_arrivals_are_reported(self, monkeypatch):
+        monkeypatch.setenv("AGENT_TURBO", "1")
+
+        async def slow(request):
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, text="ok")
+
+        progress = NdjsonProgress(stream=io.StringIO(), interval=0)
+        results = asyncio.run(runner.arun_load_profile(
+            {"impulsive": 1}, ConstantProfile(rps=200, duration=0.2),
+            progress, seed=5, max_in_flight=1, transport=httpx.MockTransport(slow)
+        ))
+
+        last = json.loads(progress.stream.getvalue().splitlines()[-1])
+        assert results["dropped"] > 0
+        assert last["completed"] == last["total"] == results["total"]
+        assert last["dropped"] == results["dropped"]
+
+    @pytest.mark.parametrize("flags", [["--engine", "direct"], ["--processes", "2"], ["--rps", "10"]])
+    def test_cli_rejects_flags_the_profile_ignores(self, flags):
+        root = os.path.join(os.path.dirname(__file__), '..')
+        proc = subprocess.run(
+            [sys.executable, "-m", "agent_swarm.runner", "--profile", "constant:rps=1,duration=1", *flags],
+            cwd=root, capture_output=True, text=True, timeout=60
+        )
+        assert proc.returncode == 2 and "--profile" in proc.stderr
+
+    def test_cli_start_line_reports_the_profile_sessions(self):
+        root = os.path.join(os.path.dirname(__file__), '..')
+        proc = subprocess.run(
+            [sys.executable, "-m", "agent_swarm.runner", "--profile", "constant:rps=20,duration=1", "--seed", "3",
+             "--count", "500", "--turbo", "--progress-format", "ndjson"],
+            cwd=root, capture_output=True, text=True, timeout=60
+        )
+        lines = [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+        start, result = lines[0], [line for line in lines if line["type"] == "result"][-1]
+        assert start["type"] == "start" and start["total"] == result["total"] != 500
+        assert sum(start["traits"].values()) == start["total"]
+
+    @pytest.mark.parametrize("spec", ["bogus", "constant:rps=x", "ramp:start=1"])
+    def test_cli_rejects_malformed_profiles(self, spec):
+        root = os.path.join(os.path.dirname(__file__), '..')
+        proc = subprocess.run([sys.executable, "-m", "agent_swarm.runner", "--profile", spec],
+                              cwd=root, capture_output=True, text=True, timeout=60)
+        assert proc.returncode == 2 and "--profile" in proc.stderr and "Traceback" not in proc.stderr
+
+    def test_mix_counts_keeps_proportions(self):
+        assert runner._mix_counts({"impulsive": 1, "browser": 3}, 10) == {"impulsive": 3, "browser": 7}
@@ -0,0 +1,67 @@
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# Add root to path to import agent_swarm
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from agent_swarm.metrics import SLO, LatencyHistogram, SwarmMetrics, apply_slo, format_report
+
+
+class TestLatencyHistogram:
+    """Test suite for the HDR-style latency histogram."""
+
+    def test_percentiles_within_bucket_precision(self):
+        samples = np.random.default_rng(0).lognormal(mean=-3.0, sigma=1.0, size=20000)  # seconds
+        hist = LatencyHistogram()
+        for s in samples:
+            hist.record(s)
+
+        for p in (50, 95, 99):
+            exact_ms = np.percentile(samples, p) * 1000
+            assert hist.percentile(p) == pytest.approx(exact_ms, rel=0.02)
+        assert hist.max_us == int(samples.max() * 1_000_000)
+
+    def test_bucket_count_stays_small(self):
+        hist = LatencyHistogram()
+        for us in range(1, 2_000_000, 997):
+            hist.record(us / 1_000_000)
+        assert len(hist.counts) < 1000
+
+    def test_merge_equals_recording_everything(self):
+        a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for i, s in enumerate(np.linspace(0.001, 0.5, 500)):
+            (a if i % 2 else b).record(s, ok=i % 10 != 0)
+            both.record(s, ok=i % 10 != 0)
+        a.merge(b)
+
+        assert a.summary() == both.summary()
+        assert a.summary()["error_rate"] == pytest.approx(0.1)
+
+
+class TestSLOReport:
+    """Test suite for per-endpoint SLO evaluation."""
+
+    def _metrics(self):
+        metrics = SwarmMetrics()
+        for _ in range(99):
+            metrics.record("impulsive", "GET /", 0.05, True)
+            metrics.record("browser", "POST /click", 0.9, True)
+        metrics.record("browser", "POST /click", 0.9, False)
+        return metrics
+
+    def test_report_flags_slow_endpoint(self):
+        report = self._metrics().report(SLO(p95_ms=500, p99_ms=1000, error_rate=0.05))
+
+        assert report["endpoints"]["GET /"]["slo_ok"] is True
+        assert report["endpoints"]["POST /click"]["slo_ok"] is False
+        assert report["slo"]["passed"] is False
+        assert report["requests"] == 199
+        assert set(report["traits"]) == {"impulsive", "browser"}
+
+    def test_apply_slo_reevaluates_with_new_targets(self):
+        report = apply_slo(self._metrics().report(), SLO(p95_ms=2000, p99_ms=2000, error_rate=0.05))
+        assert report["slo"]["passed"] is True
+        assert "SLO PASSED" in format_report(report)
@@ -0,0 +1,77 @@
+import pytest
+import sys
+import os
+import io
+import asyncio
+
+import httpx
+
+# Add root to path to import agent_swarm
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from agent_swarm import runner
+from agent_swarm.direct import run_direct_swarm
+from agent_swarm.progress import NdjsonProgress, parse_progress_line, report_progress, session_delta
+
+
+def _lines(stream):
+    return [parse_progress_line(line) for line in stream.getvalue().splitlines()]
+
+
+class TestNdjsonProgress:
+    """Test suite for NDJSON progress streaming."""
+
+    def test_session_delta(self):
+        delta = session_delta({"success": True, "agent_id": "a1", "variant": "B", "clicked": True, "purchased": True})
+        assert delta["visitors"] == {"B": 1}
+        assert (delta["clicks"], delta["purchases"]) == ({"B": 1}, {"B": 1})
+        assert [name for name, _ in delta["events"]] == ["page_view", "banner_B", "purchase"]
+        assert session_delta({"success": False}) == {"failed": 1}
+
+    def test_lines_are_throttled_but_last_is_always_sent(self):
+        stream = io.StringIO()
+        reporter = NdjsonProgress(stream, interval=60)
+        for i in range(1, 11):
+            report_progress(reporter, i, 10, "tick", {"visitors": {"A": 1}, "clicked": 1})
+
+        lines = _lines(stream)
+        assert [line["completed"] for line in lines] == [1, 10]
+        assert lines[-1]["visitors"] == {"A": 10}
+        assert lines[-1]["clicked"] == 10
+
+    def test_plain_callbacks_ignore_deltas(self):
+        calls = []
+        report_progress(lambda c, t, m: calls.append((c, t, m)), 1, 2, "msg", {"clicked": 1})
+        assert calls == [(1, 2, "msg")]
+
+    def test_async_swarm_streams_running_aggregates(self, monkeypatch):
+        monkeypatch.setenv("AGENT_TURBO", "1")
+        stream = io.StringIO()
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+        results = asyncio.run(runner.arun_agent_swarm({"impulsive": 8}, NdjsonProgress(stream, interval=0),
+                                                      transport=transport))
+
+        last = _lines(stream)[-1]
+        assert last["completed"] == 8
+        assert sum(last["visitors"].values()) == 8
+        assert last["clicked"] == results["clicked"]
+        assert len(last["recent"]) == 5
+
+    def test_direct_engine_reports_per_chunk(self):
+        stream = io.StringIO()
+
+        def discard_writer(batches):
+            for _ in batches:
+                pass
+            return {"status": "success"}
+
+        run_direct_swarm({"browser": 1000}, NdjsonProgress(stream, interval=0), writer=discard_writer, chunk_size=400)
+        lines = _lines(stream)
+
+        assert [line["completed"] for line in lines] == [400, 800, 1000]
+        assert sum(lines[-1]["visitors"].values()) == 1000
+        assert sum(lines[-1]["clicks"].values()) == lines[-1]["clicked"]
+
+    def test_non_json_lines_are_skipped(self):
+        assert parse_progress_line("INFO:DB:PostgreSQL connection pool created") is None
+        assert parse_progress_line('{"type": "start"}') == {"type": "start"}
@@ -0,0 +1,151 @@
+import pytest
+import sys
+import os
+import asyncio
+import time
+
+import httpx
+
+# Add root to path to import agent_swarm
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from agent_swarm import runner
+
+
+def _recording_transport(status_code=200):
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        return httpx.Response(status_code, text="ok")
+
+    return httpx.MockTransport(handler), calls
+
+
+@pytest.fixture(autouse=True)
+def turbo(monkeypatch):
+    monkeypatch.setenv("AGENT_TURBO", "1")
+
+
+class TestAsyncRunner:
+    """Test suite for the asyncio/httpx swarm runner."""
+
+    def test_results_match_threaded_contract(self):
+        transport, calls = _recording_transport()
+        progress = []
+        results = asyncio.run(runner.arun_agent_swarm(
+            {"impulsive": 6, "cautious": 4}, lambda c, t, m: progress.append((c, t)),
+            run_id="run_async", concurrency=3, transport=transport
+        ))
+
+        assert results["total"] == results["success"] == 10
+        assert results["clicked"] + results["bounced"] == 10
+        assert results["by_trait"]["impulsive"]["total"] == 6
+        assert results["run_id"] == "run_async"
+        assert progress[-1] == (10, 10)
+
+        visits = [c for c in calls if c == ("GET", "/")]
+        clicks = [c for c in calls if c == ("POST", "/click")]
+        assert len(visits) == len(clicks) == 10
+
+        latency = results["latency"]
+        assert latency["requests"] == len(calls)
+        assert latency["endpoints"]["GET /"]["count"] == 10
+        assert latency["endpoints"]["GET /"]["error_rate"] == 0.0
+        assert "metrics" not in results  # Replaced by the serializable report
+
+    def test_server_errors_count_as_failed(self):
+        transport, _ = _recording_transport(status_code=503)
+        results = asyncio.run(runner.arun_agent_swarm({"browser": 5}, transport=transport))
+
+        assert results["failed"] == 5
+        assert results["success"] == 0
+        assert results["latency"]["endpoints"]["GET /"]["error_rate"] == 1.0
+        assert results["latency"]["traits"]["browser"]["errors"] == 5
+
+
+class TestAsyncRateLimiter:
+    """Test suite for the token-bucket request pacing."""
+
+    def test_limits_request_rate(self):
+        async def burst():
+            limiter = runner.AsyncRateLimiter(rate=100, burst=1)
+            start = time.perf_counter()
+            for _ in range(21):
+                await limiter.acquire()
+            return time.perf_counter() - start
+
+        # First token is free, the next 20 need ~0.2s at 100 rps
+        assert asyncio.run(burst()) >= 0.18
+
+
+@pytest.fixture
+def stub_target(monkeypatch):
+    """Minimal HTTP server answering 200 to every request, shared with worker processes."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _ok(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        do_GET = do_POST = _ok
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("TARGET_APP_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield
+    server.shutdown()
+
+
+class TestShardedRunner:
+    """Test suite for process-pool sharding of the swarm."""
+
+    def test_shard_config_splits_every_trait(self):
+        shards = runner.shard_config({"impulsive": 5, "cautious": 2}, 3)
+
+        assert [cfg for cfg, _ in shards] == [
+            {"impulsive": 2, "cautious": 1},
+            {"impulsive": 2, "cautious": 1},
+            {"impulsive": 1},
+        ]
+        assert [offsets.get("impulsive") for _, offsets in shards] == [0, 2, 4]
+
+    def test_shard_config_never_creates_empty_shards(self):
+        assert len(runner.shard_config({"browser": 2}, 8)) == 2
+
+    def test_merge_results_sums_by_trait(self):
+        part = {"total": 2, "success": 2, "failed": 0, "clicked": 1, "bounced": 1, "purchased": 0,
+                "by_trait": {"browser": {"total": 2, "clicked": 1, "bounced": 1, "purchased": 0}}}
+        merged = runner.merge_results([part, part])
+
+        assert merged["success"] == 4
+        assert merged["by_trait"]["browser"] == {"total": 4, "clicked": 2, "bounced": 2, "purchased": 0}
+
+    def test_sharded_agent_ids_are_unique(self):
+        ids = []
+        for cfg, offsets in runner.shard_config({"mission": 7}, 3):
+            ids += [a.agent_id for a in runner._build_agents(cfg, "run_s", 1.0, id_base=1000, offsets=offsets)]
+
+        assert ids == [f"agent_mission_{1000 + i}" for i in range(7)]
+
+    def test_sharded_run_merges_worker_results(self, stub_target):
+        progress = []
+        results = runner.run_agent_swarm_sharded(
+            {"impulsive": 6, "browser": 4}, lambda c, t, m: progress.append(c),
+            run_id="run_shard", processes=2, concurrency=4
+        )
+
+        assert results["total"] == results["success"] == 10
+        assert sum(t["total"] for t in results["by_trait"].values()) == 10
+        assert results["latency"]["endpoints"]["GET /"]["count"] == 10
+        assert progress[-1] == 10
@@ -0,0 +1,90 @@
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# Add root to path to import src modules
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.sequential import (
+    GroupSequentialDesign, SequentialMonitor, alpha_spent, group_sequential_boundaries, msprt
+)
+
+
+class TestGroupSequential:
+    """Test suite for alpha-spending boundaries."""
+
+    def test_single_look_is_fixed_horizon(self):
+        assert group_sequential_boundaries([1.0])[0] == pytest.approx(1.959964, abs=1e-4)
+
+    def test_pocock_spending_matches_reference(self):
+        # Lan-DeMets Pocock-type spending, 5 equally spaced looks, two-sided alpha 0.05
+        bounds = group_sequential_boundaries([0.2, 0.4, 0.6, 0.8, 1.0], spending="pocock")
+        assert bounds == pytest.approx([2.4380, 2.4268, 2.4101, 2.3966, 2.3860], abs=2e-3)
+
+    def test_obrien_fleming_keeps_type_one_error(self):
+        looks = np.array([0.2, 0.4, 0.6, 0.8, 1.0])
+        bounds = group_sequential_boundaries(looks)
+        assert bounds[0] == pytest.approx(1.959964 / np.sqrt(0.2), abs=1e-3)
+        assert (np.diff(bounds) < 0).all()
+
+        rng = np.random.default_rng(0)
+        paths = (rng.normal(size=(200_000, 5)) * np.sqrt(0.2)).cumsum(axis=1) / np.sqrt(looks)
+        assert (np.abs(paths) >= bounds).any(axis=1).mean() == pytest.approx(0.05, abs=0.003)
+
+    def test_looks_must_advance(self):
+        design = GroupSequentialDesign()
+        design.next_boundary(0.5)
+        with pytest.raises(ValueError):
+            design.next_boundary(0.5)
+        with pytest.raises(ValueError):
+            alpha_spent(0.5, spending="haybittle")
+
+
+class TestMsprt:
+    """Test suite for always-valid p-values."""
+
+    def test_peeking_under_the_null_stays_below_alpha(self):
+        rng = np.random.default_rng(1)
+        n = np.arange(1, 41) * 250
+        control = rng.binomial(250, 0.1, size=(1000, 40)).cumsum(axis=1)
+        test = rng.binomial(250, 0.1, size=(1000, 40)).cumsum(axis=1)
+
+        p_min = msprt(n, control, n, test, tau=0.01)["p_value"].min(axis=1)
+        assert (p_min <= 0.05).mean() <= 0.05
+
+    def test_evidence_grows_with_a_real_difference(self):
+        res = msprt([1000, 10000], [100, 1000], [1000, 10000], [130, 1300], tau=0.02)
+        assert res["p_value"][1] < res["p_value"][0]
+        assert res["reject"].tolist() == [False, True]
+
+
+class TestSequentialMonitor:
+    """Test suite for the live early-stopping state."""
+
+    def test_stops_early_on_a_decisive_effect(self):
+        monitor = SequentialMonitor(n_per_group=10000, tau=0.02)
+        for k in range(1, 41):
+            result = monitor.update(250 * k, 25 * k, 250 * k, 40 * k)
+            if result["stop"]:
+                break
+        assert result["stop"] and result["diff"] > 0
+        assert result["info_fraction"] < 1.0
+
+    def test_looks_past_the_horizon_spend_the_rest(self):
+        monitor = SequentialMonitor(n_per_group=1000, looks=5)
+        monitor.update(100, 10, 100, 10)   # Before the first look
+        assert monitor.design.boundaries == []
+        result = monitor.update(1500, 150, 1500, 150)  # Jumps past every look
+        assert result["look"] == 1 and monitor.design.info_fractions == [1.0]
+        assert result["boundary"] == pytest.approx(1.959964, abs=1e-4)
+        assert not result["stop"]
+
+    def test_repeated_counts_take_no_new_look(self):
+        monitor = SequentialMonitor(n_per_group=1000)
+        first = monitor.update(400, 40, 400, 44)
+        second = monitor.update(400, 40, 400, 44)  # Progress line without new users in the smaller arm
+        assert second["look"] == first["look"] == 1
+        assert monitor.design.info_fractions == [0.4]
+        assert monitor.update(600, 60, 500, 55)["look"] == 2
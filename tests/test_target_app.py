@@ -0,0 +1,554 @@
+import pytest
+import sys
+import os
+import time
+import json
+import threading
+
+import duckdb
+
+# Add root to path to import target_app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from target_app import main
+from src.core.accumulator import create_table_sql
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    """Point the target app at an in-memory DuckDB with the experiment tables."""
+    con = duckdb.connect()
+    con.execute("CREATE TABLE events (event_id VARCHAR, user_id VARCHAR, event_name VARCHAR, timestamp TIMESTAMP, value DOUBLE, run_id VARCHAR)")
+    con.execute("CREATE TABLE assignments (user_id VARCHAR, experiment_id VARCHAR, variant VARCHAR, assigned_at TIMESTAMP, run_id VARCHAR, weight FLOAT DEFAULT 1.0)")
+    con.execute(create_table_sql())
+    writer = main.DuckDBWriter(con).start()
+    monkeypatch.setattr(main, "db_con", con)
+    monkeypatch.setattr(main, "db_writer", writer)
+    monkeypatch.setattr(main, "DB_MODE", "duckdb")
+    monkeypatch.setattr(main, "recent_assignments", main.RecentAssignments())
+    monkeypatch.setattr(main, "_assignment_index_ready", False)
+    monkeypatch.setattr(main, "experiment_accumulator", main.ExperimentAccumulator())
+    yield con
+    writer.stop()
+    con.close()
+
+
+class TestEventBuffer:
+    """Test suite for the batched event ingestion buffer."""
+
+    def test_flush_writes_all_rows_in_one_batch(self):
+        batches = []
+        buffer = main.EventBuffer(batches.append, max_size=100, flush_interval=60)
+        for i in range(5):
+            buffer.add((f"e{i}",))
+
+        assert buffer.pending() == 5
+        assert buffer.flush() == 5
+        assert len(batches) == 1
+        assert len(batches[0]) == 5
+        assert buffer.pending() == 0
+
+    def test_size_threshold_triggers_background_flush(self):
+        batches = []
+        buffer = main.EventBuffer(batches.append, max_size=3, flush_interval=60)
+        buffer.start()
+        try:
+            for i in range(3):
+                buffer.add((f"e{i}",))
+            deadline = time.time() + 2
+            while not batches and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            buffer.stop()
+
+        assert sum(len(b) for b in batches) == 3
+
+    def test_interval_triggers_background_flush(self):
+        batches = []
+        buffer = main.EventBuffer(batches.append, max_size=1000, flush_interval=0.05)
+        buffer.start()
+        try:
+            buffer.add(("e0",))
+            deadline = time.time() + 2
+            while not batches and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            buffer.stop()
+
+        assert batches == [[("e0",)]]
+
+    def test_stop_drains_pending_rows(self):
+        batches = []
+        buffer = main.EventBuffer(batches.append, max_size=1000, flush_interval=60)
+        buffer.start()
+        buffer.add(("e0",))
+        buffer.stop()
+
+        assert batches == [[("e0",)]]
+
+    def test_failed_flush_keeps_rows_for_retry(self):
+        def failing_writer(rows):
+            raise RuntimeError("DB released")
+
+        buffer = main.EventBuffer(failing_writer, max_size=1000, flush_interval=60, max_backlog=10)
+        buffer.add(("e0",))
+        assert buffer.flush() == 0
+        assert buffer.pending() == 1
+        assert buffer.dropped_total == 0
+
+    def test_failed_flush_drops_rows_beyond_backlog(self):
+        def failing_writer(rows):
+            raise RuntimeError("DB down")
+
+        buffer = main.EventBuffer(failing_writer, max_size=1000, flush_interval=60, max_backlog=2)
+        for i in range(3):
+            buffer.add((f"e{i}",))
+        buffer.flush()
+        assert buffer.pending() == 0
+        assert buffer.dropped_total == 3
+
+
+class TestEventIngestion:
+    """Test suite for log_event routed through the buffer into DuckDB."""
+
+    def test_log_event_is_persisted_after_flush(self, memory_db, monkeypatch):
+        buffer = main.EventBuffer(main._write_events, max_size=1000, flush_interval=60)
+        monkeypatch.setattr(main, "event_buffer", buffer)
+
+        main.log_event("user_1", "A", "banner_A", 0.0, "run_1")
+        main.log_event("user_1", "A", "purchase", 25000, "run_1")
+
+        # Nothing is written until the buffer flushes
+        assert memory_db.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 0
+
+        buffer.flush()
+        rows = memory_db.execute("SELECT user_id, event_name, value, run_id FROM events ORDER BY event_name").fetchall()
+        assert rows == [("user_1", "banner_A", 0.0, "run_1"), ("user_1", "purchase", 25000.0, "run_1")]
+
+
+    def test_stats_match_raw_tables_after_failed_flush(self, memory_db, monkeypatch):
+        failures = iter([RuntimeError("db released")] * 2)
+
+        def flaky_writer(rows):
+            failure = next(failures, None)
+            if failure:
+                raise failure
+            main._write_events(rows)
+
+        buffer = main.EventBuffer(flaky_writer, max_size=1000, flush_interval=60, max_backlog=3)
+        monkeypatch.setattr(main, "event_buffer", buffer)
+        main.log_assignment("agent_1", "A", "run_1")
+        main.log_assignment("agent_2", "B", "run_1")
+
+        main.log_event("agent_1", "A", "page_view", 0.0, "run_1")
+        main.log_event("agent_2", "B", "page_view", 0.0, "run_1")
+        assert buffer.flush() == 0 and buffer.pending() == 2  # Failed, kept for retry
+        main.log_event("agent_2", "B", "banner_B", 0.0, "run_1")
+        main.log_event("agent_2", "B", "purchase", 9000, "run_1")
+        assert buffer.flush() == 0 and buffer.dropped_total == 4  # Failed beyond the backlog, dropped
+
+        main.log_event("agent_1", "B", "purchase", 25000, "run_1")  # Stale variant at event time
+        main.log_event("agent_2", "B", "banner_B", 0.0, "run_1")
+        assert buffer.flush() == 2
+
+        stats = memory_db.execute("""
+            SELECT variant, users, page_views, clicks, purchases, revenue_sum
+            FROM experiment_stats WHERE run_id = 'run_1' ORDER BY variant
+        """).fetchall()
+        raw = memory_db.execute("""
+            SELECT a.variant, COUNT(DISTINCT a.user_id),
+                   COUNT(*) FILTER (WHERE e.event_name = 'page_view'),
+                   COUNT(*) FILTER (WHERE e.event_name LIKE 'banner_%'),
+                   COUNT(*) FILTER (WHERE e.event_name = 'purchase'),
+                   COALESCE(SUM(e.value) FILTER (WHERE e.event_name = 'purchase'), 0)
+            FROM assignments a LEFT JOIN events e ON a.user_id = e.user_id AND a.run_id = e.run_id
+            WHERE a.run_id = 'run_1' GROUP BY a.variant ORDER BY a.variant
+        """).fetchall()
+        assert stats == raw
+        assert stats[0][4:] == (1, 25000.0)  # Purchase counted under the stored variant A
+
+    def test_repeated_events_count_users_like_the_scan(self, memory_db, monkeypatch):
+        from src.core.stats import _run_stats_scan_sql
+
+        buffer = main.EventBuffer(main._write_events, max_size=1000, flush_interval=60)
+        monkeypatch.setattr(main, "event_buffer", buffer)
+        main.log_assignment("agent_1", "A", "run_1")
+        main.log_assignment("agent_2", "A", "run_1")
+
+        for name, value in (("banner_A", 0.0), ("banner_A", 0.0), ("purchase", 9000), ("bounce", 0.0)):
+            main.log_event("agent_1", "A", name, value, "run_1")
+        buffer.flush()
+        for name, value in (("click_banner", 0.0), ("purchase", 12000), ("page_view", 0.0)):  # Revisit, later batch
+            main.log_event("agent_1", "A", name, value, "run_1")
+        main.log_event("agent_2", "A", "banner_A", 0.0, "run_1")
+        buffer.flush()
+
+        stats = memory_db.execute(f"SELECT {', '.join(main.STATS_COLUMNS[1:])} FROM experiment_stats WHERE run_id = 'run_1'").fetchall()
+        assert stats == memory_db.execute(_run_stats_scan_sql("run_1")).fetchall()
+        assert stats[0][5:9] == (2, 1, 1, 21000.0)  # clicks, bounces, purchases per user; all revenue
+
+
+class TestExperimentStateCache:
+    """Test suite for the TTL cache in front of experiment state queries."""
+
+    def _counting_loader(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {"active": True, "adopted": None}
+
+        return loader, calls
+
+    def test_hits_within_ttl_do_not_query(self):
+        loader, calls = self._counting_loader()
+        cache = main.ExperimentStateCache(loader, ttl=60)
+
+        for _ in range(10):
+            assert cache.get()["active"] is True
+
+        assert len(calls) == 1
+        assert cache.hits == 9
+
+    def test_expired_entry_is_reloaded(self):
+        loader, calls = self._counting_loader()
+        cache = main.ExperimentStateCache(loader, ttl=0)
+
+        cache.get()
+        cache.get()
+        assert len(calls) == 2
+
+    def test_invalidate_forces_reload(self):
+        loader, calls = self._counting_loader()
+        cache = main.ExperimentStateCache(loader, ttl=60)
+
+        cache.get()
+        cache.invalidate()
+        cache.get()
+        assert len(calls) == 2
+
+    def test_concurrent_misses_share_one_load(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        calls, release = [], threading.Event()
+
+        def slow_loader():
+            calls.append(1)
+            release.wait(5)
+            return {"active": True, "adopted": None}
+
+        cache = main.ExperimentStateCache(slow_loader, ttl=60)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(cache.get) for _ in range(8)]
+            time.sleep(0.2)  # All callers miss while the first load is in flight
+            release.set()
+            assert all(f.result(timeout=5)["active"] for f in futures)
+        assert len(calls) == 1
+
+    def test_failed_load_is_not_cached(self):
+        outcomes = iter([RuntimeError("db down"), {"active": False, "adopted": None}])
+
+        def loader():
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        cache = main.ExperimentStateCache(loader, ttl=60)
+        with pytest.raises(RuntimeError):
+            cache.get()
+        assert cache.get()["active"] is False
+
+    def test_assignment_uses_cached_state(self, monkeypatch):
+        loader, calls = self._counting_loader()
+        monkeypatch.setattr(main, "experiment_state", main.ExperimentStateCache(loader, ttl=60))
+
+        for i in range(20):
+            assert main.get_assignment(f"user_{i}") in ("A", "B")
+        assert len(calls) == 1
+
+    def test_adopted_variant_served_when_no_experiment(self, monkeypatch):
+        cache = main.ExperimentStateCache(lambda: {"active": False, "adopted": {"winning_variant": "B"}}, ttl=60)
+        monkeypatch.setattr(main, "experiment_state", cache)
+
+        assert main.get_assignment("user_1") == "B"
+        assert main.get_adopted_variant() == {"winning_variant": "B"}
+
+    def test_active_allocation_is_loaded_from_db(self, memory_db):
+        memory_db.execute("CREATE TABLE active_experiment (id INTEGER PRIMARY KEY, is_active BOOLEAN, started_at TIMESTAMP, allocation VARCHAR)")
+        memory_db.execute("""INSERT INTO active_experiment VALUES (1, true, now(), '{"A": 50, "B": 25, "C": 25}')""")
+
+        state = main._load_experiment_state()
+        assert state["active"] and state["allocation"].variants == ("A", "B", "C")
+        assigned = {main._choose_variant(f"user_{i}", state) for i in range(200)}
+        assert assigned == {"A", "B", "C"}
+
+    def test_legacy_active_row_uses_default_split(self, memory_db):
+        memory_db.execute("CREATE TABLE active_experiment (id INTEGER PRIMARY KEY, is_active BOOLEAN, started_at TIMESTAMP)")
+        memory_db.execute("INSERT INTO active_experiment VALUES (1, true, now())")
+
+        state = main._load_experiment_state()
+        assert state["active"] and state["allocation"] is main.DEFAULT_TABLE
+
+    def test_layered_experiments_compile_into_state(self, memory_db):
+        memory_db.execute(main.create_layers_table_sql())
+        memory_db.execute(f"""INSERT INTO {main.LAYERS_TABLE} (experiment_id, layer, bucket_start, bucket_count, allocation)
+                              VALUES ('exp_rank', 'ranking', 0, 1000, 'A:50,B:50')""")
+
+        state = main._load_experiment_state()
+        assert not state["active"] and list(state["layers"].experiments) == ["exp_rank"]
+        assert set(main._choose_experiments("user_1", state)) == {"exp_rank"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """TestClient running app startup/shutdown against a temporary DuckDB file."""
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "DB_PATH", str(tmp_path / "experiment.db"))
+    monkeypatch.setattr(main, "DB_MODE", "duckdb")
+    monkeypatch.setattr(main, "experiment_state", main.ExperimentStateCache(main._load_experiment_state, ttl=60))
+    monkeypatch.setattr(main, "recent_assignments", main.RecentAssignments())
+    monkeypatch.setattr(main, "experiment_accumulator", main.ExperimentAccumulator())
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+class TestRequestFlow:
+    """End-to-end request handling through the async DB layer."""
+
+    def test_agent_session_is_recorded(self, client):
+        res = client.get("/", params={"uid": "agent_1", "run_id": "run_1", "weight": 2.0})
+        assert res.status_code == 200
+        client.get("/", params={"uid": "agent_1", "run_id": "run_1", "weight": 2.0})
+        client.post("/click", data={"uid": "agent_1", "element": "banner_A", "run_id": "run_1"})
+        client.post("/order", data={"uid": "agent_1", "amount": 20000, "run_id": "run_1"})
+
+        # execute_sql flushes the event buffer before reading
+        res = client.post("/admin/execute_sql", json={"sql": "SELECT user_id, weight FROM assignments WHERE run_id = 'run_1'"})
+        assert res.json()["data"] == [["agent_1", 2.0]]
+
+        res = client.post("/admin/execute_sql", json={"sql": "SELECT event_name FROM events WHERE run_id = 'run_1' ORDER BY event_name"})
+        assert [row[0] for row in res.json()["data"]] == ["banner_A", "page_view", "page_view", "purchase"]
+
+        res = client.post("/admin/execute_sql", json={"sql": "SELECT variant, users, weight_sum, page_views, clicks, purchases, revenue_sum FROM experiment_stats WHERE run_id = 'run_1'"})
+        variant = main.get_assignment("agent_1")
+        assert res.json()["data"] == [[variant, 1, 2.0, 2, 1, 1, 20000.0]]
+
+    def test_journey_pages_are_attributed_to_run(self, client):
+        client.get("/", params={"uid": "agent_2", "run_id": "run_2"})
+        for path, params in (("/search", {"q": "피자"}), ("/detail", {"id": "item_007"}), ("/cart", {}), ("/tracking", {})):
+            res = client.get(path, params={"uid": "agent_2", "run_id": "run_2", **params})
+            assert res.status_code == 200
+
+        res = client.post("/admin/execute_sql", json={"sql": "SELECT DISTINCT user_id, event_name FROM events WHERE run_id = 'run_2' ORDER BY event_name"})
+        assert res.json()["data"] == [["agent_2", name] for name in
+                                      ["page_view", "page_view_cart", "page_view_detail", "page_view_search", "page_view_tracking"]]
+
+
+    def test_release_and_reconnect_keep_buffered_events(self, client):
+        client.get("/", params={"uid": "agent_3", "run_id": "run_3"})
+        assert client.post("/admin/db_release").json()["status"] == "success"
+        assert main.db_con is None and main.db_writer is None
+        assert client.post("/admin/db_reconnect").json()["status"] == "success"
+
+        res = client.post("/admin/execute_sql", json={"sql": "SELECT COUNT(*) FROM events WHERE run_id = 'run_3'"})
+        assert res.json()["data"] == [[1]]
+
+
+class TestLayerEndpoints:
+    """Layered experiments through the admin endpoints and /assignments."""
+
+    def test_concurrent_experiments_share_no_users_within_a_layer(self, client):
+        res = client.post("/admin/layers/experiments", json={"experiment_id": "exp_rank", "layer": "ranking", "traffic": 60})
+        assert (res.json()["bucket_start"], res.json()["bucket_count"]) == (0, 600)
+        res = client.post("/admin/layers/experiments", json={"experiment_id": "exp_rank_v2", "layer": "ranking", "traffic": 40})
+        assert res.json()["bucket_start"] == 600
+        assert client.post("/admin/layers/experiments", json={"experiment_id": "exp_full", "layer": "ranking", "traffic": 10}).status_code == 409
+        client.post("/admin/layers/experiments", json={"experiment_id": "exp_price", "layer": "pricing", "allocation": "A,B,C"})
+
+        for i in range(50):
+            experiments = client.get("/assignments", params={"uid": f"user_{i}"}).json()["experiments"]
+            assert len({"exp_rank", "exp_rank_v2"} & set(experiments)) == 1 and "exp_price" in experiments
+
+        client.post("/admin/layers/experiments/exp_rank_v2/stop")
+        assert set(client.get("/admin/layers").json()["experiments"]) == {"exp_rank", "exp_price"}
+
+    def test_concurrent_starts_in_a_layer_do_not_overlap(self, client):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def start(i):
+            return client.post("/admin/layers/experiments", json={"experiment_id": f"exp_{i}", "layer": "ranking", "traffic": 60})
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            codes = sorted(res.status_code for res in pool.map(start, range(4)))
+        assert codes == [200, 409, 409, 409]
+        layers = client.get("/admin/layers").json()
+        assert len(layers["experiments"]) == 1 and layers["rejected"] == {}
+
+
+class TestDuckDBWriter:
+    """Test suite for the single-writer thread and read cursors."""
+
+    def test_jobs_run_in_submission_order(self, memory_db):
+        writer = main.DuckDBWriter(memory_db).start()
+        try:
+            futures = [
+                writer.submit(lambda con, i=i: con.execute("INSERT INTO events (event_id) VALUES (?)", [f"e{i}"]))
+                for i in range(20)
+            ]
+            for future in futures:
+                future.result(timeout=5)
+        finally:
+            writer.stop()
+
+        assert memory_db.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 20
+
+    def test_job_errors_are_raised_to_caller(self, memory_db):
+        writer = main.DuckDBWriter(memory_db).start()
+        try:
+            future = writer.submit(lambda con: con.execute("INSERT INTO missing_table VALUES (1)"))
+            with pytest.raises(Exception):
+                future.result(timeout=5)
+        finally:
+            writer.stop()
+
+    def test_jobs_after_stop_fail_instead_of_hanging(self, memory_db):
+        writer = main.DuckDBWriter(memory_db).start()
+        writer.stop()
+        with pytest.raises(RuntimeError):
+            writer.submit(lambda con: 1).result(timeout=1)
+
+    def test_jobs_behind_a_stuck_job_fail_on_stop(self, memory_db, monkeypatch):
+        monkeypatch.setattr(main.DuckDBWriter, "STOP_TIMEOUT", 0.1)
+        release = threading.Event()
+        writer = main.DuckDBWriter(memory_db).start()
+        stuck = writer.submit(lambda con: release.wait(5))
+        queued = writer.submit(lambda con: 1)
+
+        writer.stop()
+        with pytest.raises(RuntimeError):
+            queued.result(timeout=1)
+        release.set()
+        assert stuck.result(timeout=5) is True
+
+    def test_closed_writer_is_unpublished_first(self, memory_db):
+        main._close_duckdb()
+        with pytest.raises(RuntimeError):
+            main._duckdb_write(lambda con: 1)
+
+    def test_reader_sees_committed_writes(self, memory_db):
+        main._write_events_duckdb([("e0", "user_1", "page_view", None, 0.0, "run_1")])
+        assert main._duckdb_reader().execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+
+    @pytest.mark.parametrize("sql,expected", [
+        ("SELECT 1", True),
+        ("  with t AS (SELECT 1) SELECT * FROM t", True),
+        ("-- live count\nSELECT COUNT(*) FROM events", True),
+        ("DELETE FROM events", False),
+        ("INSERT INTO events VALUES (1)", False),
+    ])
+    def test_read_only_sql_detection(self, sql, expected):
+        assert main._is_read_only_sql(sql) is expected
+
+
+class TestAssignmentLogging:
+    """Test suite for idempotent assignment inserts."""
+
+    def _assignment_rows(self, con):
+        return con.execute("SELECT user_id, variant, run_id FROM assignments ORDER BY user_id, run_id").fetchall()
+
+    @pytest.mark.parametrize("with_index", [True, False])
+    def test_repeat_visits_insert_once(self, memory_db, with_index):
+        if with_index:
+            main._duckdb_write(main._ensure_assignment_index_duckdb)
+            assert main._assignment_index_ready
+
+        for _ in range(3):
+            main.recent_assignments.clear()  # Force the DB path every time
+            main.log_assignment("agent_1", "A", "run_1")
+            main.log_assignment("visitor_1", "B", None)
+
+        assert self._assignment_rows(memory_db) == [("agent_1", "A", "run_1"), ("visitor_1", "B", None)]
+
+    def test_same_user_in_different_runs(self, memory_db):
+        main._duckdb_write(main._ensure_assignment_index_duckdb)
+        main.log_assignment("agent_1", "A", "run_1")
+        main.log_assignment("agent_1", "A", "run_2")
+
+        assert len(self._assignment_rows(memory_db)) == 2
+
+    def test_recent_users_skip_the_database(self, memory_db):
+        main.log_assignment("agent_1", "A", "run_1")
+        memory_db.execute("DELETE FROM assignments")
+
+        main.log_assignment("agent_1", "A", "run_1")
+        assert self._assignment_rows(memory_db) == []
+
+    def test_recent_assignments_evicts_oldest(self):
+        recent = main.RecentAssignments(capacity=2)
+        recent.add(("u1", "r"))
+        recent.add(("u2", "r"))
+        assert ("u1", "r") in recent  # Touch u1 so u2 becomes the oldest
+        recent.add(("u3", "r"))
+
+        assert ("u1", "r") in recent
+        assert ("u2", "r") not in recent
+        assert len(recent) == 2
+
+
+class TestEventBatchEndpoint:
+    """Test suite for POST /events/batch."""
+
+    def _events(self, client, run_id):
+        res = client.post("/admin/execute_sql", json={
+            "sql": f"SELECT user_id, event_name, value, CAST(timestamp AS VARCHAR) FROM events WHERE run_id = '{run_id}' ORDER BY user_id, event_name"
+        })
+        return res.json()["data"]
+
+    def test_json_array_is_written(self, client):
+        res = client.post("/events/batch", json=[
+            {"uid": "agent_1", "event_name": "banner_A", "run_id": "run_b", "timestamp": "2026-01-01T09:00:00"},
+            {"uid": "agent_1", "event_name": "purchase", "value": 20000, "run_id": "run_b"},
+        ])
+        assert res.status_code == 200
+        assert res.json() == {"status": "success", "accepted": 2}
+
+        rows = self._events(client, "run_b")
+        assert rows[0] == ["agent_1", "banner_A", 0.0, "2026-01-01 09:00:00"]
+        assert rows[1][:3] == ["agent_1", "purchase", 20000.0]
+
+    def test_batch_feeds_experiment_stats(self, client):
+        client.get("/", params={"uid": "agent_1", "run_id": "run_s"})
+        client.post("/events/batch", json=[
+            {"uid": "agent_1", "event_name": "banner_A", "run_id": "run_s"},
+            {"uid": "agent_1", "event_name": "purchase", "value": 20000, "run_id": "run_s"},
+        ])
+        res = client.post("/admin/execute_sql", json={"sql": "SELECT clicks, purchases, revenue_sum FROM experiment_stats WHERE run_id = 'run_s'"})
+        assert res.json()["data"] == [[1, 1, 20000.0]]
+
+    def test_ndjson_body_is_written(self, client):
+        body = "\n".join(json.dumps({"uid": f"agent_{i}", "event_name": "page_view", "run_id": "run_n"}) for i in range(3))
+        res = client.post("/events/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+        assert res.json()["accepted"] == 3
+        assert len(self._events(client, "run_n")) == 3
+
+    def test_invalid_event_rejects_whole_batch(self, client):
+        res = client.post("/events/batch", json={"events": [
+            {"uid": "agent_1", "event_name": "page_view", "run_id": "run_x"},
+            {"uid": "agent_2", "run_id": "run_x"},
+        ]})
+
+        assert res.status_code == 422
+        assert res.json()["errors"][0]["index"] == 1
+        assert self._events(client, "run_x") == []
+
+    def test_malformed_body_is_rejected(self, client):
+        res = client.post("/events/batch", content="not json", headers={"Content-Type": "application/json"})
+        assert res.status_code == 400
+
+    def test_oversized_batch_is_rejected(self, client, monkeypatch):
+        monkeypatch.setattr(main, "EVENT_BATCH_MAX", 2)
+        res = client.post("/events/batch", json=[{"uid": "u", "event_name": "e"}] * 3)
+        assert res.status_code == 413